@@ -55,6 +55,7 @@ class InstanceConfig(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     detailed_queues: Optional[Sequence[str]]
     detailed_subscribers: Optional[Sequence[str]]
     detailed_topics: Optional[Sequence[str]]
@@ -79,6 +80,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     suppress_errors: Optional[bool]
     tags: Optional[Sequence[str]]
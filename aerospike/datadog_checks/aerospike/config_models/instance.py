@@ -85,6 +85,7 @@ class InstanceConfig(BaseModel):
     collect_counters_with_distributions: Optional[bool]
     collect_histogram_buckets: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     datacenter_metrics: Optional[Sequence[str]]
     datacenters: Optional[Sequence[str]]
     disable_generic_tags: Optional[bool]
@@ -103,6 +104,7 @@ class InstanceConfig(BaseModel):
     ignore_connection_errors: Optional[bool]
     ignore_tags: Optional[Sequence[str]]
     include_labels: Optional[Sequence[str]]
+    incremental_parsing: Optional[bool]
     kerberos_auth: Optional[str]
     kerberos_cache: Optional[str]
     kerberos_delegate: Optional[bool]
@@ -110,7 +112,9 @@ class InstanceConfig(BaseModel):
     kerberos_hostname: Optional[str]
     kerberos_keytab: Optional[str]
     kerberos_principal: Optional[str]
+    label_plan_cache_size: Optional[int]
     log_requests: Optional[bool]
+    max_concurrent_scrapes: Optional[int]
     metric_patterns: Optional[MetricPatterns]
     metrics: Optional[Sequence[Union[str, Mapping[str, Union[str, Metric]]]]]
     min_collection_interval: Optional[float]
@@ -130,8 +134,10 @@ class InstanceConfig(BaseModel):
     rename_labels: Optional[Mapping[str, Any]]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
     skip_proxy: Optional[bool]
+    skip_unconfigured_lines: Optional[bool]
     tag_by_endpoint: Optional[bool]
     tags: Optional[Sequence[str]]
     telemetry: Optional[bool]
@@ -145,9 +151,11 @@ class InstanceConfig(BaseModel):
     tls_protocols_allowed: Optional[Sequence[str]]
     tls_use_host_header: Optional[bool]
     tls_verify: Optional[bool]
+    use_compression: Optional[bool]
     use_latest_spec: Optional[bool]
     use_legacy_auth_encoding: Optional[bool]
     use_process_start_time: Optional[bool]
+    use_protobuf: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
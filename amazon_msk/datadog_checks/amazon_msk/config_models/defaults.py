@@ -78,6 +78,10 @@ def instance_connect_timeout(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_connection_pool_size(field, value):
+    return 10
+
+
 def instance_disable_generic_tags(field, value):
     return False
 
@@ -138,6 +142,10 @@ def instance_include_labels(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_incremental_parsing(field, value):
+    return False
+
+
 def instance_jmx_exporter_port(field, value):
     return 11001
 
@@ -170,10 +178,18 @@ def instance_kerberos_principal(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_label_plan_cache_size(field, value):
+    return 10000
+
+
 def instance_log_requests(field, value):
     return False
 
 
+def instance_max_concurrent_scrapes(field, value):
+    return 1
+
+
 def instance_metric_patterns(field, value):
     return get_default_field_value(field, value)
 
@@ -250,6 +266,10 @@ def instance_service(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_share_connections(field, value):
+    return False
+
+
 def instance_share_labels(field, value):
     return get_default_field_value(field, value)
 
@@ -258,6 +278,10 @@ def instance_skip_proxy(field, value):
     return False
 
 
+def instance_skip_unconfigured_lines(field, value):
+    return False
+
+
 def instance_tag_by_endpoint(field, value):
     return True
 
@@ -302,6 +326,10 @@ def instance_tls_verify(field, value):
     return False
 
 
+def instance_use_compression(field, value):
+    return False
+
+
 def instance_use_latest_spec(field, value):
     return False
 
@@ -318,5 +346,9 @@ def instance_use_process_start_time(field, value):
     return False
 
 
+def instance_use_protobuf(field, value):
+    return False
+
+
 def instance_username(field, value):
     return get_default_field_value(field, value)
@@ -62,6 +62,10 @@ def instance_connect_timeout(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_connection_pool_size(field, value):
+    return 10
+
+
 def instance_disable_generic_tags(field, value):
     return False
 
@@ -150,6 +154,10 @@ def instance_services(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_share_connections(field, value):
+    return False
+
+
 def instance_skip_proxy(field, value):
     return False
 
@@ -56,6 +56,7 @@ class InstanceConfig(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     extra_headers: Optional[Mapping[str, Any]]
@@ -77,6 +78,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
@@ -70,6 +70,10 @@ def instance_connect_timeout(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_connection_pool_size(field, value):
+    return 10
+
+
 def instance_disable_generic_tags(field, value):
     return False
 
@@ -134,6 +138,10 @@ def instance_include_labels(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_incremental_parsing(field, value):
+    return False
+
+
 def instance_kerberos_auth(field, value):
     return 'disabled'
 
@@ -162,10 +170,18 @@ def instance_kerberos_principal(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_label_plan_cache_size(field, value):
+    return 10000
+
+
 def instance_log_requests(field, value):
     return False
 
 
+def instance_max_concurrent_scrapes(field, value):
+    return 1
+
+
 def instance_metric_patterns(field, value):
     return get_default_field_value(field, value)
 
@@ -230,6 +246,10 @@ def instance_service(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_share_connections(field, value):
+    return False
+
+
 def instance_share_labels(field, value):
     return get_default_field_value(field, value)
 
@@ -238,6 +258,10 @@ def instance_skip_proxy(field, value):
     return False
 
 
+def instance_skip_unconfigured_lines(field, value):
+    return False
+
+
 def instance_tag_by_endpoint(field, value):
     return True
 
@@ -282,6 +306,10 @@ def instance_tls_verify(field, value):
     return True
 
 
+def instance_use_compression(field, value):
+    return False
+
+
 def instance_use_latest_spec(field, value):
     return False
 
@@ -294,5 +322,9 @@ def instance_use_process_start_time(field, value):
     return False
 
 
+def instance_use_protobuf(field, value):
+    return False
+
+
 def instance_username(field, value):
     return get_default_field_value(field, value)
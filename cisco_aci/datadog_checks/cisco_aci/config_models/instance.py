@@ -62,6 +62,7 @@ class InstanceConfig(BaseModel):
     cert_key_path: Optional[str]
     cert_name: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     extra_headers: Optional[Mapping[str, Any]]
@@ -84,6 +85,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     tenant: Optional[Sequence[str]]
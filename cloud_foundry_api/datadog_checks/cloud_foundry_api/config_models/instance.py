@@ -58,6 +58,7 @@ class InstanceConfig(BaseModel):
     client_id: str
     client_secret: str
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     event_filter: Optional[Sequence[str]]
@@ -81,6 +82,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     results_per_page: Optional[int] = Field(None, le=5000)
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
@@ -57,6 +57,7 @@ class InstanceConfig(BaseModel):
     aws_service: Optional[str]
     catalog_checks: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     disable_legacy_service_tag: Optional[bool]
     empty_default_hostname: Optional[bool]
@@ -85,6 +86,7 @@ class InstanceConfig(BaseModel):
     service: Optional[str]
     services_exclude: Optional[Sequence[str]]
     services_include: Optional[Sequence[str]]
+    share_connections: Optional[bool]
     single_node_install: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
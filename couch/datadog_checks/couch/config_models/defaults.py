@@ -54,6 +54,10 @@ def instance_connect_timeout(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_connection_pool_size(field, value):
+    return 10
+
+
 def instance_db_exclude(field, value):
     return get_default_field_value(field, value)
 
@@ -158,6 +162,10 @@ def instance_service(field, value):
     return get_default_field_value(field, value)
 
 
+def instance_share_connections(field, value):
+    return False
+
+
 def instance_skip_proxy(field, value):
     return False
 
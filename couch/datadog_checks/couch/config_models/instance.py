@@ -55,6 +55,7 @@ class InstanceConfig(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     db_exclude: Optional[Sequence[str]]
     db_include: Optional[Sequence[str]]
     disable_generic_tags: Optional[bool]
@@ -82,6 +83,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     server: str
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
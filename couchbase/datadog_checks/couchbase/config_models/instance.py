@@ -55,6 +55,7 @@ class InstanceConfig(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     extra_headers: Optional[Mapping[str, Any]]
@@ -79,6 +80,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     server: str
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     sync_gateway_url: Optional[str]
     tags: Optional[Sequence[str]]
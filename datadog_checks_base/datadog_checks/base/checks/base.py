@@ -10,7 +10,8 @@ import logging
 import re
 import traceback
 import unicodedata
-from collections import deque
+from collections import OrderedDict, deque
+from itertools import repeat
 from os.path import basename
 from typing import (  # noqa: F401
     TYPE_CHECKING,
@@ -29,6 +30,7 @@ from typing import (  # noqa: F401
 
 import yaml
 from six import PY2, binary_type, iteritems, raise_from, text_type
+from six.moves import intern, zip
 
 from ..config import is_affirmative
 from ..constants import ServiceCheck
@@ -42,6 +44,7 @@ from ..types import (
     ProxySettings,  # noqa: F401
     ServiceCheckStatus,  # noqa: F401
 )
+from ..utils.agent.common import METRIC_NAMESPACE_METRICS
 from ..utils.agent.utils import should_profile_memory
 from ..utils.common import ensure_bytes, to_native_string
 from ..utils.http import RequestsWrapper
@@ -88,6 +91,8 @@ if TYPE_CHECKING:
 # Metric types for which it's only useful to submit once per set of tags
 ONE_PER_CONTEXT_METRIC_TYPES = [aggregator.GAUGE, aggregator.RATE, aggregator.MONOTONIC_COUNT]
 TYPO_SIMILARITY_THRESHOLD = 0.95
+# Maximum number of submitted metric names for which the formatted name and filtering decision are memoized
+METRIC_NAMES_CACHE_SIZE = 10000
 
 
 @traced_class
@@ -229,6 +234,10 @@ class AgentCheck(object):
         if not isinstance(metric_patterns, dict):
             raise ConfigurationError('Setting `metric_patterns` must be a mapping')
 
+        # Formatted metric names keyed by submitted name, or `None` for metrics that must not be sent
+        self._metric_names = {}  # type: Dict[Tuple[AnyStr, bool], Optional[str]]
+        self._metric_names_namespace = self.__NAMESPACE__
+
         self.exclude_metrics_pattern = self._create_metrics_pattern(metric_patterns, 'exclude')
         self.include_metrics_pattern = self._create_metrics_pattern(metric_patterns, 'include')
 
@@ -289,6 +298,14 @@ class AgentCheck(object):
         # Setup metric limits
         self.metric_limiter = self._get_metric_limiter(self.name, instance=self.instance)
 
+        # Setup the opt-in cache of normalized tags, keyed by the submitted tags
+        self._normalized_tags_cache_size = self._get_normalized_tags_cache_size(instance=self.instance)
+        self._normalized_tags_cache = None  # type: Optional[OrderedDict]
+        if self._normalized_tags_cache_size > 0:
+            self._normalized_tags_cache = OrderedDict()
+        self._normalized_tags_cache_hits = 0
+        self._normalized_tags_cache_misses = 0
+
         # Lazily load and validate config
         self._config_model_instance = None  # type: Any
         self._config_model_shared = None  # type: Any
@@ -367,6 +384,23 @@ class AgentCheck(object):
 
         return limit
 
+    def _get_normalized_tags_cache_size(self, instance=None):
+        # type: (InstanceType) -> int
+        if instance is None:
+            return 0
+
+        cache_size = instance.get('normalized_tags_cache_size', 0)
+
+        try:
+            return max(int(cache_size), 0)
+        except (ValueError, TypeError):
+            self.warning(
+                "Configured 'normalized_tags_cache_size' cannot be interpreted as an integer: %s. "
+                "Disabling the normalized tags cache",
+                cache_size,
+            )
+            return 0
+
     @staticmethod
     def load_config(yaml_str):
         # type: (str) -> Any
@@ -655,9 +689,52 @@ class AgentCheck(object):
 
         aggregator.submit_event_platform_event(self, self.check_id, to_native_string(raw_event), "dbm-metadata")
 
+    @property
+    def include_metrics_pattern(self):
+        return self._include_metrics_pattern
+
+    @include_metrics_pattern.setter
+    def include_metrics_pattern(self, pattern):
+        self._include_metrics_pattern = pattern
+        self._metric_names.clear()
+
+    @property
+    def exclude_metrics_pattern(self):
+        return self._exclude_metrics_pattern
+
+    @exclude_metrics_pattern.setter
+    def exclude_metrics_pattern(self, pattern):
+        self._exclude_metrics_pattern = pattern
+        self._metric_names.clear()
+
     def should_send_metric(self, metric_name):
         return not self._metric_excluded(metric_name) and self._metric_included(metric_name)
 
+    def _get_metric_name(self, name, raw=False):
+        # type: (AnyStr, bool) -> Optional[str]
+        """
+        Return the formatted name of a submitted metric, or `None` if the metric must not be sent.
+        """
+        if self.__NAMESPACE__ != self._metric_names_namespace:
+            self._metric_names.clear()
+            self._metric_names_namespace = self.__NAMESPACE__
+
+        key = (name, raw)
+        try:
+            return self._metric_names[key]
+        except KeyError:
+            pass
+
+        metric_name = self._format_namespace(name, raw)  # type: Optional[str]
+        if not self.should_send_metric(metric_name):
+            metric_name = None
+
+        if len(self._metric_names) >= METRIC_NAMES_CACHE_SIZE:
+            self._metric_names.clear()
+
+        self._metric_names[key] = metric_name
+        return metric_name
+
     def _metric_included(self, metric_name):
         if self.include_metrics_pattern is None:
             return True
@@ -678,8 +755,8 @@ class AgentCheck(object):
             # ignore metric sample
             return
 
-        name = self._format_namespace(name, raw)
-        if not self.should_send_metric(name):
+        name = self._get_metric_name(name, raw)
+        if name is None:
             return
 
         tags = self._normalize_tags_type(tags or [], device_name, name)
@@ -852,6 +929,103 @@ class AgentCheck(object):
             aggregator.COUNTER, name, value, tags=tags, hostname=hostname, device_name=device_name, raw=raw
         )
 
+    def submit_many(self, mtypes, names, values, tags=None, hostname=None, raw=False, flush_first_value=False):
+        # type: (Union[int, Sequence[int]], Sequence[str], Sequence[float], Sequence[Sequence[str]], str, bool, bool) -> None  # noqa: E501
+        """Sample a batch of metrics given as columns, where the nth entry of every column describes the nth sample.
+
+        The namespace and the `metric_patterns` filters are applied once per unique metric name, tags are
+        normalized once per unique tags object, and the samples are forwarded to the Agent in bulk.
+
+        - **mtypes** (_Union[int, List[int]]_) - the type of every sample, or a single type for all of them
+        - **names** (_List[str]_) - the name of every sample
+        - **values** (_List[float]_) - the value of every sample
+        - **tags** (_List[List[str]]_) - the list of tags of every sample
+        - **hostname** (_str_) - a hostname to associate with all samples. Defaults to the current host.
+        - **raw** (_bool_) - whether to ignore any defined namespace prefix
+        - **flush_first_value** (_bool_) - whether to sample the first value of monotonic counters
+        """
+        if isinstance(mtypes, int):
+            mtypes = repeat(mtypes)
+        if tags is None:
+            tags = repeat(None)
+        if hostname is None:
+            hostname = ''
+
+        # Keep a reference to every tags object so that its id can't be reused during the batch
+        normalized_tags = {}  # type: Dict[int, Tuple[Any, List[str]]]
+
+        batch_types = []  # type: List[int]
+        batch_names = []  # type: List[str]
+        batch_values = []  # type: List[float]
+        batch_tags = []  # type: List[List[str]]
+
+        for mtype, name, value, sample_tags in zip(mtypes, names, values, tags):
+            if value is None:
+                # ignore metric sample
+                continue
+
+            formatted_name = self._get_metric_name(name, raw)
+            if formatted_name is None:
+                continue
+
+            try:
+                sample_normalized_tags = normalized_tags[id(sample_tags)][1]
+            except KeyError:
+                sample_normalized_tags = self._normalize_tags_type(sample_tags or [], metric_name=formatted_name)
+                normalized_tags[id(sample_tags)] = (sample_tags, sample_normalized_tags)
+
+            if self.metric_limiter:
+                if mtype in ONE_PER_CONTEXT_METRIC_TYPES:
+                    if self.metric_limiter.is_reached():
+                        continue
+                else:
+                    context = self._context_uid(mtype, formatted_name, sample_normalized_tags, hostname)
+                    if self.metric_limiter.is_reached(context):
+                        continue
+
+            try:
+                value = float(value)
+            except ValueError:
+                err_msg = 'Metric: {} has non float value: {}. Only float values can be submitted as metrics.'.format(
+                    repr(formatted_name), repr(value)
+                )
+                if using_stub_aggregator:
+                    raise ValueError(err_msg)
+                self.warning(err_msg)
+                continue
+
+            batch_types.append(mtype)
+            batch_names.append(formatted_name)
+            batch_values.append(value)
+            batch_tags.append(sample_normalized_tags)
+
+        if not batch_names:
+            return
+
+        submit_metrics = getattr(aggregator, 'submit_metrics', None)
+        if submit_metrics is not None:
+            submit_metrics(
+                self, self.check_id, batch_types, batch_names, batch_values, batch_tags, hostname, flush_first_value
+            )
+        else:
+            # Older Agents have no bulk entry point
+            for mtype, name, value, sample_tags in zip(batch_types, batch_names, batch_values, batch_tags):
+                aggregator.submit_metric(
+                    self, self.check_id, mtype, name, value, sample_tags, hostname, flush_first_value
+                )
+
+    def gauge_batch(self, names, values, tags=None, hostname=None, raw=False):
+        # type: (Sequence[str], Sequence[float], Sequence[Sequence[str]], str, bool) -> None
+        """Sample a batch of gauge metrics given as columns, see `submit_many`.
+
+        - **names** (_List[str]_) - the name of every sample
+        - **values** (_List[float]_) - the value of every sample
+        - **tags** (_List[List[str]]_) - the list of tags of every sample
+        - **hostname** (_str_) - a hostname to associate with all samples. Defaults to the current host.
+        - **raw** (_bool_) - whether to ignore any defined namespace prefix
+        """
+        self.submit_many(aggregator.GAUGE, names, values, tags=tags, hostname=hostname, raw=raw)
+
     def service_check(self, name, status, tags=None, hostname=None, message=None, raw=False):
         # type: (str, ServiceCheckStatus, Sequence[str], str, str, bool) -> None
         """Send the status of a service.
@@ -1160,6 +1334,17 @@ class AgentCheck(object):
 
                 self.metric_limiter.reset()
 
+            if self._normalized_tags_cache is not None:
+                if is_affirmative(self.debug_metrics.get('normalized_tags_cache', False)):
+                    debug_metrics = self._get_normalized_tags_cache_debug_metrics()
+
+                    tags = self.get_debug_metric_tags()
+                    for metric_name, value in debug_metrics:
+                        self.gauge(metric_name, value, tags=tags, raw=True)
+
+                self._normalized_tags_cache_hits = 0
+                self._normalized_tags_cache_misses = 0
+
         return error_report
 
     def event(self, event):
@@ -1219,6 +1404,37 @@ class AgentCheck(object):
         - normalize tags type
         - doesn't mutate the passed list, returns a new list
         """
+        normalized_tags_cache = self._normalized_tags_cache
+        if normalized_tags_cache is None or device_name:
+            return self._normalize_tags(tags, device_name, metric_name)
+
+        tags = tuple(tags)
+        try:
+            # Popping and re-inserting marks the entry as the most recently used one
+            cached_tags = normalized_tags_cache.pop(tags, None)
+        except TypeError:
+            # Unhashable tags can't be cached
+            return self._normalize_tags(tags, device_name, metric_name)
+
+        if cached_tags is not None:
+            self._normalized_tags_cache_hits += 1
+            normalized_tags_cache[tags] = cached_tags
+            return list(cached_tags)
+
+        self._normalized_tags_cache_misses += 1
+        normalized_tags = self._normalize_tags(tags, device_name, metric_name)
+        normalized_tags_cache[tags] = tuple(intern(tag) if isinstance(tag, str) else tag for tag in normalized_tags)
+        if len(normalized_tags_cache) > self._normalized_tags_cache_size:
+            try:
+                normalized_tags_cache.popitem(last=False)
+            except KeyError:
+                # Evicted by a submission from another thread
+                pass
+
+        return normalized_tags
+
+    def _normalize_tags(self, tags, device_name=None, metric_name=None):
+        # type: (Sequence[Union[None, str, bytes]], str, str) -> List[str]
         normalized_tags = []
 
         if device_name:
@@ -1244,6 +1460,13 @@ class AgentCheck(object):
                 normalized_tags.append(tag)
         return normalized_tags
 
+    def _get_normalized_tags_cache_debug_metrics(self):
+        return (
+            ('{}.tags_cache.size'.format(METRIC_NAMESPACE_METRICS), len(self._normalized_tags_cache)),
+            ('{}.tags_cache.hits'.format(METRIC_NAMESPACE_METRICS), self._normalized_tags_cache_hits),
+            ('{}.tags_cache.misses'.format(METRIC_NAMESPACE_METRICS), self._normalized_tags_cache_misses),
+        )
+
     def degeneralise_tag(self, tag):
         split_tag = tag.split(':', 1)
         if len(split_tag) > 1:
@@ -4,12 +4,14 @@
 # TODO: remove ignore when we stop invoking Mypy with --py2
 # type: ignore
 from collections import ChainMap
+from concurrent.futures import ThreadPoolExecutor
 from contextlib import contextmanager
 
 from requests.exceptions import RequestException
 from six import raise_from
 
 from ....errors import ConfigurationError
+from ....utils.time import get_precise_time
 from ....utils.tracing import traced_class
 from ... import AgentCheck
 from .scraper import OpenMetricsScraper
@@ -51,26 +53,61 @@ class OpenMetricsBaseCheckV2(AgentCheck):
         # All configured scrapers keyed by the endpoint
         self.scrapers = {}
 
+        # The number of endpoints whose responses are downloaded at the same time
+        self.max_concurrent_scrapes = self.instance.get('max_concurrent_scrapes', 1) if self.instance else 1
+
         self.check_initializations.append(self.configure_scrapers)
 
     def check(self, _):
         self.refresh_scrapers()
 
-        for endpoint, scraper in self.scrapers.items():
-            self.log.debug('Scraping OpenMetrics endpoint: %s', endpoint)
+        if self.max_concurrent_scrapes > 1 and len(self.scrapers) > 1:
+            self.scrape_concurrently()
+        else:
+            for endpoint, scraper in self.scrapers.items():
+                self.scrape_endpoint(endpoint, scraper)
+
+    def scrape_endpoint(self, endpoint, scraper, prefetcher=None):
+        self.log.debug('Scraping OpenMetrics endpoint: %s', endpoint)
+
+        with self.adopt_namespace(scraper.namespace):
+            start_time = get_precise_time()
+
+            try:
+                scraper.scrape()
+            except (ConnectionError, RequestException) as e:
+                self.log.error("There was an error scraping endpoint %s: %s", endpoint, str(e))
+                raise_from(type(e)("There was an error scraping endpoint {}: {}".format(endpoint, e)), None)
+
+            scraper.submit_telemetry_scrape_time(get_precise_time() - start_time, prefetcher)
 
-            with self.adopt_namespace(scraper.namespace):
-                try:
-                    scraper.scrape()
-                except (ConnectionError, RequestException) as e:
-                    self.log.error("There was an error scraping endpoint %s: %s", endpoint, str(e))
-                    raise_from(type(e)("There was an error scraping endpoint {}: {}".format(endpoint, e)), None)
+    def scrape_concurrently(self):
+        """
+        Download the responses of all endpoints in worker threads while scraping them one by one on the check thread.
+        """
+
+        prefetchers = []
+        with ThreadPoolExecutor(max_workers=min(self.max_concurrent_scrapes, len(self.scrapers))) as executor:
+            try:
+                # Requests are sent in the order the endpoints are scraped so that
+                # the worker threads are never all waiting on endpoints scraped later
+                for scraper in self.scrapers.values():
+                    prefetchers.append(scraper.prefetch(executor))
+
+                for (endpoint, scraper), prefetcher in zip(self.scrapers.items(), prefetchers):
+                    self.scrape_endpoint(endpoint, scraper, prefetcher)
+            finally:
+                for prefetcher in prefetchers:
+                    prefetcher.stop()
 
     def configure_scrapers(self):
         """
         Creates a scraper configuration for each instance.
         """
 
+        if not isinstance(self.max_concurrent_scrapes, int) or self.max_concurrent_scrapes < 1:
+            raise ConfigurationError('Setting `max_concurrent_scrapes` must be a positive integer')
+
         scrapers = {}
 
         for config in self.scraper_configs:
@@ -0,0 +1,134 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from queue import Empty, Full, Queue
+from threading import Event
+
+from requests import Response
+
+from ....utils.time import get_precise_time
+
+# The number of chunks that may be downloaded ahead of parsing
+PREFETCH_QUEUE_SIZE = 64
+PREFETCH_CHUNK_SIZE = 65536
+
+# How long a worker waits before checking again whether the download was stopped
+STOP_POLL_INTERVAL = 0.1
+
+END_OF_BODY = object()
+
+
+class ResponsePrefetcher:
+    """
+    Send a request and download the response body in a worker thread, handing the body over a bounded queue.
+
+    The response that is made available to the check thread is a copy whose body is read from the queue,
+    so that parsing happens while the rest of the body is still being downloaded.
+    """
+
+    def __init__(self, send_request, queue_size=PREFETCH_QUEUE_SIZE):
+        self.send_request = send_request
+        self.queue = Queue(queue_size)
+        self.stopped = Event()
+        self.ready = Event()
+
+        self.response = None
+        self.error = None
+
+        # Seconds until the response headers were received and until the body was fully received
+        self.request_time = None
+        self.download_time = None
+
+    def run(self):
+        start_time = get_precise_time()
+
+        try:
+            response = self.send_request()
+        except Exception as e:
+            self.error = e
+            self.ready.set()
+            return
+
+        with response:
+            self.response = self.copy_response(response)
+            self.request_time = get_precise_time() - start_time
+            self.ready.set()
+
+            try:
+                for chunk in response.iter_content(chunk_size=PREFETCH_CHUNK_SIZE):
+                    if not self.put(chunk):
+                        return
+            except Exception as e:
+                self.put(e)
+                return
+            finally:
+                self.download_time = get_precise_time() - start_time
+
+        self.put(END_OF_BODY)
+
+    def get_response(self):
+        """
+        Wait for the response headers and return the response, or raise the error that prevented the request.
+        """
+        self.ready.wait()
+        if self.error is not None:
+            raise self.error
+
+        return self.response
+
+    def stop(self):
+        """
+        Stop downloading the response body and release the worker.
+        """
+        self.stopped.set()
+
+    def put(self, item):
+        while not self.stopped.is_set():
+            try:
+                self.queue.put(item, timeout=STOP_POLL_INTERVAL)
+            except Full:
+                continue
+            else:
+                return True
+
+        return False
+
+    def read(self, *args):
+        """
+        Return the next downloaded chunk of the body, or an empty chunk when the body was fully read.
+        """
+        while True:
+            try:
+                item = self.queue.get(timeout=STOP_POLL_INTERVAL)
+            except Empty:
+                if self.stopped.is_set():
+                    return b''
+
+                continue
+
+            if item is END_OF_BODY:
+                self.stopped.set()
+                return b''
+            elif isinstance(item, Exception):
+                self.stopped.set()
+                raise item
+
+            return item
+
+    def close(self):
+        self.stop()
+
+    def copy_response(self, response):
+        copied_response = Response()
+        copied_response.status_code = response.status_code
+        copied_response.headers = response.headers
+        copied_response.encoding = response.encoding
+        copied_response.reason = response.reason
+        copied_response.url = response.url
+        copied_response.request = response.request
+        copied_response.cookies = response.cookies
+        copied_response.elapsed = response.elapsed
+
+        # Without a `stream` method, `requests` reads the body with `raw.read` until an empty chunk is returned
+        copied_response.raw = self
+        return copied_response
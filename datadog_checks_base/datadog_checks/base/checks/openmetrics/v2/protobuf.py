@@ -0,0 +1,117 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+from google.protobuf.internal.decoder import _DecodeVarint32  # pylint: disable=E0611,E0401
+from prometheus_client.metrics_core import Metric
+from prometheus_client.samples import Sample
+from prometheus_client.utils import floatToGoString
+
+from ....utils.prometheus import metrics_pb2
+
+PROTOBUF_MEDIA_TYPE = 'application/vnd.google.protobuf'
+PROTOBUF_ACCEPT_HEADER = f'{PROTOBUF_MEDIA_TYPE};proto=io.prometheus.client.MetricFamily;encoding=delimited'
+PROTOBUF_CHUNK_SIZE = 65536
+
+# https://github.com/prometheus/client_model/blob/v0.4.0/io/prometheus/client/metrics.proto#L27-L38
+METRIC_TYPES = {
+    metrics_pb2.COUNTER: 'counter',
+    metrics_pb2.GAUGE: 'gauge',
+    metrics_pb2.SUMMARY: 'summary',
+    metrics_pb2.UNTYPED: 'unknown',
+    metrics_pb2.HISTOGRAM: 'histogram',
+}
+
+POSITIVE_INFINITY = float('inf')
+
+
+def parse_protobuf(chunks):
+    """
+    Yield the metric families of a stream of `MetricFamily` messages, each prefixed by its varint32 encoded length.
+
+    The metric families are the same as those of the text format parsers of `prometheus_client`.
+    """
+    buf = b''
+    position = 0
+    for chunk in chunks:
+        buf = buf[position:] + chunk
+        position = 0
+
+        while position < len(buf):
+            try:
+                message_length, message_position = _DecodeVarint32(buf, position)
+            except IndexError:
+                # The length prefix is split across chunks
+                break
+
+            message_end = message_position + message_length
+            if message_end > len(buf):
+                break
+
+            message = metrics_pb2.MetricFamily()
+            message.ParseFromString(buf[message_position:message_end])
+            position = message_end
+
+            yield metric_family_to_metric(message)
+
+    if position < len(buf):
+        raise ValueError('Protobuf payload ends with an incomplete message')
+
+
+def metric_family_to_metric(message):
+    metric_type = METRIC_TYPES.get(message.type, 'unknown')
+
+    # The text format parser removes the suffix of counter names
+    metric_name = message.name
+    if metric_type == 'counter' and metric_name.endswith('_total'):
+        metric_name = metric_name[:-6]
+
+    metric = Metric(metric_name, message.help, metric_type)
+    add_sample = metric.samples.append
+
+    for entry in message.metric:
+        labels = {label.name: label.value for label in entry.label}
+        timestamp = entry.timestamp_ms / 1000 if entry.HasField('timestamp_ms') else None
+
+        if metric_type == 'counter':
+            add_sample(Sample(f'{metric_name}_total', labels, entry.counter.value, timestamp))
+        elif metric_type == 'gauge':
+            add_sample(Sample(metric_name, labels, entry.gauge.value, timestamp))
+        elif metric_type == 'summary':
+            summary = entry.summary
+            for quantile in summary.quantile:
+                add_sample(
+                    Sample(
+                        metric_name,
+                        {**labels, 'quantile': floatToGoString(quantile.quantile)},
+                        quantile.value,
+                        timestamp,
+                    )
+                )
+
+            add_sample(Sample(f'{metric_name}_sum', labels.copy(), summary.sample_sum, timestamp))
+            add_sample(Sample(f'{metric_name}_count', labels.copy(), float(summary.sample_count), timestamp))
+        elif metric_type == 'histogram':
+            histogram = entry.histogram
+            bucket_name = f'{metric_name}_bucket'
+            upper_bound = None
+            for bucket in histogram.bucket:
+                upper_bound = bucket.upper_bound
+                add_sample(
+                    Sample(
+                        bucket_name,
+                        {**labels, 'le': floatToGoString(upper_bound)},
+                        float(bucket.cumulative_count),
+                        timestamp,
+                    )
+                )
+
+            # The text format always exposes the implicit `+Inf` bucket
+            if upper_bound != POSITIVE_INFINITY:
+                add_sample(Sample(bucket_name, {**labels, 'le': '+Inf'}, float(histogram.sample_count), timestamp))
+
+            add_sample(Sample(f'{metric_name}_sum', labels.copy(), histogram.sample_sum, timestamp))
+            add_sample(Sample(f'{metric_name}_count', labels.copy(), float(histogram.sample_count), timestamp))
+        else:
+            add_sample(Sample(metric_name, labels, entry.untyped.value, timestamp))
+
+    return metric
@@ -4,6 +4,7 @@
 import fnmatch
 import inspect
 import re
+from collections import OrderedDict
 from copy import copy, deepcopy
 from itertools import chain
 from math import isinf, isnan
@@ -12,21 +13,38 @@ from typing import List  # noqa: F401
 from prometheus_client.openmetrics.parser import text_fd_to_metric_families as parse_openmetrics
 from prometheus_client.parser import text_fd_to_metric_families as parse_prometheus
 from requests.exceptions import ConnectionError
+from urllib3.util.request import ACCEPT_ENCODING
 
 from ....config import is_affirmative
 from ....constants import ServiceCheck
 from ....errors import ConfigurationError
 from ....utils.functions import no_op, return_true
+from ....utils.headers import get_default_headers
 from ....utils.http import RequestsWrapper
 from .first_scrape_handler import first_scrape_handler
 from .labels import LabelAggregator, get_label_normalizer
+from .prefetch import ResponsePrefetcher
+from .protobuf import PROTOBUF_ACCEPT_HEADER, PROTOBUF_CHUNK_SIZE, PROTOBUF_MEDIA_TYPE, parse_protobuf
 from .transform import MetricTransformer
+from .utils import copy_sample_data, get_block_size, iter_metric_family_blocks
 
 try:
     import datadog_agent
 except ImportError:
     from datadog_checks.base.stubs import datadog_agent
 
+# Sample lines may only start with the name of a metric
+METRIC_NAME_PATTERN = re.compile(r'[^{\s]+')
+
+# Suffixes that samples may add to the name of the metric family they belong to
+SAMPLE_NAME_SUFFIXES = frozenset(('', '_total', '_created', '_bucket', '_sum', '_count', '_gsum', '_gcount', '_info'))
+
+# Suffixes that the parsers remove from the name of the metric family
+METRIC_FAMILY_NAME_SUFFIXES = ('_total', '_info')
+
+# Content codings that the HTTP client decompresses while streaming, in order of preference
+COMPRESSED_ENCODINGS = 'zstd, gzip, deflate' if 'zstd' in ACCEPT_ENCODING else 'gzip, deflate'
+
 
 class OpenMetricsScraper:
     """
@@ -217,14 +235,26 @@ class OpenMetricsScraper:
 
             self.raw_line_filter = re.compile('|'.join(raw_line_filters))
 
+        # Lines of metric families that would not be collected are skipped by name before being parsed
+        self.skip_unconfigured_lines = is_affirmative(config.get('skip_unconfigured_lines', False))
+
         self.http = RequestsWrapper(config, self.check.init_config, self.check.HTTP_CONFIG_REMAPPER, self.check.log)
 
         self._content_type = ''
         self._use_latest_spec = is_affirmative(config.get('use_latest_spec', False))
+        self.use_protobuf = is_affirmative(config.get('use_protobuf', False))
+        if self.use_protobuf and self._use_latest_spec:
+            raise ConfigurationError('Setting `use_protobuf` cannot be used with `use_latest_spec`')
+
         # Accept headers are taken from:
         # https://github.com/prometheus/prometheus/blob/v2.43.0/scrape/scrape.go#L787
         if self._use_latest_spec:
             accept_header = 'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1'
+        elif self.use_protobuf:
+            accept_header = (
+                f'{PROTOBUF_ACCEPT_HEADER},application/openmetrics-text;version=1.0.0;q=0.8,'
+                'application/openmetrics-text;version=0.0.1;q=0.75,text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
+            )
         else:
             accept_header = (
                 'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1;q=0.75,'
@@ -235,25 +265,136 @@ class OpenMetricsScraper:
         if self.http.options['headers'].get('Accept') == '*/*':
             self.http.options['headers']['Accept'] = accept_header
 
+        # Explicitly negotiate the most efficient compression and report how many bytes it saves
+        self.use_compression = is_affirmative(config.get('use_compression', False))
+        default_accept_encoding = get_default_headers()['Accept-Encoding']
+        if self.use_compression and self.http.options['headers'].get('Accept-Encoding') == default_accept_encoding:
+            self.http.options['headers']['Accept-Encoding'] = COMPRESSED_ENCODINGS
+
         self.use_process_start_time = is_affirmative(config.get('use_process_start_time'))
 
         # Used for monotonic counts
         self.flush_first_value = False
 
+        # Compiled label plans are keyed by metric name and label set, and are reused across scrapes
+        label_plan_cache_size = config.get('label_plan_cache_size', 10000)
+        if not isinstance(label_plan_cache_size, int) or label_plan_cache_size < 0:
+            raise ConfigurationError('Setting `label_plan_cache_size` must be a non-negative integer')
+
+        self.label_plan_cache_size = label_plan_cache_size
+        self._label_plans = OrderedDict()
+        self._label_plans_tags = self.tags
+        # The number of distinct cached plans used by the current scrape, they are the most recently used ones
+        self._label_plans_used = 0
+        # Cached plans are stored with the number of the last scrape that used them
+        self._label_plans_scrape = 0
+
+        # Metric family blocks whose bytes are unchanged since the previous scrape are not parsed again
+        self.incremental_parsing = is_affirmative(config.get('incremental_parsing', False))
+        if self.incremental_parsing and self.label_aggregator.configured:
+            raise ConfigurationError('Setting `incremental_parsing` cannot be used with `share_labels`')
+
+        self._parsed_blocks = {}
+        self._parsed_blocks_state = None
+
+        # Set when the request was sent ahead of the scrape by a worker thread
+        self._prefetcher = None
+
     def scrape(self):
         """
         Execute a scrape, and for each metric collected, transform the metric.
         """
         runtime_data = {'flush_first_value': self.flush_first_value, 'static_tags': self.static_tags}
+        self._label_plans_used = 0
+        self._label_plans_scrape += 1
+
+        # The first scrape may need to see the whole payload before deciding whether to flush counters
+        if self.incremental_parsing and (self.flush_first_value or not self.use_process_start_time):
+            self.scrape_incrementally(runtime_data)
+        else:
+            for metric in self.consume_metrics(runtime_data):
+                transformer = self.metric_transformer.get(metric)
+                if transformer is None:
+                    continue
+
+                transformer(metric, self.generate_sample_data(metric), runtime_data)
+
+        self.flush_first_value = True
+
+    def scrape_incrementally(self, runtime_data):
+        """
+        Execute a scrape, parsing only the metric family blocks that changed since the previous scrape.
+        """
+        line_streamer = self.stream_lines()
+        if line_streamer is None:
+            return
+
+        # Binary payloads cannot be split into metric family blocks
+        if self.parse_metric_families is parse_protobuf:
+            for metric in self.filter_excluded_metrics(self.parse_lines(line_streamer)):
+                transformer = self.metric_transformer.get(metric)
+                if transformer is not None:
+                    transformer(metric, self.generate_sample_data(metric), runtime_data)
+
+            return
+
+        state = (self._content_type, self.tags)
+        if state != self._parsed_blocks_state:
+            self._parsed_blocks.clear()
+            self._parsed_blocks_state = state
+
+        parsed_blocks = {}
+        parsed_bytes = 0
+        skipped_bytes = 0
+
+        for block in iter_metric_family_blocks(line_streamer):
+            # Keyed by the lines themselves, so that blocks whose hashes collide are still told apart
+            block_key = tuple(block)
+            entries = self._parsed_blocks.get(block_key)
+            if entries is None:
+                parsed_bytes += get_block_size(block)
+                entries = self.parse_metric_family_block(block, runtime_data)
+                unchanged = False
+            else:
+                skipped_bytes += get_block_size(block)
+                unchanged = True
+
+            parsed_blocks[block_key] = entries
+            for metric, transformer, sample_data, skip_unchanged in entries:
+                if unchanged and skip_unchanged:
+                    continue
+
+                transformer(metric, copy_sample_data(metric, sample_data), runtime_data)
 
-        for metric in self.consume_metrics(runtime_data):
+        # Blocks absent from this scrape are forgotten
+        self._parsed_blocks = parsed_blocks
+
+        self.submit_telemetry_number_of_parsed_bytes(parsed_bytes)
+        self.submit_telemetry_number_of_skipped_bytes(skipped_bytes)
+
+    def parse_metric_family_block(self, block, runtime_data):
+        """
+        Parse a metric family block and return what is needed to transform its metrics again.
+        """
+        lines = iter(block)
+        if self.parse_metric_families is parse_openmetrics:
+            lines = chain(lines, ['# EOF'])
+
+        entries = []
+        for metric in self.filter_excluded_metrics(self.parse_lines(lines)):
             transformer = self.metric_transformer.get(metric)
             if transformer is None:
                 continue
 
-            transformer(metric, self.generate_sample_data(metric), runtime_data)
+            # The value of an unchanged counter is the same, so there is no new delta to submit
+            skip_unchanged = metric.type == 'counter' and self.metric_transformer.get_type(metric) in (
+                'counter',
+                'native',
+                'native_dynamic',
+            )
+            entries.append((metric, transformer, list(self.generate_sample_data(metric)), skip_unchanged))
 
-        self.flush_first_value = True
+        return entries
 
     def consume_metrics(self, runtime_data):
         """
@@ -266,7 +407,14 @@ class OpenMetricsScraper:
         if self.label_aggregator.configured:
             metric_parser = self.label_aggregator(metric_parser)
 
-        for metric in metric_parser:
+        yield from self.filter_excluded_metrics(metric_parser)
+
+    def filter_excluded_metrics(self, metrics):
+        """
+        Filter out excluded metrics.
+        """
+
+        for metric in metrics:
             if metric.name in self.exclude_metrics or (
                 self.exclude_metrics_pattern is not None and self.exclude_metrics_pattern.search(metric.name)
             ):
@@ -280,9 +428,18 @@ class OpenMetricsScraper:
         Get the line streamer and yield processed metrics.
         """
 
+        line_streamer = self.stream_lines()
+        if line_streamer is None:
+            return
+
+        yield from self.parse_lines(line_streamer)
+
+    def stream_lines(self):
+        """
+        Return the filtered line streamer, or `None` if there is nothing to parse.
+        """
+
         line_streamer = self.stream_connection_lines()
-        if self.raw_line_filter is not None:
-            line_streamer = self.filter_connection_lines(line_streamer)
 
         # Since we determine `self.parse_metric_families` dynamically from the response and that's done as a
         # side effect inside the `line_streamer` generator, we need to consume the first line in order to
@@ -291,9 +448,25 @@ class OpenMetricsScraper:
             line_streamer = chain([next(line_streamer)], line_streamer)
         except StopIteration:
             # If line_streamer is an empty iterator, next(line_streamer) fails.
-            return
+            return None
+
+        # Binary payloads are not made of lines
+        if self.parse_metric_families is parse_protobuf:
+            return line_streamer
+
+        if self.raw_line_filter is not None:
+            line_streamer = self.filter_connection_lines(line_streamer)
+        if self.skip_unconfigured_lines:
+            line_streamer = self.filter_unconfigured_lines(line_streamer)
 
-        for metric in self.parse_metric_families(line_streamer):
+        return line_streamer
+
+    def parse_lines(self, lines):
+        """
+        Yield processed metrics parsed from lines.
+        """
+
+        for metric in self.parse_metric_families(lines):
             self.submit_telemetry_number_of_total_metric_samples(metric)
 
             # It is critical that the prefix is removed immediately so that
@@ -306,6 +479,9 @@ class OpenMetricsScraper:
     @property
     def parse_metric_families(self):
         media_type = self._content_type.split(';')[0]
+        if media_type == PROTOBUF_MEDIA_TYPE:
+            return parse_protobuf
+
         # Setting `use_latest_spec` forces the use of the OpenMetrics format, otherwise
         # the format will be chosen based on the media type specified in the response's content-header.
         # The selection is based on what Prometheus does:
@@ -323,54 +499,103 @@ class OpenMetricsScraper:
 
         label_normalizer = get_label_normalizer(metric.type)
 
+        # Every plan embeds the tags that were set when it was compiled
+        if self._label_plans_tags is not self.tags:
+            self._label_plans.clear()
+            self._label_plans_tags = self.tags
+            self._label_plans_used = 0
+
+        label_plans = self._label_plans
+        current_scrape = self._label_plans_scrape
+        metric_name = metric.name
+
         for sample in metric.samples:
             value = sample.value
             if isnan(value) or isinf(value):
                 self.log.debug('Ignoring sample for metric `%s` as it has an invalid value: %s', metric.name, value)
                 continue
 
-            tags = []
-            skip_sample = False
             labels = sample.labels
             self.label_aggregator.populate(labels)
             label_normalizer(labels)
 
-            for label_name, label_value in labels.items():
-                sample_excluder = self.exclude_metrics_by_labels.get(label_name)
-                if sample_excluder is not None and sample_excluder(label_value):
-                    skip_sample = True
-                    break
-                elif label_name in self.exclude_labels:
-                    continue
-                elif self.include_labels and label_name not in self.include_labels:
-                    continue
+            plan_key = (metric_name, tuple(labels.items()))
+            entry = label_plans.get(plan_key)
+            if entry is None:
+                plan = self.compile_label_plan(labels)
+                if self.label_plan_cache_size:
+                    if len(label_plans) < self.label_plan_cache_size:
+                        label_plans[plan_key] = (current_scrape, plan)
+                        self._label_plans_used += 1
+                    elif self._label_plans_used < len(label_plans):
+                        # Evict the least recently used plan, which is not used by this scrape
+                        label_plans.popitem(last=False)
+                        label_plans[plan_key] = (current_scrape, plan)
+                        self._label_plans_used += 1
+                    # Otherwise the scrape has more label sets than the cache holds, evicting the plans it already
+                    # used would only let the next scrape miss them in turn.
+            else:
+                last_scrape, plan = entry
+                label_plans.move_to_end(plan_key)
+                # Samples of a family may share a label set, e.g. the sum and count of a summary
+                if last_scrape != current_scrape:
+                    label_plans[plan_key] = (current_scrape, plan)
+                    self._label_plans_used += 1
+
+            if plan is None:
+                continue
 
-                label_name = self.rename_labels.get(label_name, label_name)
-                tags.append(f'{label_name}:{label_value}')
+            tags, hostname = plan
+
+            self.submit_telemetry_number_of_processed_metric_samples()
+            # Transformers are free to modify the tags they receive
+            yield sample, list(tags), hostname
+
+    def compile_label_plan(self, labels):
+        """
+        Return the tags and hostname for a label set, or `None` if samples with these labels must be skipped.
+        """
 
-            if skip_sample:
+        tags = []
+        for label_name, label_value in labels.items():
+            sample_excluder = self.exclude_metrics_by_labels.get(label_name)
+            if sample_excluder is not None and sample_excluder(label_value):
+                return None
+            elif label_name in self.exclude_labels:
+                continue
+            elif self.include_labels and label_name not in self.include_labels:
                 continue
 
-            tags.extend(self.tags)
+            label_name = self.rename_labels.get(label_name, label_name)
+            tags.append(f'{label_name}:{label_value}')
 
-            hostname = ""
-            if self.hostname_label and self.hostname_label in labels:
-                hostname = labels[self.hostname_label]
-                if self.hostname_formatter is not None:
-                    hostname = self.hostname_formatter(hostname)
+        tags.extend(self.tags)
 
-            self.submit_telemetry_number_of_processed_metric_samples()
-            yield sample, tags, hostname
+        hostname = ''
+        if self.hostname_label and self.hostname_label in labels:
+            hostname = labels[self.hostname_label]
+            if self.hostname_formatter is not None:
+                hostname = self.hostname_formatter(hostname)
+
+        return tuple(tags), hostname
 
     def stream_connection_lines(self):
         """
-        Yield the connection line.
+        Yield the connection line, or chunks of bytes for binary payloads.
         """
 
         try:
             with self.get_connection() as connection:
                 # Media type will be used to select parser dynamically
                 self._content_type = connection.headers.get('Content-Type', '')
+                if self.use_compression:
+                    yield from self.stream_decompressed_content(connection)
+                    return
+
+                if self.parse_metric_families is parse_protobuf:
+                    yield from connection.iter_content(chunk_size=PROTOBUF_CHUNK_SIZE)
+                    return
+
                 for line in connection.iter_lines(decode_unicode=True):
                     yield line
         except ConnectionError as e:
@@ -379,6 +604,29 @@ class OpenMetricsScraper:
             else:
                 raise e
 
+    def stream_decompressed_content(self, connection):
+        """
+        Yield the connection lines, or chunks of bytes for binary payloads, while counting the decompressed bytes.
+        """
+
+        decompressed_size = 0
+
+        if self.parse_metric_families is parse_protobuf:
+            for chunk in connection.iter_content(chunk_size=PROTOBUF_CHUNK_SIZE):
+                decompressed_size += len(chunk)
+                yield chunk
+        else:
+            # The lines are split as bytes so that their size can be counted, line separators included
+            encoding = connection.encoding or 'utf-8'
+            for line in connection.iter_lines():
+                decompressed_size += len(line) + 1
+                yield line.decode(encoding, errors='replace')
+
+        # The raw stream tells how many bytes were received, before decompression
+        tell = getattr(connection.raw, 'tell', None)
+        received_size = tell() if tell is not None else None
+        self.submit_telemetry_payload_compression(connection, received_size, decompressed_size)
+
     def filter_connection_lines(self, line_streamer):
         """
         Filter connection lines in the line streamer.
@@ -390,13 +638,98 @@ class OpenMetricsScraper:
             else:
                 yield line
 
+    def filter_unconfigured_lines(self, line_streamer):
+        """
+        Skip the lines of metric families that would not be collected, reading only the metric names.
+        """
+
+        decisions = {}
+        family = None
+        collected = True
+        skipped_lines = 0
+
+        for line in line_streamer:
+            if line.startswith('#'):
+                parts = line.split(None, 3)
+                if len(parts) > 2 and parts[1] in ('HELP', 'TYPE', 'UNIT'):
+                    if parts[2] != family:
+                        family = parts[2]
+                        collected = self.is_metric_family_collected(family, decisions)
+
+                    if not collected:
+                        skipped_lines += 1
+                        continue
+
+                yield line
+                continue
+
+            match = METRIC_NAME_PATTERN.match(line)
+            if match is None:
+                yield line
+                continue
+
+            # Samples of untyped metrics are not preceded by a metric family declaration
+            name = match.group()
+            if family is None or not name.startswith(family) or name[len(family) :] not in SAMPLE_NAME_SUFFIXES:
+                family = name
+                collected = self.is_metric_family_collected(family, decisions)
+
+            if collected:
+                yield line
+            else:
+                skipped_lines += 1
+
+        self.submit_telemetry_number_of_skipped_lines(skipped_lines)
+
+    def is_metric_family_collected(self, family, decisions):
+        """
+        Return whether the metrics of a metric family may be collected, based only on its name.
+        """
+
+        collected = decisions.get(family)
+        if collected is not None:
+            return collected
+
+        metric_name = family
+        if self.raw_metric_prefix and metric_name.startswith(self.raw_metric_prefix):
+            metric_name = metric_name[len(self.raw_metric_prefix) :]
+
+        # The parsers may rename the metric family depending on its type, which is not known yet
+        metric_names = [metric_name]
+        for suffix in METRIC_FAMILY_NAME_SUFFIXES:
+            if metric_name.endswith(suffix):
+                metric_names.append(metric_name[: -len(suffix)])
+
+        collected = False
+        for metric_name in metric_names:
+            if (self.use_process_start_time and metric_name == 'process_start_time_seconds') or (
+                self.label_aggregator.configured and metric_name in self.label_aggregator.metric_config
+            ):
+                collected = True
+                break
+            elif metric_name in self.exclude_metrics or (
+                self.exclude_metrics_pattern is not None and self.exclude_metrics_pattern.search(metric_name)
+            ):
+                continue
+            elif self.metric_transformer.is_configured(metric_name):
+                collected = True
+                break
+
+        decisions[family] = collected
+        return collected
+
     def get_connection(self):
         """
         Send a request to scrape metrics. Return the response or throw an exception.
         """
 
+        # A prefetched response is used only once and only during the scrape it was requested for
+        prefetcher, self._prefetcher = self._prefetcher, None
+        if prefetcher is not None and prefetcher.stopped.is_set():
+            prefetcher = None
+
         try:
-            response = self.send_request()
+            response = self.send_request() if prefetcher is None else prefetcher.get_response()
         except Exception as e:
             self.submit_health_check(ServiceCheck.CRITICAL, message=str(e))
             raise
@@ -415,9 +748,22 @@ class OpenMetricsScraper:
                     response.encoding = 'utf-8'
 
                 self.submit_telemetry_endpoint_response_size(response)
+                if self.http.share_connections:
+                    self.submit_telemetry_connection_stats(self.http.connection_stats)
 
                 return response
 
+    def prefetch(self, executor):
+        """
+        Send the request of the next scrape and download its response in a thread of the executor.
+
+        Only the request runs in the thread, the response is processed and submitted when scraping.
+        """
+
+        self._prefetcher = ResponsePrefetcher(self.send_request)
+        executor.submit(self._prefetcher.run)
+        return self._prefetcher
+
     def send_request(self, **kwargs):
         """
         Send an HTTP GET request to the `openmetrics_endpoint` value.
@@ -431,7 +777,10 @@ class OpenMetricsScraper:
         Set dynamic tags.
         """
 
-        self.tags = tuple(chain(self.static_tags, tags))
+        tags = tuple(chain(self.static_tags, tags))
+        # Keep the same object when nothing changed so that compiled label plans remain valid
+        if tags != self.tags:
+            self.tags = tags
 
     def submit_health_check(self, status, **kwargs):
         """
@@ -453,6 +802,34 @@ class OpenMetricsScraper:
     def submit_telemetry_number_of_ignored_lines(self):
         self.count('telemetry.metrics.blacklist.count', 1, tags=self.tags)
 
+    def submit_telemetry_number_of_skipped_lines(self, count):
+        self.count('telemetry.metrics.skipped.count', count, tags=self.tags)
+
+    def submit_telemetry_number_of_parsed_bytes(self, size):
+        self.count('telemetry.payload.parsed.count', size, tags=self.tags)
+
+    def submit_telemetry_number_of_skipped_bytes(self, size):
+        self.count('telemetry.payload.skipped.count', size, tags=self.tags)
+
+    def submit_telemetry_scrape_time(self, scrape_time, prefetcher=None):
+        self.gauge('telemetry.scrape.time', scrape_time, tags=self.tags)
+
+        if prefetcher is not None:
+            if prefetcher.request_time is not None:
+                self.gauge('telemetry.scrape.request.time', prefetcher.request_time, tags=self.tags)
+            if prefetcher.download_time is not None:
+                self.gauge('telemetry.scrape.download.time', prefetcher.download_time, tags=self.tags)
+
+    def submit_telemetry_connection_stats(self, connection_stats):
+        self.monotonic_count('telemetry.connections.requests.count', connection_stats['requests'], tags=self.tags)
+        self.monotonic_count('telemetry.connections.opened.count', connection_stats['new_connections'], tags=self.tags)
+
+    def submit_telemetry_payload_compression(self, response, received_size, decompressed_size):
+        tags = [*self.tags, f"encoding:{response.headers.get('Content-Encoding') or 'identity'}"]
+        if received_size is not None:
+            self.gauge('telemetry.payload.received.size', received_size, tags=tags)
+        self.gauge('telemetry.payload.decompressed.size', decompressed_size, tags=tags)
+
     def submit_telemetry_endpoint_response_size(self, response):
         content_length = response.headers.get('Content-Length')
         if content_length is not None:
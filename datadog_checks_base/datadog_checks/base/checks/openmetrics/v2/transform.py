@@ -79,6 +79,23 @@ class MetricTransformer:
 
         self.logger.debug('Skipping metric `%s` as it is not defined in `metrics`', metric_name)
 
+    def is_configured(self, metric_name):
+        """
+        Return whether a transformer may exist for a metric name, without compiling it.
+        """
+        if metric_name in self.transformer_data:
+            return True
+
+        return any(metric_pattern.search(metric_name) for metric_pattern, _ in self.metric_patterns)
+
+    def get_type(self, metric):
+        """
+        Return the configured type of a metric whose transformer was already compiled.
+        """
+        transformer_data = self.transformer_data.get(metric.name)
+        if transformer_data is not None:
+            return transformer_data[0]
+
     def add_custom_transformer(self, name, transformer, pattern=False):
         if not pattern:
             name = '^{}$'.format(name)
@@ -80,3 +80,50 @@ def compute_bucket_hash(labels):
     # we need the unique context for all the buckets
     # hence we remove the `upper_bound` label
     return hash(frozenset(sorted((k, v) for k, v in labels.items() if k != 'upper_bound')))
+
+
+def iter_metric_family_blocks(lines):
+    """
+    Group lines by metric family, using the `# HELP` and `# TYPE` metadata lines as boundaries.
+    The OpenMetrics `# EOF` marker is dropped.
+    """
+    block = []
+    family = None
+    for line in lines:
+        if line.startswith(('# HELP ', '# TYPE ')):
+            parts = line.split(' ', 3)
+            name = parts[2] if len(parts) > 2 else ''
+            if name != family:
+                if block:
+                    yield block
+                    block = []
+
+                family = name
+        elif line == '# EOF':
+            continue
+
+        block.append(line)
+
+    if block:
+        yield block
+
+
+def get_block_size(block):
+    """
+    Return the number of bytes of the lines of a metric family block once encoded, including their line breaks.
+    """
+    return sum(len(line.encode('utf-8')) for line in block) + len(block)
+
+
+def copy_sample_data(metric, sample_data):
+    """
+    Copy sample data that transformers may modify so that it can be transformed again.
+    """
+    if metric.type == 'histogram':
+        # Decumulating buckets adds the `lower_bound` label
+        return [
+            (sample._replace(labels=sample.labels.copy()), list(tags), hostname)
+            for sample, tags, hostname in sample_data
+        ]
+
+    return [(sample, list(tags), hostname) for sample, tags, hostname in sample_data]
@@ -109,6 +109,10 @@ class AggregatorStub(object):
         if not self.ignore_metric(name):
             self._metrics[name].append(MetricStub(name, mtype, value, tags, hostname, None, flush_first_value))
 
+    def submit_metrics(self, check, check_id, mtypes, names, values, tags, hostname, flush_first_value):
+        for mtype, name, value, metric_tags in zip(mtypes, names, values, tags):
+            self.submit_metric(check, check_id, mtype, name, value, metric_tags, hostname, flush_first_value)
+
     def submit_metric_e2e(
         self, check, check_id, mtype, name, value, tags, hostname, device=None, flush_first_value=False
     ):
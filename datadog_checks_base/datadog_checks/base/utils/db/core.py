@@ -2,14 +2,20 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+import threading
+from concurrent.futures import TimeoutError
+from concurrent.futures.thread import ThreadPoolExecutor
 from itertools import chain
 from typing import Any, Callable, Dict, List, Tuple  # noqa: F401
 
+from six.moves.queue import Queue
+
 from datadog_checks.base import AgentCheck  # noqa: F401
 from datadog_checks.base.utils.db.types import QueriesExecutor, QueriesSubmitter, Transformer  # noqa: F401
 
 from ...config import is_affirmative
 from ..containers import iter_unique
+from ..time import get_precise_time
 from .query import Query
 from .transform import COLUMN_TRANSFORMERS, EXTRA_TRANSFORMERS
 from .utils import SUBMISSION_METHODS, create_submission_transformer
@@ -20,6 +26,10 @@ class QueryExecutor(object):
     QueryExecutor is a lower-level implementation of QueryManager which supports multiple instances
     per AgentCheck. It is used to execute queries via the `executor` parameter and submit resulting
     telemetry via the `submitter` parameter.
+
+    When an `executor_pool` is given, the queries are executed concurrently by those executors, each of
+    which should use its own connection. The results are still submitted in order by the calling thread.
+    The thread pool must then be shut down with `cancel` once the check is cancelled.
     """
 
     def __init__(
@@ -31,6 +41,9 @@ class QueryExecutor(object):
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
         logger=None,
+        executor_pool=None,  # type: List[QueriesExecutor]
+        track_query_telemetry=False,  # type: bool
+        query_canceler=None,  # type: Callable[[QueriesExecutor], None]
     ):  # type: (...) -> QueryExecutor
         self.executor = executor  # type: QueriesExecutor
         self.submitter = submitter  # type: QueriesSubmitter
@@ -45,6 +58,23 @@ class QueryExecutor(object):
         self.queries = [Query(payload) for payload in queries or []]  # type: List[Query]
         self.hostname = hostname  # type: str
         self.logger = logger or logging.getLogger(__name__)
+        self.track_query_telemetry = track_query_telemetry  # type: bool
+        # Interrupts the query of a pooled executor that exceeded its timeout, e.g. by closing its connection
+        self.query_canceler = query_canceler  # type: Callable[[QueriesExecutor], None]
+
+        # Executors that are not running a query
+        self.executor_pool = None  # type: Queue
+        self.thread_pool = None  # type: ThreadPoolExecutor
+        if executor_pool:
+            self.executor_pool = Queue()
+            for pooled_executor in executor_pool:
+                self.executor_pool.put(pooled_executor)
+
+            self.thread_pool = ThreadPoolExecutor(max_workers=len(executor_pool))
+
+        # The last time each query was executed, and the queries that are still running after their timeout
+        self.last_execution_times = {}  # type: Dict[Query, float]
+        self.running_queries = {}  # type: Dict[Query, Any]
 
     def compile_queries(self):
         """This method compiles every `Query` object."""
@@ -65,66 +95,170 @@ class QueryExecutor(object):
         if extra_tags:
             global_tags.extend(list(extra_tags))
 
+        queries = self.get_due_queries(global_tags)
+        if self.thread_pool is not None:
+            results = self.execute_concurrently(queries, global_tags)
+        else:
+            results = self.execute_sequentially(queries, global_tags)
+
+        for query, rows in results:
+            process_row = query.process_row
+            tags = global_tags + query.base_tags
+
+            for row in rows:
+                if not self._is_row_valid(query, row):
+                    continue
+
+                process_row(row, tags, self.hostname, self.logger)
+
+    def get_due_queries(self, global_tags):
+        """
+        Return the queries whose collection interval elapsed since their last execution.
+        """
+        now = get_precise_time()
+        queries = []
         for query in self.queries:
-            query_name = query.name
-            query_columns = query.column_transformers
-            extra_transformers = query.extra_transformers
-            query_tags = query.base_tags
+            if query.collection_interval is not None:
+                last_execution_time = self.last_execution_times.get(query)
+                if last_execution_time is not None and now - last_execution_time < query.collection_interval:
+                    self.submit_skipped_query(query, 'interval', global_tags)
+                    continue
+
+                self.last_execution_times[query] = now
+
+            queries.append(query)
+
+        return queries
 
+    def execute_sequentially(self, queries, global_tags):
+        """
+        Execute the queries one at a time and yield their results.
+        """
+        for query in queries:
+            start_time = get_precise_time()
             try:
                 rows = self.execute_query(query.query)
             except Exception as e:
-                if self.error_handler:
-                    self.logger.error('Error querying %s: %s', query_name, self.error_handler(str(e)))
-                else:
-                    self.logger.error('Error querying %s: %s', query_name, e)
-
+                self.log_query_error(query, e)
                 continue
 
-            for row in rows:
-                if not self._is_row_valid(query, row):
+            self.submit_query_duration(query, get_precise_time() - start_time, global_tags)
+            yield query, rows
+
+    def execute_concurrently(self, queries, global_tags):
+        """
+        Execute the queries with the executor pool and yield their results in order, skipping those
+        that are still running from a previous execution or that exceed their timeout.
+        """
+        executions = []
+        for query in queries:
+            running_query = self.running_queries.get(query)
+            if running_query is not None:
+                if not running_query.done():
+                    self.logger.debug('Query %s is still running, skipping', query.name)
+                    self.submit_skipped_query(query, 'running', global_tags)
                     continue
 
-                # It holds the query results
-                sources = {}  # type: Dict[str, str]
-                # It holds the transformers defined in query_columns along with the column value
-                submission_queue = []  # type: List[Tuple[Transformer, Any]]
-                tags = global_tags + query_tags
+                del self.running_queries[query]
+
+            execution = PooledQueryExecution(query)
+            execution.future = self.thread_pool.submit(self.fetch_rows, execution)
+            executions.append(execution)
 
-                for (column_name, type_transformer), column_value in zip(query_columns, row):
-                    # Columns can be ignored via configuration
-                    if not column_name:
+        for execution in executions:
+            query, future = execution.query, execution.future
+            try:
+                if query.timeout is None:
+                    rows, duration = future.result()
+                else:
+                    # The timeout applies to the execution, not to the time spent waiting for an available executor
+                    if not execution.started.wait(query.timeout):
+                        execution.abandoned = True
+                        self.logger.error(
+                            'Query %s waited more than %s seconds for an available executor', query.name, query.timeout
+                        )
+                        self.running_queries[query] = future
+                        self.submit_skipped_query(query, 'queued', global_tags)
                         continue
 
-                    sources[column_name] = column_value
-                    column_type, transformer = type_transformer
+                    timeout = max(query.timeout - (get_precise_time() - execution.start_time), 0)
+                    rows, duration = future.result(timeout=timeout)
+            except TimeoutError:
+                self.logger.error('Query %s timed out after %s seconds', query.name, query.timeout)
+                self.running_queries[query] = future
+                self.submit_skipped_query(query, 'timeout', global_tags)
+                self.cancel_query(execution)
+                continue
+            except Exception as e:
+                self.log_query_error(query, e)
+                continue
 
-                    # The transformer can be None for `source` types. Those such columns do not submit
-                    # anything but are collected into the row values for other columns to reference.
-                    if transformer is None:
-                        continue
-                    elif column_type == 'tag':
-                        tags.append(transformer(None, column_value))  # get_tag transformer
-                    elif column_type == 'tag_not_null':
-                        if column_value is not None:
-                            tags.append(transformer(None, column_value))  # get_tag transformer
-                    elif column_type == 'tag_list':
-                        tags.extend(transformer(None, column_value))  # get_tag_list transformer
-                    else:
-                        submission_queue.append((transformer, column_value))
-
-                for transformer, value in submission_queue:
-                    transformer(sources, value, tags=tags, hostname=self.hostname)
-
-                for name, transformer in extra_transformers:
-                    try:
-                        result = transformer(sources, tags=tags, hostname=self.hostname)
-                    except Exception as e:
-                        self.logger.error('Error transforming %s: %s', name, e)
-                        continue
-                    else:
-                        if result is not None:
-                            sources[name] = result
+            self.submit_query_duration(query, duration, global_tags)
+            yield query, rows
+
+    def fetch_rows(self, execution):
+        """
+        Called by the thread pool, this executes a query with an available executor and returns all of the rows
+        along with the execution time.
+        """
+        executor = self.executor_pool.get()
+        try:
+            if execution.abandoned:
+                return [], 0
+
+            execution.executor = executor
+            execution.start_time = get_precise_time()
+            execution.started.set()
+            rows = self.execute_query(execution.query.query, executor)
+            duration = get_precise_time() - execution.start_time
+            return list(rows), duration
+        finally:
+            self.executor_pool.put(executor)
+
+    def cancel_query(self, execution):
+        """
+        Interrupt a query that exceeded its timeout so that its executor becomes available again.
+        """
+        if self.query_canceler is None:
+            return
+
+        try:
+            self.query_canceler(execution.executor)
+        except Exception as e:
+            self.logger.warning('Unable to cancel query %s: %s', execution.query.name, e)
+
+    def cancel(self):
+        """
+        Shut down the thread pool of the executor pool without waiting for the running queries.
+        """
+        if self.thread_pool is not None:
+            self.thread_pool.shutdown(wait=False)
+
+    def log_query_error(self, query, e):
+        if self.error_handler:
+            self.logger.error('Error querying %s: %s', query.name, self.error_handler(str(e)))
+        else:
+            self.logger.error('Error querying %s: %s', query.name, e)
+
+    def submit_query_duration(self, query, duration, global_tags):
+        if self.track_query_telemetry:
+            self.submitter.histogram(
+                'dd.{}.query.duration'.format(self.submitter.name),
+                duration * 1000,
+                tags=global_tags + ['query:{}'.format(query.name)],
+                hostname=self.hostname,
+                raw=True,
+            )
+
+    def submit_skipped_query(self, query, reason, global_tags):
+        if self.track_query_telemetry:
+            self.submitter.count(
+                'dd.{}.query.skipped'.format(self.submitter.name),
+                1,
+                tags=global_tags + ['query:{}'.format(query.name), 'reason:{}'.format(reason)],
+                hostname=self.hostname,
+                raw=True,
+            )
 
     def _is_row_valid(self, query, row):
         # type: (Query, List) -> bool
@@ -144,12 +278,12 @@ class QueryExecutor(object):
             return False
         return True
 
-    def execute_query(self, query):
+    def execute_query(self, query, executor=None):
         """
         Called by `execute`, this triggers query execution to check for errors immediately in a way that is compatible
         with any library. If there are no errors, this is guaranteed to return an iterator over the result set.
         """
-        rows = self.executor(query)
+        rows = (executor or self.executor)(query)
         if rows is None:
             return iter([])
         else:
@@ -164,6 +298,23 @@ class QueryExecutor(object):
         return chain((first_row,), rows)
 
 
+class PooledQueryExecution(object):
+    """
+    The execution of a query by the executor pool of a `QueryExecutor`.
+    """
+
+    def __init__(self, query):
+        # type: (Query) -> None
+        self.query = query
+        self.future = None
+        # The pooled executor running the query, and when it started running it
+        self.executor = None  # type: QueriesExecutor
+        self.start_time = None  # type: float
+        self.started = threading.Event()
+        # Set when the query timed out before an executor was available, it is then not executed
+        self.abandoned = False
+
+
 class QueryManager(QueryExecutor):
     """
     This class is in charge of running any number of `Query` instances for a single Check instance.
@@ -198,6 +349,9 @@ class QueryManager(QueryExecutor):
         tags=None,  # type: List[str]
         error_handler=None,  # type: Callable[[str], str]
         hostname=None,  # type: str
+        executor_pool=None,  # type: List[QueriesExecutor]
+        track_query_telemetry=False,  # type: bool
+        query_canceler=None,  # type: Callable[[QueriesExecutor], None]
     ):  # type: (...) -> QueryManager
         """
         - **check** (_AgentCheck_) - an instance of a Check
@@ -207,6 +361,12 @@ class QueryManager(QueryExecutor):
         - **tags** (_List[str]_) - a list of tags to associate with every submission
         - **error_handler** (_callable_) - a callable accepting a `str` error as its sole argument and returning
           a sanitized string, useful for scrubbing potentially sensitive information libraries emit
+        - **executor_pool** (_List[callable]_) - executors like `executor`, each typically using its own connection,
+          that are used to run queries concurrently. Call `cancel` when the check is cancelled to stop their threads
+        - **track_query_telemetry** (_bool_) - whether to submit the duration of each query and the number of
+          skipped executions
+        - **query_canceler** (_callable_) - a callable accepting an executor of `executor_pool` whose query exceeded
+          its timeout, which interrupts the query, e.g. by cancelling it or closing the connection of the executor
         """
         super(QueryManager, self).__init__(
             executor=executor,
@@ -216,6 +376,9 @@ class QueryManager(QueryExecutor):
             error_handler=error_handler,
             hostname=hostname,
             logger=check.log,
+            executor_pool=executor_pool,
+            track_query_telemetry=track_query_telemetry,
+            query_canceler=query_canceler,
         )
         self.check = check  # type: AgentCheck
 
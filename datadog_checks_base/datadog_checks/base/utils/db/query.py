@@ -2,13 +2,28 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 from copy import deepcopy
-from typing import Any, Dict, List, Tuple  # noqa: F401
+from itertools import chain
+from typing import Any, Callable, Dict, List, Sequence, Tuple  # noqa: F401
 
 from six import raise_from
 
 from datadog_checks.base.utils.db.types import Transformer, TransformerFactory  # noqa: F401
 
-from .utils import create_extra_transformer
+from .utils import SUBMISSION_METHODS, create_extra_transformer
+
+# The column types whose transformers never read the values of the other columns of a row
+SOURCELESS_COLUMN_TYPES = frozenset(
+    chain(
+        SUBMISSION_METHODS.values(),
+        ('monotonic_gauge', 'source', 'tag', 'tag_list', 'tag_not_null', 'temporal_percent', 'time_elapsed'),
+    )
+)
+
+# Column types of tags
+TAG = 0
+TAG_NOT_NULL = 1
+TAG_LIST = 2
+TAG_COLUMN_TYPES = {'tag': TAG, 'tag_not_null': TAG_NOT_NULL, 'tag_list': TAG_LIST}
 
 
 class Query(object):
@@ -19,6 +34,10 @@ class Query(object):
     It is now part of all our database integrations and
     [other](https://cloud.google.com/solutions/sap/docs/sap-hana-monitoring-agent-planning-guide#defining_custom_queries)
     products have since adopted this format.
+
+    Queries may also define a `collection_interval`, the minimum number of seconds between executions, and a
+    `timeout`, the number of seconds after which the results are discarded when queries are executed concurrently.
+    The timeout starts once an executor is available to run the query.
     """
 
     def __init__(self, query_data):
@@ -34,6 +53,12 @@ class Query(object):
         self.extra_transformers = None  # type: List[Tuple[str, Transformer]]
         # Contains the tags defined in query_data, more tags can be added later from the query result
         self.base_tags = None  # type: List[str]
+        # The minimum number of seconds between executions of the query
+        self.collection_interval = None  # type: float
+        # The number of seconds after which the results of the query are discarded
+        self.timeout = None  # type: float
+        # Processes a single row of the query result, see `compile_row_processor`
+        self.process_row = None  # type: Callable[[Sequence, List[str], str, Any], None]
 
     def compile(
         self,
@@ -72,8 +97,18 @@ class Query(object):
         if tags is not None and not isinstance(tags, list):
             raise ValueError('field `tags` for {} must be a list'.format(query_name))
 
+        options = {}
+        for option_name in ('collection_interval', 'timeout'):
+            option = self.query_data.get(option_name)
+            if option is not None and (isinstance(option, bool) or not isinstance(option, (int, float)) or option <= 0):
+                raise ValueError('field `{}` for {} must be a positive number'.format(option_name, query_name))
+
+            options[option_name] = option
+
         # Keep track of all defined names
         sources = {}
+        # Whether the values of the columns must be available to other transformers
+        uses_sources = False
 
         column_data = []
         for i, column in enumerate(columns, 1):
@@ -103,7 +138,10 @@ class Query(object):
                 raise ValueError('field `type` for column {} of {} is required'.format(column_name, query_name))
             elif not isinstance(column_type, str):
                 raise ValueError('field `type` for column {} of {} must be a string'.format(column_name, query_name))
-            elif column_type == 'source':
+            elif column_type not in SOURCELESS_COLUMN_TYPES:
+                uses_sources = True
+
+            if column_type == 'source':
                 column_data.append((column_name, (None, None)))
                 continue
             elif column_type not in column_transformers:
@@ -201,4 +239,72 @@ class Query(object):
         self.column_transformers = tuple(column_data)
         self.extra_transformers = tuple(extra_data)
         self.base_tags = tags
+        self.collection_interval = options['collection_interval']
+        self.timeout = options['timeout']
+        self.process_row = compile_row_processor(self.column_transformers, self.extra_transformers, uses_sources)
         del self.query_data
+
+
+def compile_row_processor(column_transformers, extra_transformers, uses_sources):
+    # type: (Tuple[Tuple[str, Tuple[str, Transformer]]], Tuple[Tuple[str, Transformer]], bool) -> Callable
+    """
+    Return a function that submits everything for a single row of a query result, to which the transformers of every
+    column are bound by index. The function accepts the row, the tags of the query, the hostname and a logger.
+
+    The values of the row are only collected by name when a transformer may reference them.
+    """
+    tag_columns = []  # type: List[Tuple[int, int, Transformer]]
+    submission_columns = []  # type: List[Tuple[int, Transformer]]
+    named_columns = []  # type: List[Tuple[str, int]]
+    for i, (column_name, type_transformer) in enumerate(column_transformers):
+        # Columns can be ignored via configuration
+        if not column_name:
+            continue
+
+        named_columns.append((column_name, i))
+        column_type, transformer = type_transformer
+
+        # The transformer can be None for `source` types. Those such columns do not submit
+        # anything but are collected into the row values for other columns to reference.
+        if transformer is None:
+            continue
+        elif column_type in TAG_COLUMN_TYPES:
+            tag_columns.append((i, TAG_COLUMN_TYPES[column_type], transformer))
+        else:
+            submission_columns.append((i, transformer))
+
+    uses_sources = uses_sources or bool(extra_transformers)
+
+    def process_row(row, query_tags, hostname, logger):
+        # It holds the query results
+        sources = {name: row[i] for name, i in named_columns} if uses_sources else None  # type: Dict[str, Any]
+
+        # Rows without tag columns share the tags of the query
+        if tag_columns:
+            tags = list(query_tags)
+            for i, tag_type, transformer in tag_columns:
+                value = row[i]
+                if tag_type == TAG:
+                    tags.append(transformer(None, value))  # get_tag transformer
+                elif tag_type == TAG_NOT_NULL:
+                    if value is not None:
+                        tags.append(transformer(None, value))  # get_tag transformer
+                else:
+                    tags.extend(transformer(None, value))  # get_tag_list transformer
+        else:
+            tags = query_tags
+
+        for i, transformer in submission_columns:
+            transformer(sources, row[i], tags=tags, hostname=hostname)
+
+        for name, transformer in extra_transformers:
+            try:
+                result = transformer(sources, tags=tags, hostname=hostname)
+            except Exception as e:
+                logger.error('Error transforming %s: %s', name, e)
+                continue
+            else:
+                if result is not None:
+                    sources[name] = result
+
+    return process_row
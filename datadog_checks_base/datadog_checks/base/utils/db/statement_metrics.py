@@ -22,7 +22,10 @@ class StatementMetrics:
     """
 
     def __init__(self):
-        self._previous_statements = {}
+        # The state of the previous check run is kept in columns: the index of every row key, and for every
+        # metric, the values of all rows in the same order
+        self._previous_indices = {}
+        self._previous_columns = {}
 
     def compute_derivative_rows(self, rows, metrics, key):
         """
@@ -42,11 +45,9 @@ class StatementMetrics:
         - **metrics** (_List[str]_) - the metrics to compute for each row
         - **key** (_callable_) - function for an ID which uniquely identifies a row across runs
         """
-        result = []
-        new_cache = {}
         metrics = set(metrics)
+        row_keys, rows, columns = _merge_duplicate_rows(rows, metrics, key)
 
-        rows = _merge_duplicate_rows(rows, metrics, key)
         if len(rows) > 0:
             dropped_metrics = metrics - set(rows[0].keys())
             if dropped_metrics:
@@ -54,54 +55,62 @@ class StatementMetrics:
                     'Some statement metrics are not available from the table: %s', ','.join(m for m in dropped_metrics)
                 )
 
-        for row in rows:
-            row_key = key(row)
-            if row_key in new_cache:
-                logger.error(
-                    'Unexpected collision in cached query metrics. Dropping existing row, row_key=%s new=%s dropped=%s',
-                    row_key,
-                    row,
-                    new_cache[row_key],
-                )
-
-            # Set the row on the new cache to be checked the next run. This should happen for every row, regardless of
-            # whether a metric is submitted for the row during this run or not.
-            new_cache[row_key] = row
+        previous_indices = self._previous_indices
+        previous_columns = self._previous_columns
+
+        # Set the columns to be checked the next run. This should happen for every row, regardless of
+        # whether a metric is submitted for the row during this run or not.
+        self._previous_indices = {row_key: i for i, row_key in enumerate(row_keys)}
+        self._previous_columns = columns
+
+        # Rows whose metrics were not all available during the previous run are tracked from this run forward
+        if not previous_indices or any(metric not in previous_columns for metric in columns):
+            return []
+
+        # The positions of the current rows that were seen during the previous run, and their previous positions
+        positions = []
+        previous_positions = []
+        for i, row_key in enumerate(row_keys):
+            previous_position = previous_indices.get(row_key)
+            if previous_position is not None:
+                positions.append(i)
+                previous_positions.append(previous_position)
+
+        # Take the diff of all metric values between the current rows and the previous run's rows, one column at
+        # a time. There are a couple of edge cases to be aware of:
+        #
+        # 1. Table truncation or stats reset: Because the table values are always increasing, a negative value
+        #    suggests truncation or a stats reset. In this case, the row difference is discarded and the row should.
+        #    be tracked from this run forward.
+        #
+        # 2. No changes since the previous run: There is no need to store metrics of 0, since that is implied by
+        #    the absence of metrics. On any given check run, most rows will have no difference so this optimization
+        #    avoids having to send a lot of unnecessary metrics.
+        diffed_columns = {}
+        changed = [False] * len(positions)
+        reset = [False] * len(positions)
+        for metric, values in columns.items():
+            previous_values = previous_columns[metric]
+            diffs = [values[i] - previous_values[j] for i, j in zip(positions, previous_positions)]
+            diffed_columns[metric] = diffs
+
+            changed = [c or d != 0 for c, d in zip(changed, diffs)]
+            # A "break" might be expected here instead of "continue," but there are cases where a subset of rows
+            # are removed. To avoid situations where all results are discarded every check run, we err on the side
+            # of potentially including truncated rows that exceed previous run counts.
+            reset = [r or d < 0 for r, d in zip(reset, diffs)]
 
-            prev = self._previous_statements.get(row_key)
-            if prev is None:
-                continue
-
-            metric_columns = metrics & set(row.keys())
-
-            # Take the diff of all metric values between the current row and the previous run's row.
-            # There are a couple of edge cases to be aware of:
-            #
-            # 1. Table truncation or stats reset: Because the table values are always increasing, a negative value
-            #    suggests truncation or a stats reset. In this case, the row difference is discarded and the row should.
-            #    be tracked from this run forward.
-            #
-            # 2. No changes since the previous run: There is no need to store metrics of 0, since that is implied by
-            #    the absence of metrics. On any given check run, most rows will have no difference so this optimization
-            #    avoids having to send a lot of unnecessary metrics.
-
-            diffed_row = {k: row[k] - prev[k] if k in metric_columns else row[k] for k in row.keys()}
-
-            # Check for negative values, but only in the columns used for metrics
-            if any(diffed_row[k] < 0 for k in metric_columns):
-                # A "break" might be expected here instead of "continue," but there are cases where a subset of rows
-                # are removed. To avoid situations where all results are discarded every check run, we err on the side
-                # of potentially including truncated rows that exceed previous run counts.
+        result = []
+        for n, i in enumerate(positions):
+            if reset[n] or not changed[n]:
                 continue
 
-            # No changes to the query; no metric needed
-            if all(diffed_row[k] == 0 for k in metric_columns):
-                continue
+            diffed_row = dict(rows[i])
+            for metric, diffs in diffed_columns.items():
+                diffed_row[metric] = diffs[n]
 
             result.append(diffed_row)
 
-        self._previous_statements = new_cache
-
         return result
 
 
@@ -111,23 +120,35 @@ def _merge_duplicate_rows(rows, metrics, key):
     with the sum of the stats of all duplicates. This is motivated by database integrations such as postgres
     that can report many instances of a query that are considered the same after the agent normalization.
 
+    Rows are not copied, instead the merged metrics are returned in columns. Returns the key of every unique row,
+    the first row of every key, and for every metric available in the rows, the merged values of all keys.
+
     - **rows** (_List[dict]_) - rows from current check run
     - **metrics** (_List[str]_) - the metrics to compute for each row
     - **key** (_callable_) - function for an ID which uniquely identifies a query row across runs
     """
+    if not rows:
+        return [], [], {}
 
-    queries_by_key = {}
-    for row in rows:
-        merged_row = dict(row)
-
-        query_key = key(merged_row)
+    metric_columns = [metric for metric in rows[0] if metric in metrics]
+    columns = {metric: [] for metric in metric_columns}
+    column_values = [(metric, columns[metric]) for metric in metric_columns]
 
-        if query_key in queries_by_key:
-            merged_state = queries_by_key[query_key]
-            queries_by_key[query_key] = {
-                k: merged_row[k] + merged_state[k] if k in metrics else merged_state[k] for k in merged_state.keys()
-            }
+    indices = {}
+    row_keys = []
+    unique_rows = []
+    for row in rows:
+        query_key = key(row)
+
+        i = indices.get(query_key)
+        if i is None:
+            indices[query_key] = len(row_keys)
+            row_keys.append(query_key)
+            unique_rows.append(row)
+            for metric, values in column_values:
+                values.append(row[metric])
         else:
-            queries_by_key[query_key] = merged_row
+            for metric, values in column_values:
+                values[i] += row[metric]
 
-    return list(queries_by_key.values())
+    return row_keys, unique_rows, columns
@@ -1,21 +1,27 @@
 # (C) Datadog, Inc. 2019-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import base64
 import datetime
 import decimal
 import functools
+import heapq
 import logging
 import os
+import random
 import socket
+import sys
 import threading
 import time
+import zlib
+from concurrent.futures import Future
 from concurrent.futures.thread import ThreadPoolExecutor
-from itertools import chain
+from itertools import chain, count
 from typing import Any, Callable, Dict, List, Tuple  # noqa: F401
 
 from cachetools import TTLCache
 
-from datadog_checks.base import is_affirmative
+from datadog_checks.base import ensure_bytes, is_affirmative
 from datadog_checks.base.log import get_check_logger
 from datadog_checks.base.utils.db.types import Transformer  # noqa: F401
 from datadog_checks.base.utils.serialization import json
@@ -129,6 +135,73 @@ class ConstantRateLimiter:
         self.last_event = time.time()
 
 
+class PersistableTTLCache(TTLCache):
+    """
+    TTLCache whose items can be saved along with their expiration time with `dump` and restored with `load`,
+    which allows the cache to survive agent restarts. See `PersistentCaches`.
+
+    The expiration of the items follows the wall clock instead of the monotonic clock of `TTLCache`, so only use it
+    for caches that are persisted.
+    """
+
+    def __init__(self, maxsize, ttl, getsizeof=None):
+        # Shifts the clock of the cache so that restored items keep their expiration time
+        self._time_offset = 0
+        # The wall clock expiration time of the keys, which may include keys that were since evicted
+        self._expirations = {}
+        super(PersistableTTLCache, self).__init__(maxsize, ttl, timer=self._time, getsizeof=getsizeof)
+
+    def _time(self):
+        return time.time() + self._time_offset
+
+    def __setitem__(self, key, value, *args, **kwargs):
+        super(PersistableTTLCache, self).__setitem__(key, value, *args, **kwargs)
+        self._expirations[key] = self._time() + self.ttl
+        if len(self._expirations) > 2 * self.maxsize:
+            self._expirations = {key: self._expirations[key] for key in self._expirations if key in self}
+
+    def dump(self, encode=None):
+        """
+        Return the items of the cache as a list of `[key, value, expiration time]`. If provided, `encode` is called
+        with each key and value and returns a JSON serializable `(key, value)` pair, or `None` to skip the item.
+        """
+        self.expire()
+        items = []
+        for key, value in list(self.items()):
+            expiration = self._expirations.get(key)
+            if expiration is None:
+                continue
+            item = encode(key, value) if encode else (key, value)
+            if item is not None:
+                items.append([item[0], item[1], expiration])
+        return items
+
+    def load(self, items, decode=None):
+        """
+        Restore the items returned by `dump` that have not expired yet. If provided, `decode` is called with each
+        key and value and returns the `(key, value)` pair to restore, otherwise lists are converted to tuples.
+        """
+        now = time.time()
+        # The expiration of the items must follow their insertion order
+        for key, value, expiration in sorted(items, key=lambda item: item[2]):
+            remaining = expiration - now
+            if remaining <= 0:
+                continue
+            key, value = decode(key, value) if decode else (_to_hashable(key), _to_hashable(value))
+            self._time_offset = min(remaining - self.ttl, 0)
+            try:
+                self[key] = value
+            finally:
+                self._time_offset = 0
+
+
+def _to_hashable(value):
+    # JSON has no tuples so the tuples of the cache keys are restored from lists
+    if isinstance(value, list):
+        return tuple(_to_hashable(item) for item in value)
+    return value
+
+
 class RateLimitingTTLCache(TTLCache):
     """
     TTLCache wrapper used for rate limiting by key
@@ -146,6 +219,13 @@ class RateLimitingTTLCache(TTLCache):
         return True
 
 
+class PersistableRateLimitingTTLCache(PersistableTTLCache, RateLimitingTTLCache):
+    """
+    RateLimitingTTLCache whose items can be saved and restored, see `PersistableTTLCache`. It follows the wall clock,
+    so it should only replace a `RateLimitingTTLCache` when its items are persisted.
+    """
+
+
 def resolve_db_host(db_host):
     agent_hostname = datadog_agent.get_hostname()
     if not db_host or db_host in {'localhost', '127.0.0.1'} or db_host.startswith('/'):
@@ -211,11 +291,254 @@ def obfuscate_sql_with_metadata(query, options=None):
     return statement_with_metadata
 
 
+# The minimum number of seconds between two saves of `PersistentCaches`
+PERSISTENT_CACHES_SAVE_INTERVAL = 5 * 60
+
+
+class PersistentCaches(object):
+    """
+    Saves a set of `PersistableTTLCache` with `AgentCheck.write_persistent_cache` so that they survive agent restarts,
+    which avoids a burst of queries against the database, e.g. to explain statements, every time the agent restarts.
+    The caches are stored as compressed JSON and restored with their remaining time to live.
+    """
+
+    def __init__(self, check, key, save_interval=PERSISTENT_CACHES_SAVE_INTERVAL):
+        self._check = check
+        self._key = key
+        self._save_interval = save_interval
+        self._last_save = time.time()
+        self._caches = {}
+        self._loaded = False
+        self._log = get_check_logger()
+
+    def add(self, name, cache, encode=None, decode=None):
+        """
+        Register a cache under a unique `name`, see `PersistableTTLCache.dump` for `encode` and `decode`.
+        """
+        self._caches[name] = (cache, encode, decode)
+
+    def load(self):
+        """
+        Restore the caches from the persistent cache of the check, only the first call has an effect.
+        """
+        if self._loaded:
+            return
+        self._loaded = True
+        value = self._check.read_persistent_cache(self._key)
+        if not value:
+            return
+        try:
+            snapshot = json.loads(zlib.decompress(base64.b64decode(value)))
+            for name, items in snapshot.items():
+                if name in self._caches:
+                    cache, _, decode = self._caches[name]
+                    cache.load(items, decode)
+        except Exception as e:
+            self._log.warning("Failed to restore the caches from the persistent cache %s: %s", self._key, e)
+            return
+        self._log.debug("Restored the caches from the persistent cache %s", self._key)
+
+    def save(self, force=False):
+        """
+        Save the caches to the persistent cache of the check, at most once per save interval unless `force` is set.
+        """
+        now = time.time()
+        if not force and now - self._last_save < self._save_interval:
+            return
+        self._last_save = now
+        snapshot = {name: cache.dump(encode) for name, (cache, encode, _) in self._caches.items()}
+        value = base64.b64encode(zlib.compress(ensure_bytes(json.dumps(snapshot))))
+        self._check.write_persistent_cache(self._key, to_native_string(value))
+
+
+# The maximum number of bytes used by the obfuscated statements of an `ObfuscationCache`
+OBFUSCATION_CACHE_MAX_SIZE = 16 * 1024 * 1024
+OBFUSCATION_CACHE_TTL = 60 * 60
+
+
+class ObfuscationCache(object):
+    """
+    Size bounded LRU cache with a TTL of the obfuscated statements returned by `obfuscate_sql_with_metadata`, keyed
+    by a hash of the raw statement text and the obfuscator options. Not thread safe.
+    """
+
+    def __init__(self, max_size=OBFUSCATION_CACHE_MAX_SIZE, ttl=OBFUSCATION_CACHE_TTL):
+        """
+        :param max_size: the maximum estimated memory use of the cached statements in bytes
+        :param ttl: the number of seconds after which a cached statement is obfuscated again
+        """
+        # mmh3 is only installed with the `db` extra, not by every check using this module
+        import mmh3
+
+        from datadog_checks.base.utils.db.sql import compute_sql_signature
+
+        self._hash = mmh3.hash128
+        self._compute_sql_signature = compute_sql_signature
+        self._cache = TTLCache(maxsize=max_size, ttl=ttl, getsizeof=_get_obfuscated_statement_size)
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._cache)
+
+    @property
+    def size(self):
+        return self._cache.currsize
+
+    def obfuscate(self, query, options=None):
+        """
+        Return the obfuscated statement of `obfuscate_sql_with_metadata` with its signature as `query_signature`.
+        The returned statement is shared by every call for the same query, so it must not be modified.
+        """
+        if not query:
+            return {'query': '', 'query_signature': None, 'metadata': {}}
+
+        key = self._hash(ensure_bytes(query) + b'\0' + ensure_bytes(options or ''), signed=False)
+        statement = self._cache.get(key)
+        if statement is not None:
+            self.hits += 1
+            return statement
+
+        self.misses += 1
+        statement = obfuscate_sql_with_metadata(query, options)
+        statement['query_signature'] = self._compute_sql_signature(statement['query'])
+        # Statements larger than the whole cache are not cached
+        if _get_obfuscated_statement_size(statement) <= self._cache.maxsize:
+            self._cache[key] = statement
+
+        return statement
+
+    def submit_debug_metrics(self, check, dbms, **kwargs):
+        """
+        Submit the hit ratio and memory use of the cache as `dd.<dbms>.obfuscation_cache.*` metrics and reset the
+        hit counters.
+        """
+        lookups = self.hits + self.misses
+        if lookups:
+            check.gauge('dd.{}.obfuscation_cache.hit_ratio'.format(dbms), self.hits / float(lookups), **kwargs)
+        check.count('dd.{}.obfuscation_cache.hits'.format(dbms), self.hits, **kwargs)
+        check.count('dd.{}.obfuscation_cache.misses'.format(dbms), self.misses, **kwargs)
+        check.gauge('dd.{}.obfuscation_cache.entries'.format(dbms), len(self._cache), **kwargs)
+        check.gauge('dd.{}.obfuscation_cache.size'.format(dbms), self._cache.currsize, **kwargs)
+        self.hits = 0
+        self.misses = 0
+
+
+def _get_obfuscated_statement_size(statement):
+    # An estimate of the memory used by the strings of the statement, the containers are not accounted for
+    size = sys.getsizeof(statement['query']) + sys.getsizeof(statement['query_signature'])
+    for value in statement['metadata'].values():
+        if isinstance(value, list):
+            size += sum(sys.getsizeof(item) for item in value)
+        elif value is not None:
+            size += sys.getsizeof(value)
+
+    return size
+
+
+# The default maximum number of job loop iterations that run at the same time
+DBM_ASYNC_JOB_MAX_WORKERS = 1000
+# The minimum number of seconds between two warnings about due iterations waiting for a worker
+DBM_ASYNC_JOB_QUEUED_LOG_INTERVAL = 60
+# The default fraction of the collection interval by which each run of a job loop is randomly delayed
+DBM_ASYNC_JOB_JITTER = 0.1
+
+
+class DBMAsyncJobScheduler(object):
+    """
+    Runs the iterations of every `DBMAsyncJob` loop on `DBMAsyncJob.executor` once they are due, so that idle jobs
+    do not hold a thread. A single timer thread keeps the jobs ordered by their next run time and dispatches at most
+    `max_workers` iterations at a time, due jobs wait in the queue while every worker is busy.
+    """
+
+    def __init__(self, max_workers):
+        self._max_workers = max_workers
+        self._condition = threading.Condition()
+        # heap of (run time, sequence number, job)
+        self._queue = []
+        self._sequence = count()
+        self._running = 0
+        self._thread = None
+        self._last_queued_log = 0
+
+    def schedule(self, job, delay):
+        """
+        Run the next iteration of the job loop in `delay` seconds.
+        """
+        with self._condition:
+            heapq.heappush(self._queue, (time.time() + delay, next(self._sequence), job))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='dbm-async-job-scheduler')
+                self._thread.daemon = True
+                self._thread.start()
+            self._condition.notify()
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while True:
+                    timeout = None
+                    if self._queue:
+                        timeout = self._queue[0][0] - time.time()
+                        if timeout <= 0:
+                            if self._running < self._max_workers:
+                                break
+                            self._log_queued()
+                            timeout = None
+                    self._condition.wait(timeout)
+
+                run_time, _, job = heapq.heappop(self._queue)
+                self._running += 1
+
+            try:
+                DBMAsyncJob.executor.submit(self._run_job, job, run_time)
+            except RuntimeError:
+                # The executor was shut down, retry once it has been replaced
+                with self._condition:
+                    self._running -= 1
+                self.schedule(job, 1)
+
+    def _log_queued(self):
+        now = time.time()
+        if now - self._last_queued_log < DBM_ASYNC_JOB_QUEUED_LOG_INTERVAL:
+            return
+        self._last_queued_log = now
+        logger.warning(
+            "%s DBM async job iterations are due but all %s workers are busy, they are queued until a worker is "
+            "available. The limit can be raised with the `dbm_async_job_max_workers` Agent setting.",
+            sum(1 for run_time, _, _ in self._queue if run_time <= now),
+            self._max_workers,
+        )
+
+    def _run_job(self, job, run_time):
+        delay = None
+        try:
+            delay = job._run_job_loop_iteration(run_time)
+        except Exception as e:
+            # The job loop is stopped, resolve its future so that the next check run starts it again
+            job._log.exception("[%s] Job loop crash", job._job_tags_str)
+            if not job._job_loop_future.done():
+                job._job_loop_future.set_exception(e)
+        finally:
+            with self._condition:
+                self._running -= 1
+                self._condition.notify()
+
+        if delay is not None:
+            self.schedule(job, delay)
+
+
 class DBMAsyncJob(object):
-    # Set an arbitrary high limit so that dbm async jobs (which aren't CPU bound) don't
-    # get artificially limited by the default max_workers count. Note that since threads are
-    # created lazily, it's safe to set a high maximum
-    executor = ThreadPoolExecutor(100000)
+    # Job loops are run by a shared scheduler, each iteration is executed on this bounded pool only once it is due.
+    # The maximum number of concurrent iterations is set with the `dbm_async_job_max_workers` Agent setting,
+    # or the `DBM_ASYNC_JOB_MAX_WORKERS` environment variable
+    max_workers = int(
+        datadog_agent.get_config('dbm_async_job_max_workers')
+        or os.environ.get('DBM_ASYNC_JOB_MAX_WORKERS')
+        or DBM_ASYNC_JOB_MAX_WORKERS
+    )
+    executor = ThreadPoolExecutor(max_workers)
+    scheduler = DBMAsyncJobScheduler(max_workers)
 
     """
     Runs Async Jobs
@@ -233,6 +556,7 @@ class DBMAsyncJob(object):
         expected_db_exceptions=(),
         shutdown_callback=None,
         job_name=None,
+        jitter=DBM_ASYNC_JOB_JITTER,
     ):
         self._check = check
         self._config_host = config_host
@@ -253,6 +577,11 @@ class DBMAsyncJob(object):
         self._enabled = enabled
         self._expected_db_exceptions = expected_db_exceptions
         self._job_name = job_name
+        # The fraction of the collection interval by which each run is randomly delayed, this spreads
+        # the jobs of instances that were started together
+        self._jitter = jitter
+        # The `PersistentCaches` of the job, which are saved when the job loop stops
+        self._persistent_caches = None
 
     def cancel(self):
         """
@@ -279,25 +608,35 @@ class DBMAsyncJob(object):
             self._log.debug("Running threaded job synchronously. job=%s", self._job_name)
             self._run_job_rate_limited()
         elif self._job_loop_future is None or not self._job_loop_future.running():
-            self._job_loop_future = DBMAsyncJob.executor.submit(self._job_loop)
+            self._log.info("[%s] Starting job loop", self._job_tags_str)
+            self._job_loop_future = Future()
+            self._job_loop_future.set_running_or_notify_cancel()
+            DBMAsyncJob.scheduler.schedule(self, self._get_jitter())
         else:
             self._log.debug("Job loop already running. job=%s", self._job_name)
 
-    def _job_loop(self):
+    def _run_job_loop_iteration(self, run_time):
+        """
+        Called by the scheduler, this runs one iteration of the job loop and returns the number of seconds until the
+        next one, or `None` once the job loop is stopped.
+        """
+        start_time = time.time()
         try:
-            self._log.info("[%s] Starting job loop", self._job_tags_str)
-            while True:
-                if self._cancel_event.isSet():
-                    self._log.info("[%s] Job loop cancelled", self._job_tags_str)
-                    self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
-                    break
-                if time.time() - self._last_check_run > self._min_collection_interval * 2:
-                    self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
-                    self._check.count(
-                        "dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True
-                    )
-                    break
-                self._run_job_rate_limited()
+            if self._cancel_event.isSet():
+                self._log.info("[%s] Job loop cancelled", self._job_tags_str)
+                self._check.count("dd.{}.async_job.cancel".format(self._dbms), 1, tags=self._job_tags, raw=True)
+                return self._stop_job_loop()
+            if start_time - self._last_check_run > self._min_collection_interval * 2:
+                self._log.info("[%s] Job loop stopping due to check inactivity", self._job_tags_str)
+                self._check.count("dd.{}.async_job.inactive_stop".format(self._dbms), 1, tags=self._job_tags, raw=True)
+                return self._stop_job_loop()
+            self._check.histogram(
+                "dd.{}.async_job.scheduler_lag".format(self._dbms),
+                (start_time - run_time) * 1000,
+                tags=self._job_tags,
+                raw=True,
+            )
+            self._run_job_traced()
         except Exception as e:
             if self._cancel_event.isSet():
                 # canceling can cause exceptions if the connection is closed the middle of the check run
@@ -326,10 +665,40 @@ class DBMAsyncJob(object):
                     tags=self._job_tags + ["error:crash-{}".format(type(e))],
                     raw=True,
                 )
-        finally:
-            self._log.info("[%s] Shutting down job loop", self._job_tags_str)
+            return self._stop_job_loop()
+
+        if self._cancel_event.isSet():
+            return 0
+
+        period = self._rate_limiter.period_s
+        elapsed = time.time() - start_time
+        if elapsed <= period:
+            return period - elapsed + self._get_jitter()
+
+        # The job overran its interval, wait for a full interval rather than running it again right away
+        # so that a struggling database is not queried continuously
+        if period > 0:
+            self._check.count("dd.{}.async_job.overrun".format(self._dbms), 1, tags=self._job_tags, raw=True)
+        return period + self._get_jitter()
+
+    def _stop_job_loop(self):
+        self._log.info("[%s] Shutting down job loop", self._job_tags_str)
+        if self._persistent_caches:
+            # Periodic saves are rate limited, save the latest state of the caches before a restart
+            try:
+                self._persistent_caches.save(force=True)
+            except Exception as e:
+                self._log.warning("[%s] Failed to save the persistent caches: %s", self._job_tags_str, e)
+        try:
             if self._shutdown_callback:
                 self._shutdown_callback()
+        except Exception as e:
+            self._job_loop_future.set_exception(e)
+        else:
+            self._job_loop_future.set_result(None)
+
+    def _get_jitter(self):
+        return random.uniform(0, self._jitter * self._rate_limiter.period_s)
 
     def _set_rate_limit(self, rate_limit):
         if self._rate_limiter.rate_limit_s != rate_limit:
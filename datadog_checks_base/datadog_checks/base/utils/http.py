@@ -5,6 +5,8 @@ import logging
 import os
 import re
 import ssl
+import threading
+import weakref
 from contextlib import contextmanager
 from copy import deepcopy
 from io import open
@@ -17,6 +19,7 @@ from cryptography.x509 import load_der_x509_certificate
 from cryptography.x509.extensions import ExtensionNotFound
 from cryptography.x509.oid import AuthorityInformationAccessOID, ExtensionOID
 from requests import auth as requests_auth
+from requests.adapters import DEFAULT_POOLSIZE, HTTPAdapter
 from requests.exceptions import SSLError
 from requests_toolbelt.adapters import host_header_ssl
 from six import PY2, iteritems, string_types
@@ -72,6 +75,7 @@ STANDARD_FIELDS = {
     'aws_region': None,
     'aws_service': None,
     'connect_timeout': None,
+    'connection_pool_size': DEFAULT_POOLSIZE,
     'extra_headers': None,
     'headers': None,
     'kerberos_auth': None,
@@ -88,6 +92,7 @@ STANDARD_FIELDS = {
     'proxy': None,
     'read_timeout': None,
     'request_size': DEFAULT_CHUNK_SIZE,
+    'share_connections': False,
     'skip_proxy': False,
     'tls_ca_cert': None,
     'tls_cert': None,
@@ -119,6 +124,12 @@ KERBEROS_STRATEGIES = {}
 
 UDS_SCHEME = 'unix'
 
+# Connection pools shared by every wrapper that targets the same host with the same TLS settings. The wrappers hold
+# the adapters they use, so the adapters are released once no wrapper uses them anymore, e.g. when checks are
+# unscheduled.
+SHARED_ADAPTERS = weakref.WeakValueDictionary()
+SHARED_ADAPTERS_LOCK = threading.Lock()
+
 
 class ResponseWrapper(ObjectProxy):
     def __init__(self, response, default_chunk_size):
@@ -146,6 +157,10 @@ class ResponseWrapper(ObjectProxy):
 class RequestsWrapper(object):
     __slots__ = (
         '_session',
+        '_shared_adapter_prefixes',
+        'connection_pool_size',
+        'connection_stats',
+        'share_connections',
         'tls_use_host_header',
         'ignore_tls_warning',
         'log_requests',
@@ -334,6 +349,15 @@ class RequestsWrapper(object):
         self.persist_connections = self.tls_use_host_header or is_affirmative(config['persist_connections'])
         self._session = None
 
+        # Connections may also be kept alive across all wrappers targeting the same host with the same TLS settings,
+        # which avoids a TLS handshake for every new check instance
+        self.share_connections = is_affirmative(config['share_connections'])
+        self.connection_pool_size = int(config['connection_pool_size'])
+        self._shared_adapter_prefixes = {}
+
+        # The number of requests sent through shared connection pools and the number of connections they opened
+        self.connection_stats = {'requests': 0, 'new_connections': 0}
+
         # Whether or not to log request information like method and url
         self.log_requests = is_affirmative(config['log_requests'])
 
@@ -393,9 +417,12 @@ class RequestsWrapper(object):
             new_options['headers'] = new_options['headers'].copy()
             new_options['headers'].update(extra_headers)
 
+        shared_adapter = None
         if is_uds_url(url):
             persist = True  # UDS support is only enabled on the shared session.
             url = quote_uds_url(url)
+        elif self.share_connections:
+            prefix, shared_adapter = self.get_shared_adapter(url, new_options)
 
         self.handle_auth_token(method=method, url=url, default_options=self.options)
 
@@ -403,10 +430,20 @@ class RequestsWrapper(object):
             for hook in self.request_hooks:
                 stack.enter_context(hook())
             if persist:
-                request_method = getattr(self.session, method)
+                session = self.session
+                if shared_adapter is not None and session.adapters.get(prefix) is not shared_adapter:
+                    session.mount(prefix, shared_adapter)
+                request_method = getattr(session, method)
+            elif shared_adapter is not None:
+                # Only the connections are shared, cookies and other session state are not kept across requests
+                session = stack.enter_context(self.shared_adapter_session(prefix, shared_adapter))
+                request_method = getattr(session, method)
             else:
                 request_method = getattr(requests, method)
 
+            if shared_adapter is not None:
+                request_method = self.track_connections(request_method, shared_adapter)
+
             if self.auth_token_handler:
                 try:
                     response = self.make_request_aia_chasing(request_method, method, url, new_options, persist)
@@ -444,6 +481,68 @@ class RequestsWrapper(object):
             response = request_method(url, **new_options)
         return response
 
+    def get_shared_adapter(self, url, options):
+        """
+        Return the URL prefix of a request and the adapter whose connection pools are shared for its host and TLS
+        settings.
+        """
+        parsed_url = urlparse(url)
+        scheme = parsed_url.scheme.lower()
+        prefix = '{}://{}/'.format(scheme, parsed_url.netloc.lower())
+
+        adapter_class = HTTPAdapter
+        if scheme == 'https' and self.tls_use_host_header:
+            adapter_class = host_header_ssl.HostHeaderSSLAdapter
+
+        cert = options['cert']
+        if isinstance(cert, list):
+            cert = tuple(cert)
+
+        # Pools are keyed only by host, so any setting that applies to the connections themselves must be in the key
+        key = (prefix, adapter_class, options['verify'], cert, self.connection_pool_size)
+
+        used = self._shared_adapter_prefixes.get(prefix)
+        if used is not None and used[0] == key:
+            return prefix, used[1]
+
+        with SHARED_ADAPTERS_LOCK:
+            adapter = SHARED_ADAPTERS.get(key)
+            if adapter is None:
+                adapter = SHARED_ADAPTERS[key] = adapter_class(pool_maxsize=self.connection_pool_size)
+
+        # Keeps the adapter alive for as long as the wrapper uses it
+        self._shared_adapter_prefixes[prefix] = (key, adapter)
+        return prefix, adapter
+
+    @contextmanager
+    def shared_adapter_session(self, prefix, adapter):
+        """
+        A single-use session, like the one of `requests.request`, on which a shared adapter is mounted.
+        """
+        session = requests.Session()
+        for option, value in iteritems(self.options):
+            setattr(session, option, value)
+        session.mount(prefix, adapter)
+
+        try:
+            yield session
+        finally:
+            # Closing the session closes every mounted adapter, but shared pools are used by other wrappers
+            session.adapters.pop(prefix, None)
+            session.close()
+
+    def track_connections(self, request_method, adapter):
+        def request(url, **options):
+            # Concurrent requests of other wrappers sharing the adapter may be counted as well
+            connections = count_pool_connections(adapter)
+            try:
+                return request_method(url, **options)
+            finally:
+                self.connection_stats['requests'] += 1
+                self.connection_stats['new_connections'] += max(count_pool_connections(adapter) - connections, 0)
+
+        return request
+
     def populate_options(self, options):
         # Avoid needless dictionary update if there are no options
         if not options:
@@ -549,6 +648,10 @@ class RequestsWrapper(object):
 
     def __del__(self):  # no cov
         try:
+            # Closing the session closes every mounted adapter, but shared pools are used by other wrappers
+            for prefix in self._shared_adapter_prefixes:
+                self._session.adapters.pop(prefix, None)
+
             self._session.close()
         except AttributeError:
             # A persistent connection was never used or an error occurred during instantiation
@@ -591,6 +694,24 @@ def handle_kerberos_cache(cache_file_path):
         os.environ['KRB5CCNAME'] = old_cache_path
 
 
+def count_pool_connections(adapter):
+    """
+    Return the number of connections opened by the pools of an adapter that still exist.
+    """
+    pool_managers = [adapter.poolmanager]
+    pool_managers.extend(adapter.proxy_manager.values())
+
+    connections = 0
+    for pool_manager in pool_managers:
+        pools = pool_manager.pools
+        for pool_key in pools.keys():
+            pool = pools.get(pool_key)
+            if pool is not None:
+                connections += pool.num_connections
+
+    return connections
+
+
 def should_bypass_proxy(url, no_proxy_uris):
     # Accepts a URL and a list of no_proxy URIs
     # Returns True if URL should bypass the proxy.
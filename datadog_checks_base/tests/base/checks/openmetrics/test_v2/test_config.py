@@ -433,3 +433,39 @@ class TestUseLatestSpec:
             'application/openmetrics-text;version=1.0.0,application/openmetrics-text;version=0.0.1;q=0.75,'
             'text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
         )
+
+
+class TestUseProtobuf:
+    def test_accept_header(self, dd_run_check):
+        check = get_check({'use_protobuf': True})
+        check.configure_scrapers()
+        scraper = check.scrapers['test']
+        assert scraper.http.options['headers']['Accept'] == (
+            'application/vnd.google.protobuf;proto=io.prometheus.client.MetricFamily;encoding=delimited,'
+            'application/openmetrics-text;version=1.0.0;q=0.8,application/openmetrics-text;version=0.0.1;q=0.75,'
+            'text/plain;version=0.0.4;q=0.5,*/*;q=0.1'
+        )
+
+    def test_latest_spec(self, dd_run_check):
+        check = get_check({'use_protobuf': True, 'use_latest_spec': True})
+
+        with pytest.raises(Exception, match='^Setting `use_protobuf` cannot be used with `use_latest_spec`$'):
+            dd_run_check(check, extract_message=True)
+
+
+class TestMaxConcurrentScrapes:
+    @pytest.mark.parametrize('value', ['2', 0])
+    def test_not_positive_integer(self, dd_run_check, value):
+        check = get_check({'max_concurrent_scrapes': value})
+
+        with pytest.raises(Exception, match='^Setting `max_concurrent_scrapes` must be a positive integer$'):
+            dd_run_check(check, extract_message=True)
+
+
+class TestLabelPlanCacheSize:
+    @pytest.mark.parametrize('value', ['9000', -1])
+    def test_not_non_negative_integer(self, dd_run_check, value):
+        check = get_check({'label_plan_cache_size': value})
+
+        with pytest.raises(Exception, match='^Setting `label_plan_cache_size` must be a non-negative integer$'):
+            dd_run_check(check, extract_message=True)
@@ -1,10 +1,15 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
+
+import mock
 import pytest
+from google.protobuf.internal.encoder import _VarintBytes  # pylint: disable=E0611,E0401
 from mock import Mock
 
 from datadog_checks.base.constants import ServiceCheck
+from datadog_checks.base.utils.prometheus import metrics_pb2
 from datadog_checks.dev.testing import requires_py3
 
 from .utils import get_check
@@ -295,6 +300,328 @@ class TestExcludeMetricsByLabels:
         aggregator.assert_all_metrics_covered()
 
 
+class TestLabelPlanCache:
+    def test_reused_across_scrapes(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar",baz="bat"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="baz",baz="bat"} 901120
+            """
+        )
+        check = get_check(
+            {'metrics': ['.+'], 'exclude_metrics_by_labels': {'foo': ['baz']}, 'rename_labels': {'baz': 'qux'}}
+        )
+        dd_run_check(check)
+        scraper = check.scrapers['test']
+        assert len(scraper._label_plans) == 2
+
+        scraper.compile_label_plan = Mock(side_effect=AssertionError('label plans must be reused'))
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            6396288,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'foo:bar', 'qux:bat'],
+            count=2,
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_dynamic_tags(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+        )
+        check = get_check({'metrics': ['.+']})
+        dd_run_check(check)
+
+        check.set_dynamic_tags('baz:bat')
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            6396288,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'foo:bar', 'baz:bat'],
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_bounded(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="baz"} 6.396288e+06
+            go_memstats_alloc_bytes{foo="bat"} 6.396288e+06
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'label_plan_cache_size': 2})
+        dd_run_check(check)
+
+        # The plans used by the scrape are not evicted for the label sets that don't fit
+        assert list(check.scrapers['test']._label_plans) == [
+            ('go_memstats_alloc_bytes', (('foo', 'bar'),)),
+            ('go_memstats_alloc_bytes', (('foo', 'baz'),)),
+        ]
+
+    def test_more_label_sets_than_cache_size(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="a"} 1
+            go_memstats_alloc_bytes{foo="b"} 2
+            go_memstats_alloc_bytes{foo="c"} 3
+            go_memstats_alloc_bytes{foo="d"} 4
+            go_memstats_alloc_bytes{foo="e"} 5
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'label_plan_cache_size': 3})
+        dd_run_check(check)
+
+        scraper = check.scrapers['test']
+        scraper.compile_label_plan = Mock(wraps=scraper.compile_label_plan)
+        for _ in range(3):
+            dd_run_check(check)
+
+        # Repeated scrapes keep hitting the cached plans instead of cycling through the cache
+        assert scraper.compile_label_plan.call_count == 6
+        assert list(scraper._label_plans) == [
+            ('go_memstats_alloc_bytes', (('foo', 'a'),)),
+            ('go_memstats_alloc_bytes', (('foo', 'b'),)),
+            ('go_memstats_alloc_bytes', (('foo', 'c'),)),
+        ]
+        for value in range(1, 6):
+            aggregator.assert_metric('test.go_memstats_alloc_bytes', value, count=4)
+
+    def test_least_recently_used_evicted(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="a"} 1
+            go_memstats_alloc_bytes{foo="b"} 2
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'label_plan_cache_size': 2})
+        dd_run_check(check)
+
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="b"} 2
+            go_memstats_alloc_bytes{foo="c"} 3
+            """
+        )
+        dd_run_check(check)
+
+        assert list(check.scrapers['test']._label_plans) == [
+            ('go_memstats_alloc_bytes', (('foo', 'b'),)),
+            ('go_memstats_alloc_bytes', (('foo', 'c'),)),
+        ]
+
+    def test_label_sets_counted_once_per_scrape(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_gc_duration_seconds A summary of the GC invocation durations.
+            # TYPE go_gc_duration_seconds summary
+            go_gc_duration_seconds_sum{foo="a"} 1
+            go_gc_duration_seconds_count{foo="a"} 2
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="b"} 3
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'label_plan_cache_size': 2})
+        dd_run_check(check)
+
+        mock_http_response(
+            """
+            # HELP go_gc_duration_seconds A summary of the GC invocation durations.
+            # TYPE go_gc_duration_seconds summary
+            go_gc_duration_seconds_sum{foo="a"} 1
+            go_gc_duration_seconds_count{foo="a"} 2
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="c"} 3
+            """
+        )
+        dd_run_check(check)
+
+        # The sum and count share a plan, so the plan unused by this scrape can be evicted
+        assert list(check.scrapers['test']._label_plans) == [
+            ('go_gc_duration_seconds', (('foo', 'a'),)),
+            ('go_memstats_alloc_bytes', (('foo', 'c'),)),
+        ]
+
+    def test_disabled(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+        )
+        check = get_check({'metrics': ['.+'], 'label_plan_cache_size': 0})
+        dd_run_check(check)
+
+        assert not check.scrapers['test']._label_plans
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+
+class TestIncrementalParsing:
+    def test_unchanged_blocks(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_frees_total Total number of frees.
+            # TYPE go_memstats_frees_total counter
+            go_memstats_frees_total 1.2e+06
+            # HELP http_request_duration_seconds A histogram of the request duration.
+            # TYPE http_request_duration_seconds histogram
+            http_request_duration_seconds_bucket{le="1"} 1
+            http_request_duration_seconds_bucket{le="2"} 3
+            http_request_duration_seconds_bucket{le="+Inf"} 3
+            http_request_duration_seconds_sum 5
+            http_request_duration_seconds_count 3
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['.+'],
+                'incremental_parsing': True,
+                'non_cumulative_histogram_buckets': True,
+                'telemetry': True,
+            }
+        )
+        dd_run_check(check)
+
+        scraper = check.scrapers['test']
+        with mock.patch.object(scraper, 'parse_metric_family_block', side_effect=AssertionError('must not parse')):
+            dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            6396288,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'foo:bar'],
+            count=2,
+        )
+        aggregator.assert_metric(
+            'test.go_memstats_frees.count', 1200000, metric_type=aggregator.MONOTONIC_COUNT, count=1
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.bucket',
+            1,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'upper_bound:1.0', 'lower_bound:0'],
+            count=2,
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.bucket',
+            2,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'upper_bound:2.0', 'lower_bound:1.0'],
+            count=2,
+        )
+        aggregator.assert_metric('test.http_request_duration_seconds.sum', 5, count=2)
+        aggregator.assert_metric('test.http_request_duration_seconds.count', 3, count=2)
+
+        parsed = [m.value for m in aggregator.metrics('test.telemetry.payload.parsed.count')]
+        skipped = [m.value for m in aggregator.metrics('test.telemetry.payload.skipped.count')]
+        assert parsed[0] > 0
+        assert skipped == [0, parsed[0]]
+        assert parsed[1] == 0
+
+    def test_changed_blocks(self, aggregator, dd_run_check, mock_http_response):
+        payload = """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes {}
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes 901120
+            """
+        check = get_check({'metrics': ['.+'], 'incremental_parsing': True})
+
+        mock_http_response(payload.format(1))
+        dd_run_check(check)
+
+        mock_http_response(payload.format(2))
+        scraper = check.scrapers['test']
+        with mock.patch.object(
+            scraper, 'parse_metric_family_block', wraps=scraper.parse_metric_family_block
+        ) as parse_metric_family_block:
+            dd_run_check(check)
+
+        assert parse_metric_family_block.call_count == 1
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 1, count=1)
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 2, count=1)
+        aggregator.assert_metric('test.go_memstats_gc_sys_bytes', 901120, count=2)
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_skipped_bytes_encoded(self, aggregator, dd_run_check, mock_http_response):
+        lines = [
+            '# HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.',
+            '# TYPE go_memstats_alloc_bytes gauge',
+            'go_memstats_alloc_bytes{foo="häagen"} 6.396288e+06',
+        ]
+        mock_http_response('\n'.join(lines))
+        check = get_check({'metrics': ['.+'], 'incremental_parsing': True, 'telemetry': True})
+        dd_run_check(check)
+        dd_run_check(check)
+
+        skipped = [m.value for m in aggregator.metrics('test.telemetry.payload.skipped.count')]
+        assert skipped == [0, len('\n'.join(lines).encode('utf-8')) + 1]
+
+    def test_openmetrics_format(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes 6.396288e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes 901120
+            # EOF
+            """,
+            headers={'Content-Type': 'application/openmetrics-text'},
+        )
+        check = get_check({'metrics': ['.+'], 'incremental_parsing': True})
+        dd_run_check(check)
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6396288, count=2)
+        aggregator.assert_metric('test.go_memstats_gc_sys_bytes', 901120, count=2)
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_share_labels(self, dd_run_check):
+        check = get_check({'metrics': ['.+'], 'incremental_parsing': True, 'share_labels': {'foo': True}})
+
+        with pytest.raises(Exception, match='^Setting `incremental_parsing` cannot be used with `share_labels`$'):
+            dd_run_check(check, extract_message=True)
+
+
 class TestRawLineFilters:
     def test(self, aggregator, dd_run_check, mock_http_response):
         mock_http_response(
@@ -320,6 +647,470 @@ class TestRawLineFilters:
         aggregator.assert_all_metrics_covered()
 
 
+class TestSkipUnconfiguredLines:
+    def test(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            # HELP go_memstats_frees_total Total number of frees.
+            # TYPE go_memstats_frees_total counter
+            go_memstats_frees_total 1.2e+06
+            # HELP go_memstats_gc_sys_bytes Number of bytes used for garbage collection system metadata.
+            # TYPE go_memstats_gc_sys_bytes gauge
+            go_memstats_gc_sys_bytes{foo="bar"} 901120
+            # HELP http_request_duration_seconds The HTTP request latencies in seconds.
+            # TYPE http_request_duration_seconds histogram
+            http_request_duration_seconds_bucket{le="1"} 1
+            http_request_duration_seconds_bucket{le="+Inf"} 3
+            http_request_duration_seconds_sum 5
+            http_request_duration_seconds_count 3
+            go_goroutines 10
+            # HELP go_threads Number of OS threads created.
+            # TYPE go_threads gauge
+            go_threads 6
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['go_memstats_.+', 'http_request_duration_seconds', 'go_threads'],
+                'exclude_metrics': ['go_memstats_gc_sys_bytes'],
+                'skip_unconfigured_lines': True,
+                'telemetry': True,
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+        aggregator.assert_metric(
+            'test.go_memstats_frees.count', 1200000, metric_type=aggregator.MONOTONIC_COUNT, tags=['endpoint:test']
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.bucket',
+            1,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'upper_bound:1.0'],
+        )
+        aggregator.assert_metric('test.http_request_duration_seconds.sum', 5, metric_type=aggregator.MONOTONIC_COUNT)
+        aggregator.assert_metric('test.http_request_duration_seconds.count', 3, metric_type=aggregator.MONOTONIC_COUNT)
+        aggregator.assert_metric('test.go_threads', 6, metric_type=aggregator.GAUGE, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.skipped.count', 4, tags=['endpoint:test'])
+        aggregator.assert_metric('test.telemetry.metrics.input.count', count=4)
+
+        assert not aggregator.metrics('test.go_memstats_gc_sys_bytes')
+        assert not aggregator.metrics('test.go_goroutines')
+
+    def test_raw_metric_prefix(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP foo_go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE foo_go_memstats_alloc_bytes gauge
+            foo_go_memstats_alloc_bytes 6.396288e+06
+            # HELP foo_go_goroutines Number of goroutines that currently exist.
+            # TYPE foo_go_goroutines gauge
+            foo_go_goroutines 10
+            """
+        )
+        check = get_check(
+            {'metrics': ['go_memstats_alloc_bytes'], 'raw_metric_prefix': 'foo_', 'skip_unconfigured_lines': True}
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test']
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_share_labels(self, aggregator, dd_run_check, mock_http_response):
+        mock_http_response(
+            """
+            # HELP go_info Information about the Go environment.
+            # TYPE go_info gauge
+            go_info{foo="bar",version="go1.15.8"} 1
+            # HELP go_memstats_alloc_bytes Number of bytes allocated and still in use.
+            # TYPE go_memstats_alloc_bytes gauge
+            go_memstats_alloc_bytes{foo="bar"} 6.396288e+06
+            """
+        )
+        check = get_check(
+            {
+                'metrics': ['go_memstats_alloc_bytes'],
+                'share_labels': {'go_info': {'match': ['foo']}},
+                'skip_unconfigured_lines': True,
+            }
+        )
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            6396288,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'foo:bar', 'version:go1.15.8'],
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+
+class TestProtobuf:
+    @staticmethod
+    def mock_protobuf_response(mock_http_response, tmp_path, metric_families):
+        payload_file = tmp_path / 'metrics.bin'
+        payload_file.write_bytes(
+            b''.join(
+                _VarintBytes(message.ByteSize()) + message.SerializeToString()
+                for message in (metrics_pb2.MetricFamily(**metric_family) for metric_family in metric_families)
+            )
+        )
+        mock_http_response(
+            file_path=str(payload_file),
+            headers={
+                'Content-Type': 'application/vnd.google.protobuf; '
+                'proto=io.prometheus.client.MetricFamily; encoding=delimited'
+            },
+        )
+
+    def test(self, aggregator, dd_run_check, mock_http_response, tmp_path):
+        label = metrics_pb2.LabelPair(name='foo', value='bar')
+        self.mock_protobuf_response(
+            mock_http_response,
+            tmp_path,
+            [
+                {
+                    'name': 'go_memstats_alloc_bytes',
+                    'type': metrics_pb2.GAUGE,
+                    'metric': [{'label': [label], 'gauge': {'value': 6396288}}],
+                },
+                {
+                    'name': 'go_memstats_frees_total',
+                    'type': metrics_pb2.COUNTER,
+                    'metric': [{'counter': {'value': 1200000}}],
+                },
+                {
+                    'name': 'http_request_duration_seconds',
+                    'type': metrics_pb2.HISTOGRAM,
+                    'metric': [
+                        {
+                            'label': [label],
+                            'histogram': {
+                                'sample_count': 3,
+                                'sample_sum': 5,
+                                'bucket': [{'cumulative_count': 1, 'upper_bound': 1}],
+                            },
+                        }
+                    ],
+                },
+                {
+                    'name': 'go_gc_duration_seconds',
+                    'type': metrics_pb2.SUMMARY,
+                    'metric': [
+                        {
+                            'summary': {
+                                'sample_count': 11,
+                                'sample_sum': 0.5,
+                                'quantile': [{'quantile': 0.5, 'value': 0.25}],
+                            },
+                        }
+                    ],
+                },
+            ],
+        )
+        check = get_check({'metrics': ['.+'], 'use_protobuf': True, 'raw_line_filters': ['foo']})
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test', 'foo:bar']
+        )
+        aggregator.assert_metric(
+            'test.go_memstats_frees.count', 1200000, metric_type=aggregator.MONOTONIC_COUNT, tags=['endpoint:test']
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.bucket',
+            1,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'foo:bar', 'upper_bound:1.0'],
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.sum',
+            5,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'foo:bar'],
+        )
+        aggregator.assert_metric(
+            'test.http_request_duration_seconds.count',
+            3,
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test', 'foo:bar'],
+        )
+        aggregator.assert_metric(
+            'test.go_gc_duration_seconds.quantile',
+            0.25,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'quantile:0.5'],
+        )
+        aggregator.assert_metric(
+            'test.go_gc_duration_seconds.sum', 0.5, metric_type=aggregator.MONOTONIC_COUNT, tags=['endpoint:test']
+        )
+        aggregator.assert_metric(
+            'test.go_gc_duration_seconds.count', 11, metric_type=aggregator.MONOTONIC_COUNT, tags=['endpoint:test']
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_histogram_buckets_as_distributions(self, aggregator, dd_run_check, mock_http_response, tmp_path):
+        self.mock_protobuf_response(
+            mock_http_response,
+            tmp_path,
+            [
+                {
+                    'name': 'http_request_duration_seconds',
+                    'type': metrics_pb2.HISTOGRAM,
+                    'metric': [
+                        {
+                            'histogram': {
+                                'sample_count': 3,
+                                'sample_sum': 5,
+                                'bucket': [
+                                    {'cumulative_count': 1, 'upper_bound': 1},
+                                    {'cumulative_count': 3, 'upper_bound': float('inf')},
+                                ],
+                            },
+                        }
+                    ],
+                },
+            ],
+        )
+        check = get_check({'metrics': ['.+'], 'use_protobuf': True, 'histogram_buckets_as_distributions': True})
+        dd_run_check(check)
+
+        aggregator.assert_histogram_bucket(
+            'test.http_request_duration_seconds',
+            1,
+            0,
+            1,
+            True,
+            '',
+            ['endpoint:test', 'lower_bound:0', 'upper_bound:1.0'],
+        )
+        aggregator.assert_histogram_bucket(
+            'test.http_request_duration_seconds',
+            2,
+            1,
+            float('inf'),
+            True,
+            '',
+            ['endpoint:test', 'lower_bound:1.0', 'upper_bound:inf'],
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+    def test_incremental_parsing(self, aggregator, dd_run_check, mock_http_response, tmp_path):
+        self.mock_protobuf_response(
+            mock_http_response,
+            tmp_path,
+            [
+                {
+                    'name': 'go_memstats_alloc_bytes',
+                    'type': metrics_pb2.GAUGE,
+                    'metric': [{'gauge': {'value': 6396288}}],
+                },
+            ],
+        )
+        check = get_check({'metrics': ['.+'], 'use_protobuf': True, 'incremental_parsing': True})
+        dd_run_check(check)
+
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes', 6396288, metric_type=aggregator.GAUGE, tags=['endpoint:test']
+        )
+
+        aggregator.assert_all_metrics_covered()
+
+
+class TestMaxConcurrentScrapes:
+    @staticmethod
+    def get_check(payloads, **options):
+        check = get_check({'metrics': ['.+'], **options})
+        check.scraper_configs = [{**check.instance, 'openmetrics_endpoint': endpoint} for endpoint in payloads]
+        return check
+
+    @staticmethod
+    def mock_responses(mocker, payloads, threads=None):
+        from datadog_checks.dev.http import MockResponse
+
+        def get(url, **kwargs):
+            if threads is not None:
+                threads.append(threading.current_thread())
+
+            content, status_code = payloads[url]
+            return MockResponse(content, status_code=status_code)
+
+        return mocker.patch('requests.get', side_effect=get)
+
+    def test(self, aggregator, dd_run_check, mocker):
+        line = 'go_memstats_alloc_bytes{{pod="{}"}} {}\n'
+        payloads = {
+            'a': ('# TYPE go_memstats_alloc_bytes gauge\n' + ''.join(line.format(i, i) for i in range(100)), 200),
+            'b': ('# TYPE go_memstats_alloc_bytes gauge\n' + line.format(0, 9000), 200),
+        }
+        threads = []
+        self.mock_responses(mocker, payloads, threads)
+        check = self.get_check(payloads, max_concurrent_scrapes=2, telemetry=True)
+
+        # Exercise the bounded queue with many small chunks
+        with mock.patch('datadog_checks.base.checks.openmetrics.v2.prefetch.PREFETCH_CHUNK_SIZE', 16):
+            dd_run_check(check)
+
+        assert threading.current_thread() not in threads
+        for i in range(100):
+            aggregator.assert_metric(
+                'test.go_memstats_alloc_bytes',
+                i,
+                metric_type=aggregator.GAUGE,
+                tags=['endpoint:a', f'pod:{i}'],
+                count=1,
+            )
+        aggregator.assert_metric(
+            'test.go_memstats_alloc_bytes',
+            9000,
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:b', 'pod:0'],
+            count=1,
+        )
+
+        for endpoint in payloads:
+            for metric in ('time', 'request.time', 'download.time'):
+                aggregator.assert_metric(
+                    f'test.telemetry.scrape.{metric}', metric_type=aggregator.GAUGE, tags=[f'endpoint:{endpoint}']
+                )
+
+    def test_error(self, aggregator, dd_run_check, mocker):
+        payloads = {
+            'a': ('', 500),
+            'b': ('# TYPE go_memstats_alloc_bytes gauge\ngo_memstats_alloc_bytes 9000\n', 200),
+        }
+        self.mock_responses(mocker, payloads)
+        check = self.get_check(payloads, max_concurrent_scrapes=2)
+
+        with pytest.raises(Exception, match='There was an error scraping endpoint a'):
+            dd_run_check(check, extract_message=True)
+
+        aggregator.assert_service_check('test.openmetrics.health', ServiceCheck.CRITICAL, tags=['endpoint:a'])
+
+        # Prefetched responses that were not scraped are discarded
+        payloads['a'] = ('# TYPE go_memstats_alloc_bytes gauge\ngo_memstats_alloc_bytes 6\n', 200)
+        aggregator.reset()
+        check.max_concurrent_scrapes = 1
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6, tags=['endpoint:a'])
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 9000, tags=['endpoint:b'])
+
+
+class TestShareConnections:
+    def test_telemetry(self, aggregator, dd_run_check):
+        from datadog_checks.dev.http import MockResponse
+
+        check = get_check({'metrics': ['.+'], 'share_connections': True, 'telemetry': True})
+        with mock.patch(
+            'requests.Session.get',
+            side_effect=lambda *args, **kwargs: MockResponse(
+                '# TYPE go_memstats_alloc_bytes gauge\ngo_memstats_alloc_bytes 6\n'
+            ),
+        ):
+            dd_run_check(check)
+            dd_run_check(check)
+
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6, tags=['endpoint:test'], count=2)
+        aggregator.assert_metric(
+            'test.telemetry.connections.requests.count',
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test'],
+            count=2,
+        )
+        aggregator.assert_metric(
+            'test.telemetry.connections.opened.count',
+            metric_type=aggregator.MONOTONIC_COUNT,
+            tags=['endpoint:test'],
+            count=2,
+        )
+        assert check.scrapers['test'].http.connection_stats['requests'] == 2
+
+
+class TestUseCompression:
+    def test_accept_encoding(self):
+        check = get_check({'use_compression': True})
+        check.configure_scrapers()
+        scraper = check.scrapers['test']
+
+        assert scraper.http.options['headers']['Accept-Encoding'] in ('zstd, gzip, deflate', 'gzip, deflate')
+
+    def test_accept_encoding_configured(self):
+        check = get_check({'use_compression': True, 'headers': {'Accept-Encoding': 'br'}})
+        check.configure_scrapers()
+        scraper = check.scrapers['test']
+
+        assert scraper.http.options['headers']['Accept-Encoding'] == 'br'
+
+    def test_gzip(self, aggregator, dd_run_check, mocker):
+        import gzip
+        from io import BytesIO
+
+        from urllib3.response import HTTPResponse
+
+        from datadog_checks.dev.http import MockResponse
+
+        content = ''.join(f'go_memstats_alloc_bytes{{pod="{i}"}} {i}\n' for i in range(100))
+        content = f'# TYPE go_memstats_alloc_bytes gauge\n{content}'.encode('utf-8')
+        compressed_content = gzip.compress(content)
+
+        response = MockResponse(headers={'Content-Encoding': 'gzip', 'Content-Length': str(len(compressed_content))})
+        response.raw = HTTPResponse(
+            body=BytesIO(compressed_content),
+            headers={'Content-Encoding': 'gzip'},
+            preload_content=False,
+            decode_content=True,
+        )
+        get = mocker.patch('requests.get', return_value=response)
+
+        check = get_check({'metrics': ['.+'], 'use_compression': True, 'telemetry': True})
+        dd_run_check(check)
+
+        assert 'gzip' in get.call_args[1]['headers']['Accept-Encoding']
+        for i in range(100):
+            aggregator.assert_metric('test.go_memstats_alloc_bytes', i, tags=['endpoint:test', f'pod:{i}'])
+
+        aggregator.assert_metric(
+            'test.telemetry.payload.received.size',
+            len(compressed_content),
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'encoding:gzip'],
+        )
+        aggregator.assert_metric(
+            'test.telemetry.payload.decompressed.size',
+            len(content),
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'encoding:gzip'],
+        )
+
+    def test_identity(self, aggregator, dd_run_check, mock_http_response):
+        content = '# TYPE go_memstats_alloc_bytes gauge\ngo_memstats_alloc_bytes 6\n'
+        mock_http_response(content)
+
+        check = get_check({'metrics': ['.+'], 'use_compression': True, 'telemetry': True})
+        dd_run_check(check)
+
+        aggregator.assert_metric('test.go_memstats_alloc_bytes', 6, tags=['endpoint:test'])
+        aggregator.assert_metric(
+            'test.telemetry.payload.decompressed.size',
+            len(content),
+            metric_type=aggregator.GAUGE,
+            tags=['endpoint:test', 'encoding:identity'],
+        )
+
+
 class TestMetrics:
     def test_unknown_type_override(self, aggregator, dd_run_check, mock_http_response):
         mock_http_response(
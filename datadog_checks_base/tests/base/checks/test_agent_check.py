@@ -5,6 +5,7 @@
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import json
 import logging
+import re
 from typing import Any  # noqa: F401
 
 import mock
@@ -456,6 +457,75 @@ class TestMetrics:
         aggregator.assert_metric(metric_name, count=0)
 
 
+class TestBatchMetrics:
+    def test_submit_many(self, aggregator):
+        check = AgentCheck('test', {}, [{'metric_patterns': {'exclude': ['excluded']}}])
+        check.__NAMESPACE__ = 'test'
+        tags = ['foo:bar']
+
+        check.submit_many(
+            [aggregator.GAUGE, aggregator.COUNT, aggregator.GAUGE, aggregator.GAUGE, aggregator.MONOTONIC_COUNT],
+            ['metric', 'metric', 'excluded', 'none', 'total'],
+            [1, 2, 3, None, '4'],
+            [tags, [b'bar:baz'], tags, tags, None],
+            hostname='host',
+            flush_first_value=True,
+        )
+
+        aggregator.assert_metric('test.metric', 1, tags=['foo:bar'], hostname='host', metric_type=aggregator.GAUGE)
+        aggregator.assert_metric('test.metric', 2, tags=['bar:baz'], hostname='host', metric_type=aggregator.COUNT)
+        aggregator.assert_metric(
+            'test.total', 4, tags=[], hostname='host', metric_type=aggregator.MONOTONIC_COUNT, flush_first_value=True
+        )
+        aggregator.assert_all_metrics_covered()
+
+    def test_submit_many_normalizes_once(self, aggregator):
+        check = AgentCheck()
+        tags = ['foo:bar']
+
+        with mock.patch.object(check, '_normalize_tags_type', wraps=check._normalize_tags_type) as normalize:
+            check.submit_many(aggregator.GAUGE, ['metric'] * 3, [1, 2, 3], [tags] * 3)
+
+        assert normalize.call_count == 1
+        aggregator.assert_metric('metric', tags=['foo:bar'], count=3)
+
+    def test_submit_many_without_bulk_entry_point(self, aggregator):
+        check = AgentCheck()
+
+        with mock.patch.object(aggregator, 'submit_metrics', None):
+            check.submit_many(aggregator.RATE, ['metric', 'other'], [1, 2], raw=True)
+
+        aggregator.assert_metric('metric', 1, metric_type=aggregator.RATE)
+        aggregator.assert_metric('other', 2, metric_type=aggregator.RATE)
+        aggregator.assert_all_metrics_covered()
+
+    def test_submit_many_limit(self, aggregator):
+        check = AgentCheck('test', {}, [{'max_returned_metrics': 2}])
+
+        check.gauge_batch(['metric'] * 3, [1, 2, 3])
+
+        assert len(check.get_warnings()) == 1
+        assert len(aggregator.metrics('metric')) == 2
+
+    def test_submit_many_non_float_metric(self, aggregator):
+        check = AgentCheck()
+
+        with pytest.raises(ValueError):
+            check.gauge_batch(['metric', 'other'], [1, '85k'])
+
+        aggregator.assert_metric('metric', count=0)
+
+    def test_gauge_batch(self, aggregator):
+        check = AgentCheck()
+        check.__NAMESPACE__ = 'test'
+
+        check.gauge_batch(['metric', 'other'], [1, 2], [['foo:bar'], ['bar:baz']])
+
+        aggregator.assert_metric('test.metric', 1, tags=['foo:bar'], metric_type=aggregator.GAUGE)
+        aggregator.assert_metric('test.other', 2, tags=['bar:baz'], metric_type=aggregator.GAUGE)
+        aggregator.assert_all_metrics_covered()
+
+
 class TestEvents:
     def test_valid_event(self, aggregator):
         check = AgentCheck()
@@ -646,6 +716,57 @@ class TestTags:
         tags = check._normalize_tags_type(tags=["foo:bar", "cluster:my_cluster", "version", "bar"])
         assert set(tags) == expected_tags
 
+    def test_normalized_tags_cache(self):
+        check = AgentCheck('myintegration', {}, [{'normalized_tags_cache_size': 2, 'disable_generic_tags': True}])
+        tags = [b'foo:bar', 'cluster:my_cluster']
+
+        normalized_tags = check._normalize_tags_type(tags)
+        assert normalized_tags == ['foo:bar', 'myintegration_cluster:my_cluster']
+
+        with mock.patch.object(check, 'degeneralise_tag', side_effect=AssertionError('tags must be cached')):
+            cached_tags = check._normalize_tags_type(tags)
+
+        assert cached_tags == normalized_tags
+        assert cached_tags is not check._normalize_tags_type(tags)
+        assert check._normalized_tags_cache_hits == 2
+        assert check._normalized_tags_cache_misses == 1
+
+    def test_normalized_tags_cache_eviction(self):
+        check = AgentCheck('myintegration', {}, [{'normalized_tags_cache_size': 2}])
+
+        check._normalize_tags_type(['foo:bar'])
+        check._normalize_tags_type(['bar:baz'])
+        check._normalize_tags_type(['foo:bar'])
+        check._normalize_tags_type(['baz:foo'])
+
+        assert list(check._normalized_tags_cache) == [('foo:bar',), ('baz:foo',)]
+
+    def test_normalized_tags_cache_disabled(self):
+        check = AgentCheck('myintegration', {}, [{}])
+        check._normalize_tags_type(['foo:bar'])
+
+        assert check._normalized_tags_cache is None
+
+    def test_normalized_tags_cache_invalid_size(self):
+        check = AgentCheck('myintegration', {}, [{'normalized_tags_cache_size': 'foo'}])
+
+        assert check._normalized_tags_cache is None
+        assert len(check.get_warnings()) == 1
+
+    def test_normalized_tags_cache_debug_metrics(self, aggregator, dd_run_check):
+        class TestCheck(AgentCheck):
+            def check(self, _):
+                for _ in range(3):
+                    self.gauge('foo', 0, tags=['foo:bar'])
+
+        instance = {'normalized_tags_cache_size': 10, 'debug_metrics': {'normalized_tags_cache': True}}
+        check = TestCheck('test', {}, [instance])
+        dd_run_check(check)
+
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.size', 1)
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.hits', 2)
+        aggregator.assert_metric('datadog.agent.metrics.tags_cache.misses', 1)
+
     @pytest.mark.parametrize(
         "exclude_metrics_filters, include_metrics_filters, expected_metrics",
         [
@@ -710,6 +831,34 @@ class TestTags:
         aggregator.assert_service_check('ns.test.can_check', status=AgentCheck.OK)
         aggregator.assert_all_metrics_covered()
 
+    def test_metrics_filters_memoized(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{'metric_patterns': {'exclude': ['excluded']}}])
+        check.__NAMESPACE__ = 'ns'
+        check.gauge('my_metric', 0)
+        check.gauge('excluded', 0)
+
+        with mock.patch.object(check, 'should_send_metric', side_effect=AssertionError('decisions must be memoized')):
+            check.gauge('my_metric', 1)
+            check.gauge('excluded', 1)
+
+        assert check._metric_names == {('my_metric', False): 'ns.my_metric', ('excluded', False): None}
+        aggregator.assert_metric('ns.my_metric', count=2)
+        aggregator.assert_all_metrics_covered()
+
+    def test_metrics_filters_memo_invalidation(self, aggregator):
+        check = AgentCheck('myintegration', {}, [{}])
+        check.gauge('my_metric', 0)
+
+        check.__NAMESPACE__ = 'ns'
+        check.gauge('my_metric', 1)
+
+        check.exclude_metrics_pattern = re.compile('my_metric')
+        check.gauge('my_metric', 2)
+
+        aggregator.assert_metric('my_metric', 0, count=1)
+        aggregator.assert_metric('ns.my_metric', 1, count=1)
+        aggregator.assert_all_metrics_covered()
+
     @pytest.mark.parametrize(
         "exclude_metrics_filters, include_metrics_filters, expected_error",
         [
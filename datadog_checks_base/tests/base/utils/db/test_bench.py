@@ -0,0 +1,55 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under a 3-clause BSD style license (see LICENSE)
+import pytest
+
+from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
+from datadog_checks.dev.testing import requires_py3
+
+pytestmark = [requires_py3]
+
+METRICS = ['calls', 'total_time', 'rows', 'shared_blks_hit', 'shared_blks_read']
+
+
+def key(row):
+    return row['query_signature'], row['datname'], row['rolname']
+
+
+def make_rows(count, run):
+    rows = []
+    for i in range(count):
+        # Every tenth query is executed between runs and every hundredth query is a duplicate after normalization
+        calls = 100 + (run if i % 10 == 0 else 0)
+        rows.append(
+            {
+                'query_signature': 'sig{}'.format(i - i % 100 if i % 100 == 1 else i),
+                'query': 'SELECT * FROM table{} WHERE id = ?'.format(i),
+                'datname': 'db{}'.format(i // 100 % 8),
+                'rolname': 'user',
+                'calls': calls,
+                'total_time': calls * 1.5,
+                'rows': calls * 10,
+                'shared_blks_hit': calls * 4,
+                'shared_blks_read': calls,
+            }
+        )
+
+    return rows
+
+
+@pytest.mark.parametrize('count', [10000, 50000, 100000], ids=['10k', '50k', '100k'])
+def test_compute_derivative_rows(benchmark, count):
+    state = StatementMetrics()
+    state.compute_derivative_rows(make_rows(count, 0), METRICS, key=key)
+
+    runs = iter(range(1, 1000))
+    results = []
+
+    def setup():
+        return (make_rows(count, next(runs)), METRICS), {'key': key}
+
+    def compute_derivative_rows(rows, metrics, key):
+        results.append(state.compute_derivative_rows(rows, metrics, key))
+
+    benchmark.pedantic(compute_derivative_rows, setup=setup, rounds=5)
+    assert all(len(rows) == count // 10 for rows in results)
@@ -2,12 +2,16 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+import threading
+import time
 
+import mock
 import pytest
 
 from datadog_checks.base import AgentCheck
 from datadog_checks.base.stubs.aggregator import AggregatorStub
 from datadog_checks.base.utils.db import QueryManager
+from datadog_checks.dev.testing import requires_py3
 
 from .common import create_query_manager, mock_executor
 
@@ -57,6 +61,18 @@ class TestQueryCompilation:
         with pytest.raises(ValueError, match='^field `tags` for test query must be a list$'):
             query_manager.compile_queries()
 
+    @pytest.mark.parametrize('option_name', ['collection_interval', 'timeout'])
+    @pytest.mark.parametrize('option', [0, -1, True, '5'])
+    def test_scheduling_option_invalid(self, option_name, option):
+        query_manager = create_query_manager(
+            {'name': 'test query', 'query': 'foo', 'columns': [{}], option_name: option}
+        )
+
+        with pytest.raises(
+            ValueError, match='^field `{}` for test query must be a positive number$'.format(option_name)
+        ):
+            query_manager.compile_queries()
+
     def test_column_not_dict(self):
         query_manager = create_query_manager(
             {'name': 'test query', 'query': 'foo', 'columns': [['column']], 'tags': ['test:bar']}
@@ -953,6 +969,60 @@ class TestSubmission:
         )
         aggregator.assert_all_metrics_covered()
 
+    def test_row_processor(self, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [
+                    {'name': 'test.foo', 'type': 'gauge'},
+                    {'name': 'test.bar', 'type': 'source'},
+                    {'name': 'nullable', 'type': 'tag_not_null'},
+                    {'name': 'list', 'type': 'tag_list'},
+                ],
+                'tags': ['test:bar'],
+            },
+            executor=mock_executor([[1, 2, None, 'a,b'], [3, 4, 'tag', []]]),
+            tags=['test:foo'],
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        aggregator.assert_metric(
+            'test.foo', 1, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar', 'list:a', 'list:b']
+        )
+        aggregator.assert_metric(
+            'test.foo', 3, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar', 'nullable:tag']
+        )
+        aggregator.assert_all_metrics_covered()
+
+    def test_row_processor_without_tag_columns(self, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test.foo', 'type': 'gauge'}, None, {'name': 'test.bar', 'type': 'count'}],
+                'tags': ['test:bar'],
+            },
+            executor=mock_executor([[1, 'ignored', 2], [3, 'ignored', 4]]),
+            tags=['test:foo'],
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+        query_manager.execute(extra_tags=['test:runtime'])
+
+        aggregator.assert_metric('test.foo', 1, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar'], count=1)
+        aggregator.assert_metric('test.foo', 3, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar'], count=1)
+        aggregator.assert_metric('test.bar', 6, metric_type=aggregator.COUNT, tags=['test:foo', 'test:bar'])
+        aggregator.assert_metric(
+            'test.foo', 1, metric_type=aggregator.GAUGE, tags=['test:foo', 'test:bar', 'test:runtime'], count=1
+        )
+        aggregator.assert_metric(
+            'test.bar', 6, metric_type=aggregator.COUNT, tags=['test:foo', 'test:bar', 'test:runtime']
+        )
+        assert query_manager.tags == ['test:foo']
+        assert query_manager.queries[0].base_tags == ['test:bar']
+
     def test_kwarg_passing(self, aggregator):
         class MyCheck(AgentCheck):
             __NAMESPACE__ = 'test_check'
@@ -1210,3 +1280,163 @@ class TestSubmission:
             )
 
         aggregator.assert_all_metrics_covered()
+
+
+class TestScheduling:
+    def test_collection_interval(self, aggregator):
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test.foo', 'type': 'gauge'}],
+                'collection_interval': 60,
+            },
+            {'name': 'test query 2', 'query': 'bar', 'columns': [{'name': 'test.bar', 'type': 'gauge'}]},
+            executor=mock_executor([[1]]),
+            track_query_telemetry=True,
+        )
+        query_manager.compile_queries()
+
+        with mock.patch('datadog_checks.base.utils.db.core.get_precise_time', return_value=100):
+            query_manager.execute()
+        with mock.patch('datadog_checks.base.utils.db.core.get_precise_time', return_value=130):
+            query_manager.execute()
+
+        assert len(aggregator.metrics('test.foo')) == 1
+        assert len(aggregator.metrics('test.bar')) == 2
+        aggregator.assert_metric('dd.test.query.skipped', 1, tags=['query:test query', 'reason:interval'])
+
+        with mock.patch('datadog_checks.base.utils.db.core.get_precise_time', return_value=160):
+            query_manager.execute()
+
+        assert len(aggregator.metrics('test.foo')) == 2
+        assert len(aggregator.metrics('test.bar')) == 3
+
+    @requires_py3
+    def test_executor_pool(self, aggregator):
+        barrier = threading.Barrier(2, timeout=5)
+
+        def executor(query):
+            # Both queries must run at the same time to get past the barrier
+            barrier.wait()
+            return [[1 if query == 'foo' else 2]]
+
+        query_manager = create_query_manager(
+            {'name': 'test query', 'query': 'foo', 'columns': [{'name': 'test.foo', 'type': 'gauge'}]},
+            {'name': 'test query 2', 'query': 'bar', 'columns': [{'name': 'test.bar', 'type': 'gauge'}]},
+            executor_pool=[executor, executor],
+            track_query_telemetry=True,
+            tags=['test:foo'],
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        aggregator.assert_metric('test.foo', 1, tags=['test:foo'])
+        aggregator.assert_metric('test.bar', 2, tags=['test:foo'])
+        aggregator.assert_metric('dd.test.query.duration', tags=['test:foo', 'query:test query'])
+        aggregator.assert_metric('dd.test.query.duration', tags=['test:foo', 'query:test query 2'])
+        aggregator.assert_all_metrics_covered()
+
+    def test_timeout(self, caplog, aggregator):
+        done = threading.Event()
+
+        def executor(query):
+            if query == 'foo':
+                done.wait(5)
+            return [[1]]
+
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test.foo', 'type': 'gauge'}],
+                'timeout': 0.1,
+            },
+            {'name': 'test query 2', 'query': 'bar', 'columns': [{'name': 'test.bar', 'type': 'gauge'}]},
+            executor_pool=[executor, executor],
+            track_query_telemetry=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        assert 'Query test query timed out after 0.1 seconds' in caplog.text
+        aggregator.assert_metric('test.foo', count=0)
+        aggregator.assert_metric('test.bar', 1)
+        aggregator.assert_metric('dd.test.query.skipped', 1, tags=['query:test query', 'reason:timeout'])
+
+        # The query is not executed again until the previous execution finishes
+        aggregator.reset()
+        query_manager.execute()
+        aggregator.assert_metric('test.bar', 1)
+        aggregator.assert_metric('dd.test.query.skipped', 1, tags=['query:test query', 'reason:running'])
+
+        done.set()
+        time.sleep(0.1)
+        aggregator.reset()
+        query_manager.execute()
+        aggregator.assert_metric('test.foo', 1)
+        aggregator.assert_metric('test.bar', 1)
+
+    def test_timeout_cancels_query(self, caplog, aggregator):
+        cancelled = threading.Event()
+
+        def executor(query):
+            if query == 'foo':
+                cancelled.wait(5)
+            return [[1]]
+
+        def cancel_query(pooled_executor):
+            assert pooled_executor is executor
+            cancelled.set()
+
+        query_manager = create_query_manager(
+            {
+                'name': 'test query',
+                'query': 'foo',
+                'columns': [{'name': 'test.foo', 'type': 'gauge'}],
+                'timeout': 0.1,
+            },
+            executor_pool=[executor],
+            track_query_telemetry=True,
+            query_canceler=cancel_query,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        assert cancelled.is_set()
+        aggregator.assert_metric('dd.test.query.skipped', 1, tags=['query:test query', 'reason:timeout'])
+
+    def test_timeout_excludes_queue_wait(self, aggregator):
+        def executor(query):
+            if query == 'foo':
+                time.sleep(0.2)
+            return [[1]]
+
+        query_manager = create_query_manager(
+            {'name': 'test query', 'query': 'foo', 'columns': [{'name': 'test.foo', 'type': 'gauge'}]},
+            {
+                'name': 'test query 2',
+                'query': 'bar',
+                'columns': [{'name': 'test.bar', 'type': 'gauge'}],
+                'timeout': 0.15,
+            },
+            executor_pool=[executor],
+            track_query_telemetry=True,
+        )
+        query_manager.compile_queries()
+        query_manager.execute()
+
+        # The second query waits for the only executor longer than its timeout, but runs within it
+        aggregator.assert_metric('test.foo', 1)
+        aggregator.assert_metric('test.bar', 1)
+        aggregator.assert_metric('dd.test.query.skipped', count=0)
+
+    def test_cancel(self):
+        query_manager = create_query_manager(
+            {'name': 'test query', 'query': 'foo', 'columns': [{'name': 'test.foo', 'type': 'gauge'}]},
+            executor_pool=[lambda query: [[1]]],
+        )
+        query_manager.cancel()
+
+        with pytest.raises(RuntimeError):
+            query_manager.thread_pool.submit(lambda: None)
@@ -2,6 +2,7 @@
 # (C) Datadog, Inc. 2020-present
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
+import threading
 import time
 from concurrent.futures.thread import ThreadPoolExecutor
 
@@ -10,9 +11,15 @@ import pytest
 
 from datadog_checks.base import AgentCheck
 from datadog_checks.base.stubs.datadog_agent import datadog_agent
+from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.utils import (
     ConstantRateLimiter,
     DBMAsyncJob,
+    DBMAsyncJobScheduler,
+    ObfuscationCache,
+    PersistableRateLimitingTTLCache,
+    PersistableTTLCache,
+    PersistentCaches,
     RateLimitingTTLCache,
     obfuscate_sql_with_metadata,
     resolve_db_host,
@@ -73,6 +80,66 @@ def test_ratelimiting_ttl_cache():
         assert cache.acquire(i), "cache should be empty again so these keys should go in OK"
 
 
+def test_persistable_ttl_cache():
+    cache = PersistableTTLCache(maxsize=5, ttl=0.4)
+    cache['a'] = 1
+    time.sleep(0.2)
+    cache[('b', 'c')] = [2]
+
+    items = cache.dump()
+    assert [item[:2] for item in items] == [['a', 1], [('b', 'c'), [2]]]
+
+    # The items keep their expiration time once restored
+    restored = PersistableTTLCache(maxsize=5, ttl=0.4)
+    restored.load(json.loads(json.dumps(items)))
+    assert dict(restored) == {'a': 1, ('b', 'c'): (2,)}
+    time.sleep(0.3)
+    assert dict(restored) == {('b', 'c'): (2,)}
+
+    # Expired items are not restored
+    time.sleep(0.2)
+    restored = PersistableTTLCache(maxsize=5, ttl=0.4)
+    restored.load(items)
+    assert len(restored) == 0
+
+
+def test_persistent_caches():
+    check = AgentCheck('test', {}, [{}])
+    check.check_id = 'test:instance'
+    errors = PersistableRateLimitingTTLCache(maxsize=5, ttl=60)
+    states = PersistableTTLCache(maxsize=5, ttl=60)
+    caches = PersistentCaches(check, 'explain_caches')
+    caches.add('errors', errors)
+    caches.add(
+        'states',
+        states,
+        encode=lambda key, value: (key, value['code']) if value['code'] else None,
+        decode=lambda key, value: (key, {'code': value}),
+    )
+    errors.acquire(('db', 'sig'))
+    states['db'] = {'code': 'error'}
+    states['db2'] = {'code': None}
+
+    # Saves are rate limited
+    caches.save()
+    assert not check.read_persistent_cache('explain_caches')
+    caches.save(force=True)
+    assert check.read_persistent_cache('explain_caches')
+
+    errors = PersistableRateLimitingTTLCache(maxsize=5, ttl=60)
+    states = PersistableTTLCache(maxsize=5, ttl=60)
+    caches = PersistentCaches(check, 'explain_caches')
+    caches.add('errors', errors)
+    caches.add('states', states, decode=lambda key, value: (key, {'code': value}))
+    caches.load()
+    assert not errors.acquire(('db', 'sig'))
+    assert dict(states) == {'db': {'code': 'error'}}
+
+    # An invalid snapshot is ignored
+    check.write_persistent_cache('explain_caches', 'invalid')
+    PersistentCaches(check, 'explain_caches').load()
+
+
 class TestDBExcepption(BaseException):
     pass
 
@@ -164,8 +231,64 @@ def test_obfuscate_sql_with_metadata(obfuscator_return_value, expected_value):
     assert statement['metadata'] == {}
 
 
+def test_obfuscation_cache(aggregator):
+    check = AgentCheck()
+    cache = ObfuscationCache()
+    options = json.dumps({'return_json_metadata': True})
+
+    with mock.patch.object(datadog_agent, 'obfuscate_sql', wraps=datadog_agent.obfuscate_sql) as mock_agent:
+        statement = cache.obfuscate('SELECT  *  FROM datadog', options)
+        assert statement == {
+            'query': 'SELECT * FROM datadog',
+            'query_signature': compute_sql_signature('SELECT * FROM datadog'),
+            'metadata': {'tables': None},
+        }
+        assert cache.obfuscate('SELECT  *  FROM datadog', options) is statement
+        assert mock_agent.call_count == 1
+
+        # The obfuscator options are part of the key
+        assert cache.obfuscate('SELECT  *  FROM datadog', None) == {
+            'query': 'SELECT * FROM datadog',
+            'query_signature': compute_sql_signature('SELECT * FROM datadog'),
+            'metadata': {},
+        }
+        assert mock_agent.call_count == 2
+
+    assert cache.obfuscate(None) == {'query': '', 'query_signature': None, 'metadata': {}}
+    assert len(cache) == 2
+
+    cache.submit_debug_metrics(check, 'postgres', tags=['foo:bar'])
+    aggregator.assert_metric('dd.postgres.obfuscation_cache.hit_ratio', value=1 / 3.0, tags=['foo:bar'])
+    aggregator.assert_metric('dd.postgres.obfuscation_cache.hits', value=1, tags=['foo:bar'])
+    aggregator.assert_metric('dd.postgres.obfuscation_cache.misses', value=2, tags=['foo:bar'])
+    aggregator.assert_metric('dd.postgres.obfuscation_cache.entries', value=2, tags=['foo:bar'])
+    aggregator.assert_metric('dd.postgres.obfuscation_cache.size', value=cache.size, tags=['foo:bar'])
+    assert cache.hits == cache.misses == 0
+
+
+def test_obfuscation_cache_bounds():
+    query = 'SELECT * FROM datadog WHERE id = {}'
+    cache = ObfuscationCache(max_size=1000, ttl=0.1)
+    for i in range(100):
+        cache.obfuscate(query.format(i))
+
+    assert 0 < cache.size <= 1000
+    assert len(cache) < 100
+
+    # The most recently used statements are kept
+    cache.obfuscate(query.format(99))
+    assert cache.hits == 1
+
+    time.sleep(0.2)
+    assert len(cache) == 0
+
+    # Statements larger than the cache are not cached
+    cache.obfuscate('SELECT {} FROM datadog'.format(', '.join(['column'] * 1000)))
+    assert len(cache) == 0
+
+
 class TestJob(DBMAsyncJob):
-    def __init__(self, check, run_sync=False, enabled=True, rate_limit=10, min_collection_interval=15):
+    def __init__(self, check, run_sync=False, enabled=True, rate_limit=10, min_collection_interval=15, job_time=0):
         super(TestJob, self).__init__(
             check,
             run_sync=run_sync,
@@ -178,12 +301,14 @@ class TestJob(DBMAsyncJob):
             job_name="test-job",
             shutdown_callback=self.test_shutdown,
         )
+        self.job_time = job_time
 
     def test_shutdown(self):
         self._check.count("dbm.async_job_test.shutdown", 1)
 
     def run_job(self):
         self._check.count("dbm.async_job_test.run_job", 1)
+        time.sleep(self.job_time)
 
 
 def test_dbm_async_job():
@@ -225,6 +350,22 @@ def test_dbm_async_job_cancel(aggregator):
     aggregator.assert_metric("dbm.async_job_test.shutdown")
 
 
+def test_dbm_async_job_cancel_saves_persistent_caches():
+    check = AgentCheck('test', {}, [{}])
+    check.check_id = 'test:instance'
+    job = TestJob(check)
+    ratelimiter = PersistableRateLimitingTTLCache(maxsize=5, ttl=60)
+    job._persistent_caches = PersistentCaches(check, 'job_caches')
+    job._persistent_caches.add('ratelimiter', ratelimiter)
+    ratelimiter.acquire('key')
+
+    job.run_job_loop([])
+    job.cancel()
+    job._job_loop_future.result()
+    # The caches are saved on cancel even though the save interval has not elapsed
+    assert check.read_persistent_cache('job_caches')
+
+
 def test_dbm_async_job_run_sync(aggregator):
     job = TestJob(AgentCheck(), run_sync=True)
     job.run_job_loop([])
@@ -254,3 +395,74 @@ def test_dbm_async_job_inactive_stop(aggregator):
     job.run_job_loop([])
     job._job_loop_future.result()
     aggregator.assert_metric("dd.test-dbms.async_job.inactive_stop", tags=['job:test-job'])
+
+
+def test_dbm_async_job_scheduler_max_workers():
+    running = []
+    max_running = []
+    lock = threading.Lock()
+
+    class ConcurrentJob(TestJob):
+        def run_job(self):
+            with lock:
+                running.append(self)
+                max_running.append(len(running))
+            time.sleep(0.05)
+            with lock:
+                running.remove(self)
+
+    with mock.patch.object(DBMAsyncJob, 'scheduler', DBMAsyncJobScheduler(2)), mock.patch(
+        'datadog_checks.base.utils.db.utils.logger'
+    ) as logger:
+        jobs = [ConcurrentJob(AgentCheck()) for _ in range(10)]
+        for job in jobs:
+            job.run_job_loop([])
+        time.sleep(0.5)
+        for job in jobs:
+            job.cancel()
+        for job in jobs:
+            job._job_loop_future.result(timeout=5)
+
+    # Every job ran although at most two of them ran at the same time
+    assert len(max_running) >= len(jobs)
+    assert max(max_running) == 2
+    # Queued iterations are reported once per interval
+    assert logger.warning.call_count == 1
+
+
+def test_dbm_async_job_iteration_crash_restarts():
+    job = TestJob(AgentCheck())
+    with mock.patch.object(job, '_run_job_loop_iteration', side_effect=Exception('boom')):
+        job.run_job_loop([])
+        with pytest.raises(Exception, match='boom'):
+            job._job_loop_future.result(timeout=5)
+
+    # The next check run starts the job loop again
+    job.run_job_loop([])
+    assert job._job_loop_future.running()
+    job.cancel()
+    job._job_loop_future.result(timeout=5)
+
+
+def test_dbm_async_job_overrun(aggregator):
+    job = TestJob(AgentCheck(), rate_limit=10, job_time=0.15)
+    job.run_job_loop([])
+    time.sleep(1)
+    job.cancel()
+    job._job_loop_future.result()
+
+    # After an overrun the job waits for a full interval before running again
+    assert len(aggregator.metrics("dbm.async_job_test.run_job")) <= 5
+    aggregator.assert_metric("dd.test-dbms.async_job.overrun", tags=['job:test-job'])
+
+
+def test_dbm_async_job_scheduler_lag(aggregator):
+    job = TestJob(AgentCheck())
+    job.run_job_loop([])
+    time.sleep(0.2)
+    job.cancel()
+    job._job_loop_future.result()
+
+    aggregator.assert_metric("dd.test-dbms.async_job.scheduler_lag", tags=['job:test-job'])
+    for metric in aggregator.metrics("dd.test-dbms.async_job.scheduler_lag"):
+        assert 0 <= metric.value < 100
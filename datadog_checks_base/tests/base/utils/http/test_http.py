@@ -2,6 +2,8 @@
 # All rights reserved
 # Licensed under a 3-clause BSD style license (see LICENSE)
 import logging
+import threading
+from contextlib import contextmanager
 
 import mock
 import pytest
@@ -9,6 +11,8 @@ import requests
 import requests_unixsocket
 from flaky import flaky
 from six import PY2, iteritems
+from six.moves.BaseHTTPServer import BaseHTTPRequestHandler, HTTPServer
+from six.moves.socketserver import ThreadingMixIn
 
 from datadog_checks.base import AgentCheck
 from datadog_checks.base.utils.http import RequestsWrapper, is_uds_url, quote_uds_url
@@ -119,6 +123,114 @@ class TestSession:
             assert getattr(http.session, key) == value
 
 
+class KeepAliveHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        body = b'ok'
+        self.send_response(200)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+class ThreadingHTTPServer(ThreadingMixIn, HTTPServer):
+    daemon_threads = True
+
+
+@contextmanager
+def keep_alive_server():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), KeepAliveHandler)
+    thread = threading.Thread(target=server.serve_forever)
+    thread.daemon = True
+    thread.start()
+    try:
+        yield 'http://127.0.0.1:{}'.format(server.server_address[1])
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+class TestSharedConnections:
+    def test_default(self):
+        http = RequestsWrapper({}, {})
+
+        assert http.share_connections is False
+        assert http.connection_pool_size == requests.adapters.DEFAULT_POOLSIZE
+
+    def test_adapter_shared(self):
+        http1 = RequestsWrapper({'share_connections': True, 'connection_pool_size': 3}, {})
+        http2 = RequestsWrapper({'share_connections': True, 'connection_pool_size': 3}, {})
+
+        prefix, adapter = http1.get_shared_adapter('https://shared.example/metrics', http1.options)
+
+        assert prefix == 'https://shared.example/'
+        assert http2.get_shared_adapter('https://SHARED.example/other', http2.options) == (prefix, adapter)
+        assert http1.get_shared_adapter('https://shared.example.org/metrics', http1.options)[1] is not adapter
+        assert adapter._pool_maxsize == 3
+
+    def test_adapter_released(self):
+        import gc
+
+        from datadog_checks.base.utils.http import SHARED_ADAPTERS
+
+        http = RequestsWrapper({'share_connections': True}, {})
+        http.get_shared_adapter('https://released.example/metrics', http.options)
+        assert any(key[0] == 'https://released.example/' for key in SHARED_ADAPTERS.keys())
+
+        del http
+        gc.collect()
+
+        assert not any(key[0] == 'https://released.example/' for key in SHARED_ADAPTERS.keys())
+
+    def test_adapter_not_shared_across_tls_settings(self):
+        http1 = RequestsWrapper({'share_connections': True}, {})
+        http2 = RequestsWrapper({'share_connections': True, 'tls_verify': False}, {})
+        http3 = RequestsWrapper({'share_connections': True, 'tls_cert': '/path/to/cert'}, {})
+
+        adapters = {
+            id(http.get_shared_adapter('https://tls.example/metrics', http.options)[1])
+            for http in (http1, http2, http3)
+        }
+
+        assert len(adapters) == 3
+
+    def test_connections_reused(self):
+        http1 = RequestsWrapper({'share_connections': True}, {})
+        http2 = RequestsWrapper({'share_connections': True}, {})
+
+        with keep_alive_server() as url:
+            for http in (http1, http2, http1):
+                response = http.get(url)
+                assert response.content == b'ok'
+
+        assert http1.connection_stats == {'requests': 2, 'new_connections': 1}
+        assert http2.connection_stats == {'requests': 1, 'new_connections': 0}
+
+    def test_session_not_persisted(self):
+        http = RequestsWrapper({'share_connections': True}, {})
+
+        with keep_alive_server() as url:
+            http.get(url)
+            prefix, adapter = http.get_shared_adapter(url, http.options)
+
+        # The shared adapter is mounted on a single-use session, so no cookies are kept across requests
+        assert http._session is None
+        assert adapter.poolmanager.pools
+
+    def test_session_persisted(self):
+        http = RequestsWrapper({'share_connections': True, 'persist_connections': True}, {})
+
+        with keep_alive_server() as url:
+            http.get(url)
+            prefix, adapter = http.get_shared_adapter(url, http.options)
+
+        assert http.session.get_adapter(url) is adapter
+
+
 class TestLogger:
     def test_default(self, caplog):
         check = AgentCheck('test', {}, [{}])
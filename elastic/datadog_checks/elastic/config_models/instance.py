@@ -78,6 +78,7 @@ class InstanceConfig(BaseModel):
     cat_allocation_stats: Optional[bool]
     cluster_stats: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     custom_queries: Optional[Sequence[CustomQuery]]
     detailed_index_stats: Optional[bool]
     disable_generic_tags: Optional[bool]
@@ -108,6 +109,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     slm_stats: Optional[bool]
     submit_events: Optional[bool]
@@ -81,6 +81,7 @@ class InstanceConfig(BaseModel):
     bearer_token_path: Optional[str]
     bearer_token_refresh_interval: Optional[int]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     exclude_labels: Optional[Sequence[str]]
@@ -123,6 +124,7 @@ class InstanceConfig(BaseModel):
     send_monotonic_counter: Optional[bool]
     send_monotonic_with_gauge: Optional[bool]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
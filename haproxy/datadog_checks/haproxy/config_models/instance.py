@@ -116,6 +116,7 @@ class InstanceConfig(BaseModel):
     collect_status_metrics: Optional[bool]
     collect_status_metrics_by_host: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     count_status_by_service: Optional[bool]
     disable_generic_tags: Optional[bool]
     disable_legacy_service_tag: Optional[bool]
@@ -137,6 +138,7 @@ class InstanceConfig(BaseModel):
     ignore_metrics_by_labels: Optional[IgnoreMetricsByLabels]
     ignore_tags: Optional[Sequence[str]]
     include_labels: Optional[Sequence[str]]
+    incremental_parsing: Optional[bool]
     kerberos_auth: Optional[str]
     kerberos_cache: Optional[str]
     kerberos_delegate: Optional[bool]
@@ -145,9 +147,11 @@ class InstanceConfig(BaseModel):
     kerberos_keytab: Optional[str]
     kerberos_principal: Optional[str]
     label_joins: Optional[LabelJoins]
+    label_plan_cache_size: Optional[int]
     label_to_hostname: Optional[str]
     labels_mapper: Optional[Mapping[str, Any]]
     log_requests: Optional[bool]
+    max_concurrent_scrapes: Optional[int]
     metric_patterns: Optional[MetricPatterns]
     metrics: Optional[Sequence[Union[str, Mapping[str, Union[str, Metric]]]]]
     min_collection_interval: Optional[float]
@@ -174,8 +178,10 @@ class InstanceConfig(BaseModel):
     service: Optional[str]
     services_exclude: Optional[Sequence[str]]
     services_include: Optional[Sequence[str]]
+    share_connections: Optional[bool]
     share_labels: Optional[Mapping[str, Union[bool, ShareLabel]]]
     skip_proxy: Optional[bool]
+    skip_unconfigured_lines: Optional[bool]
     startup_grace_seconds: Optional[float]
     status_check: Optional[bool]
     tag_by_endpoint: Optional[bool]
@@ -193,11 +199,13 @@ class InstanceConfig(BaseModel):
     tls_verify: Optional[bool]
     type_overrides: Optional[Mapping[str, Any]]
     url: Optional[str]
+    use_compression: Optional[bool]
     use_latest_spec: Optional[bool]
     use_legacy_auth_encoding: Optional[bool]
     use_openmetrics: Optional[bool]
     use_process_start_time: Optional[bool]
     use_prometheus: Optional[bool]
+    use_protobuf: Optional[bool]
     username: Optional[str]
 
     @root_validator(pre=True)
@@ -48,6 +48,7 @@ class InstanceConfig(BaseModel):
     aws_service: Optional[str]
     collect_default_jvm_metrics: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     empty_default_hostname: Optional[bool]
     extra_headers: Optional[Mapping[str, Any]]
     headers: Optional[Mapping[str, Any]]
@@ -82,6 +83,7 @@ class InstanceConfig(BaseModel):
     rmi_connection_timeout: Optional[float]
     rmi_registry_ssl: Optional[bool]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
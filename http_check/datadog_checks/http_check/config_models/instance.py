@@ -57,6 +57,7 @@ class InstanceConfig(BaseModel):
     check_certificate_expiration: Optional[bool]
     collect_response_time: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     content_match: Optional[str]
     data: Optional[Union[Mapping[str, Any], str]]
     days_critical: Optional[int]
@@ -90,6 +91,7 @@ class InstanceConfig(BaseModel):
     seconds_critical: Optional[int]
     seconds_warning: Optional[int]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     ssl_server_name: Optional[str]
     stream: Optional[bool]
@@ -32,6 +32,7 @@ class InstanceConfig(BaseModel):
         allow_mutation = False
 
     channel: str = Field(..., min_length=1)
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     message_flows: Optional[bool]
@@ -46,6 +47,7 @@ class InstanceConfig(BaseModel):
     queue_manager: str = Field(..., min_length=1)
     resource_statistics: Optional[bool]
     service: Optional[str]
+    share_connections: Optional[bool]
     tags: Optional[Sequence[str]]
     tls_auth: Optional[bool]
     tls_certificate_label: Optional[str]
@@ -64,6 +64,7 @@ class InstanceConfig(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     custom_queries: Optional[Sequence[CustomQuery]]
     custom_queries_units_gauge: Optional[Sequence[str]]
     disable_generic_tags: Optional[bool]
@@ -89,6 +90,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     service: Optional[str]
     servlet_url: str
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
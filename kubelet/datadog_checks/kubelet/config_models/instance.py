@@ -83,6 +83,7 @@ class InstanceConfig(BaseModel):
     cadvisor_metrics_endpoint: Optional[str]
     cadvisor_port: Optional[int]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     enabled_gauges: Optional[Sequence[str]]
@@ -127,6 +128,7 @@ class InstanceConfig(BaseModel):
     send_monotonic_counter: Optional[bool]
     send_monotonic_with_gauge: Optional[bool]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
@@ -56,6 +56,7 @@ class InstanceConfig(BaseModel):
     aws_service: Optional[str]
     cluster_name: str
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     disable_legacy_cluster_tag: Optional[bool]
     empty_default_hostname: Optional[bool]
@@ -79,6 +80,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     resourcemanager_uri: str
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
@@ -103,6 +103,8 @@ class QueryMetrics(BaseModel):
 
     collection_interval: Optional[float]
     enabled: Optional[bool]
+    full_resync_interval: Optional[float]
+    last_seen_watermark: Optional[bool]
 
 
 class QuerySamples(BaseModel):
@@ -120,6 +122,7 @@ class QuerySamples(BaseModel):
     explained_queries_cache_maxsize: Optional[int]
     explained_queries_per_hour_per_query: Optional[int]
     fully_qualified_explain_procedure: Optional[str]
+    persist_caches: Optional[bool]
     samples_per_hour_per_query: Optional[int]
     seen_samples_cache_maxsize: Optional[int]
 
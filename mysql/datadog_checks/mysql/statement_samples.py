@@ -22,6 +22,9 @@ from datadog_checks.base.utils.common import to_native_string
 from datadog_checks.base.utils.db.sql import compute_exec_plan_signature, compute_sql_signature
 from datadog_checks.base.utils.db.utils import (
     DBMAsyncJob,
+    PersistableRateLimitingTTLCache,
+    PersistableTTLCache,
+    PersistentCaches,
     RateLimitingTTLCache,
     default_json_event_encoding,
     obfuscate_sql_with_metadata,
@@ -170,6 +173,19 @@ ExplainState = namedtuple('ExplainState', ['strategy', 'error_code', 'error_mess
 EMPTY_EXPLAIN_STATE = ExplainState(strategy=None, error_code=None, error_message=None)
 
 
+def _encode_explain_state(state):
+    return [state.strategy, state.error_code.value if state.error_code else None, state.error_message]
+
+
+def _decode_explain_state(value):
+    strategy, error_code, error_message = value
+    return ExplainState(
+        strategy=strategy,
+        error_code=DBExplainErrorCode(error_code) if error_code else None,
+        error_message=error_message,
+    )
+
+
 class MySQLStatementSamples(DBMAsyncJob):
     """
     Collects statement samples and execution plans.
@@ -220,19 +236,24 @@ class MySQLStatementSamples(DBMAsyncJob):
         self._init_caches()
 
     def _init_caches(self):
-        self._collection_strategy_cache = TTLCache(
+        persist_caches = is_affirmative(self._config.statement_samples_config.get('persist_caches', False))
+        # the persisted caches follow the wall clock, the others keep the monotonic clock of TTLCache
+        ttl_cache_class = PersistableTTLCache if persist_caches else TTLCache
+        ratelimiting_cache_class = PersistableRateLimitingTTLCache if persist_caches else RateLimitingTTLCache
+
+        self._collection_strategy_cache = ttl_cache_class(
             maxsize=self._config.statement_samples_config.get('collection_strategy_cache_maxsize', 1000),
             ttl=self._config.statement_samples_config.get('collection_strategy_cache_ttl', 300),
         )
 
         # explained_statements_cache: limit how often we try to re-explain the same query
-        self._explained_statements_ratelimiter = RateLimitingTTLCache(
+        self._explained_statements_ratelimiter = ratelimiting_cache_class(
             maxsize=self._config.statement_samples_config.get('explained_queries_cache_maxsize', 5000),
             ttl=45 * 60 / self._config.statement_samples_config.get('explained_queries_per_hour_per_query', 60),
         )
 
         # explain_error_states_cache. cache {(schema, query_signature) -> [explain_error_state])
-        self._explain_error_states_cache = TTLCache(
+        self._explain_error_states_cache = ttl_cache_class(
             maxsize=self._config.statement_samples_config.get('explain_errors_cache_maxsize', 5000),
             # only try to re-explain failed statements once every two hours, so in the worst case the maximum
             # re-explain rate of failed queries is ~ 5000/(2*60*60) = 1/second
@@ -247,6 +268,28 @@ class MySQLStatementSamples(DBMAsyncJob):
             ttl=60 * 60 / self._config.statement_samples_config.get('samples_per_hour_per_query', 15),
         )
 
+        # persistent_caches: keep the explain caches across agent restarts so that statements which cannot be explained
+        # are not retried and the explain rate limits still apply right after a restart
+        self._persistent_caches = None
+        if persist_caches:
+            self._persistent_caches = PersistentCaches(self._check, 'statement_samples_caches')
+            # the events_statements strategy is cheap to choose again so only the explain states are persisted
+            self._persistent_caches.add(
+                'collection_strategy',
+                self._collection_strategy_cache,
+                encode=lambda key, value: (
+                    None if key == 'events_statements_strategy' else (key, _encode_explain_state(value))
+                ),
+                decode=lambda key, value: (key, _decode_explain_state(value)),
+            )
+            self._persistent_caches.add(
+                'explain_error_states',
+                self._explain_error_states_cache,
+                encode=lambda key, value: (key, [_encode_explain_state(state) for state in value]),
+                decode=lambda key, value: (tuple(key), [_decode_explain_state(state) for state in value]),
+            )
+            self._persistent_caches.add('explained_statements', self._explained_statements_ratelimiter)
+
     def _read_version_info(self):
         if not self._version_processed and self._check.version:
             if self._check.version.flavor == "MariaDB" or not self._check.version.version_compatible((5, 7, 0)):
@@ -551,7 +594,11 @@ class MySQLStatementSamples(DBMAsyncJob):
         return strategy
 
     def run_job(self):
+        if self._persistent_caches:
+            self._persistent_caches.load()
         self._collect_statement_samples()
+        if self._persistent_caches:
+            self._persistent_caches.save()
 
     def _collect_statement_samples(self):
         self._read_version_info()
@@ -13,9 +13,14 @@ from cachetools import TTLCache
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.log import get_check_logger
 from datadog_checks.base.utils.common import to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
-from datadog_checks.base.utils.db.utils import DBMAsyncJob, default_json_event_encoding, obfuscate_sql_with_metadata
+from datadog_checks.base.utils.db.utils import (
+    OBFUSCATION_CACHE_MAX_SIZE,
+    OBFUSCATION_CACHE_TTL,
+    DBMAsyncJob,
+    ObfuscationCache,
+    default_json_event_encoding,
+)
 from datadog_checks.base.utils.serialization import json
 from datadog_checks.base.utils.tracking import tracked_method
 
@@ -46,6 +51,23 @@ METRICS_COLUMNS = {
     'sum_no_good_index_used',
 }
 
+# The digests that were executed since the previous collection. The digest text is only fetched during full resyncs,
+# or for the digests that were not seen before
+RECENT_STATEMENTS_SUMMARY_QUERY = """\
+    SELECT {columns}
+    FROM performance_schema.events_statements_summary_by_digest
+    WHERE (`digest_text` NOT LIKE 'EXPLAIN %%' OR `digest_text` IS NULL)
+    {filters}
+    ORDER BY `count_star` DESC
+    LIMIT 10000"""
+
+STATEMENTS_DIGEST_TEXT_QUERY = """\
+    SELECT `digest`, `digest_text`
+    FROM performance_schema.events_statements_summary_by_digest
+    WHERE `digest` IN ({digests})"""
+
+DEFAULT_FULL_RESYNC_INTERVAL = 600
+
 
 def _row_key(row):
     """
@@ -84,6 +106,25 @@ class MySQLStatementMetrics(DBMAsyncJob):
         self.log = get_check_logger()
         self._state = StatementMetrics()
         self._obfuscate_options = to_native_string(json.dumps(self._config.obfuscator_options))
+        # obfuscation_cache: the same digests are returned by every collection, so they are only obfuscated once
+        self._obfuscation_cache = ObfuscationCache(
+            max_size=self._config.statement_metrics_config.get(
+                'obfuscation_cache_max_size', OBFUSCATION_CACHE_MAX_SIZE
+            ),
+            ttl=self._config.statement_metrics_config.get('obfuscation_cache_ttl', OBFUSCATION_CACHE_TTL),
+        )
+        # Statements are only queried when they were executed since the previous collection, based on their
+        # LAST_SEEN column, with a full resync of all statements to account for truncated digests
+        self._last_seen_watermark_enabled = is_affirmative(
+            self._config.statement_metrics_config.get('last_seen_watermark', False)
+        )
+        self._full_resync_interval = self._config.statement_metrics_config.get(
+            'full_resync_interval', DEFAULT_FULL_RESYNC_INTERVAL
+        )
+        self._last_full_resync = 0
+        self._last_seen = None
+        # The latest normalized row of every digest, by schema and digest
+        self._monotonic_rows = {}
         # full_statement_text_cache: limit the ingestion rate of full statement text events per query_signature
         self._full_statement_text_cache = TTLCache(
             maxsize=self._config.full_statement_text_cache_max_size,
@@ -157,11 +198,17 @@ class MySQLStatementMetrics(DBMAsyncJob):
             tags=tags + self._check._get_debug_tags(),
             hostname=self._check.resolved_hostname,
         )
+        self._obfuscation_cache.submit_debug_metrics(
+            self._check, 'mysql', tags=tags + self._check._get_debug_tags(), hostname=self._check.resolved_hostname
+        )
 
     def _collect_per_statement_metrics(self):
         # type: () -> List[PyMysqlRow]
-        monotonic_rows = self._query_summary_per_statement()
-        monotonic_rows = self._normalize_queries(monotonic_rows)
+        if self._last_seen_watermark_enabled:
+            monotonic_rows = self._query_recent_summary_per_statement()
+        else:
+            monotonic_rows = self._query_summary_per_statement()
+            monotonic_rows = self._normalize_queries(monotonic_rows)
         rows = self._state.compute_derivative_rows(monotonic_rows, METRICS_COLUMNS, key=_row_key)
         return rows
 
@@ -201,19 +248,93 @@ class MySQLStatementMetrics(DBMAsyncJob):
 
         return rows
 
+    def _query_recent_summary_per_statement(self):
+        # type: () -> List[PyMysqlRow]
+        """
+        Collects per-statement metrics from performance schema, only for the digests whose `last_seen` is not older
+        than the latest `last_seen` of the previous collection. The other digests are unchanged, so their rows from
+        previous collections are reused. All digests are queried again during periodic full resyncs.
+        """
+        now = time.time()
+        full_resync = self._last_seen is None or now - self._last_full_resync >= self._full_resync_interval
+
+        columns = ['schema_name', 'digest', 'last_seen']
+        columns.extend(sorted(METRICS_COLUMNS))
+        filters = ''
+        params = ()
+        if full_resync:
+            columns.append('digest_text')
+        else:
+            filters = 'AND `last_seen` >= %s'
+            params = (self._last_seen,)
+
+        with closing(self._get_db_connection().cursor(pymysql.cursors.DictCursor)) as cursor:
+            cursor.execute(
+                RECENT_STATEMENTS_SUMMARY_QUERY.format(
+                    columns=', '.join('`{}`'.format(column) for column in columns), filters=filters
+                ),
+                params,
+            )
+            rows = cursor.fetchall() or []  # type: ignore
+
+            if full_resync:
+                self._monotonic_rows = {}
+                self._last_full_resync = now
+                new_rows = rows
+            else:
+                new_rows = [row for row in rows if (row['schema_name'], row['digest']) not in self._monotonic_rows]
+                if new_rows:
+                    digests = list({row['digest'] for row in new_rows})
+                    cursor.execute(
+                        STATEMENTS_DIGEST_TEXT_QUERY.format(digests=', '.join(['%s'] * len(digests))), digests
+                    )
+                    digest_texts = {row['digest']: row['digest_text'] for row in cursor.fetchall() or []}
+                    for row in new_rows:
+                        row['digest_text'] = digest_texts.get(row['digest'])
+
+                    # Digests may be removed from the table before their text is fetched
+                    new_rows = [row for row in new_rows if row['digest'] is None or row['digest'] in digest_texts]
+
+        self._check.count(
+            "dd.mysql.statement_metrics.digest_text.fetched",
+            len(new_rows),
+            tags=self._tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
+
+        for row in rows:
+            last_seen = row.pop('last_seen')
+            if self._last_seen is None or last_seen > self._last_seen:
+                self._last_seen = last_seen
+
+        for row in self._normalize_queries(new_rows):
+            self._monotonic_rows[(row['schema_name'], row['digest'])] = row
+
+        for row in rows:
+            if 'digest_text' in row:
+                continue
+
+            row_key = (row['schema_name'], row['digest'])
+            # Rows without text are from previous collections, only their metrics are updated
+            monotonic_row = dict(self._monotonic_rows[row_key])
+            monotonic_row.update(row)
+            self._monotonic_rows[row_key] = monotonic_row
+
+        return list(self._monotonic_rows.values())
+
     def _normalize_queries(self, rows):
         normalized_rows = []
         for row in rows:
             normalized_row = dict(copy.copy(row))
             try:
-                statement = obfuscate_sql_with_metadata(row['digest_text'], self._obfuscate_options)
+                statement = self._obfuscation_cache.obfuscate(row['digest_text'], self._obfuscate_options)
                 obfuscated_statement = statement['query'] if row['digest_text'] is not None else None
             except Exception as e:
                 self.log.warning("Failed to obfuscate query=[%s] | err=[%s]", row['digest_text'], e)
                 continue
 
             normalized_row['digest_text'] = obfuscated_statement
-            normalized_row['query_signature'] = compute_sql_signature(obfuscated_statement)
+            normalized_row['query_signature'] = statement['query_signature']
             metadata = statement['metadata']
             normalized_row['dd_tables'] = metadata.get('tables', None)
             normalized_row['dd_commands'] = metadata.get('commands', None)
@@ -173,6 +173,47 @@ def _obfuscate_sql(query, options=None):
     return re.sub(r'\s+', ' ', query or '').strip()
 
 
+@pytest.mark.integration
+@pytest.mark.usefixtures('dd_environment')
+@mock.patch.dict('os.environ', {'DDEV_SKIP_GENERIC_TAGS_CHECK': 'true'})
+def test_statement_metrics_last_seen_watermark(aggregator, dd_run_check, dbm_instance, datadog_agent):
+    dbm_instance['query_metrics']['last_seen_watermark'] = True
+    mysql_check = MySql(common.CHECK_NAME, {}, [dbm_instance])
+    query = DEFAULT_FQ_SUCCESS_QUERY
+    query_signature = compute_sql_signature(query)
+
+    def run_query(q):
+        with mysql_check._connect() as db:
+            with closing(db.cursor()) as cursor:
+                cursor.execute(q)
+
+    with mock.patch.object(datadog_agent, 'obfuscate_sql', passthrough=True) as m_obfuscate_sql:
+        m_obfuscate_sql.side_effect = _obfuscate_sql
+
+        run_query(query)
+        dd_run_check(mysql_check)
+        full_resync_rows = len(mysql_check._statement_metrics._monotonic_rows)
+
+        # Only the digests executed since the first collection are queried, the other rows are kept
+        run_query(query)
+        dd_run_check(mysql_check)
+        assert len(mysql_check._statement_metrics._monotonic_rows) >= full_resync_rows
+
+    # The text of every digest is fetched during the full resync, afterwards only the text of new digests is fetched
+    fetched = [m.value for m in aggregator.metrics('dd.mysql.statement_metrics.digest_text.fetched')]
+    assert fetched[0] == full_resync_rows
+    assert fetched[1] < full_resync_rows
+
+    events = aggregator.get_event_platform_events("dbm-metrics")
+    assert len(events) == 1
+    matching_rows = [r for r in events[0]['mysql_rows'] if r['query_signature'] == query_signature]
+    assert len(matching_rows) == 1
+    row = matching_rows[0]
+    assert row['count_star'] == 1
+    assert row['digest_text'] == query
+    assert 'last_seen' not in row
+
+
 @pytest.mark.integration
 @pytest.mark.usefixtures('dd_environment')
 @mock.patch.dict('os.environ', {'DDEV_SKIP_GENERIC_TAGS_CHECK': 'true'})
@@ -62,6 +62,7 @@ class InstanceConfig(BaseModel):
     collect_server_diagnostic_metrics: Optional[bool]
     collect_server_flavor_metrics: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     empty_default_hostname: Optional[bool]
     exclude_network_ids: Optional[Sequence[str]]
@@ -90,6 +91,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
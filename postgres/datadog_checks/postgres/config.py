@@ -45,6 +45,10 @@ class PostgresConfig:
                 "'dbname' parameter should not be set when `database_autodiscovery` is enabled."
                 "To monitor more databases, add them to the `database_autodiscovery` includelist."
             )
+        # The maximum number of seconds spent collecting the relation metrics of each autodiscovered database
+        self.database_time_budget = self.discovery_config.get('database_time_budget')
+        # The bloat metrics of each autodiscovered database are only collected every N check runs
+        self.bloat_metrics_refresh_runs = max(int(self.discovery_config.get('bloat_metrics_refresh_runs', 1)), 1)
 
         self.application_name = instance.get('application_name', 'datadog-agent')
         if not self.isascii(self.application_name):
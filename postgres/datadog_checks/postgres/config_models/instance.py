@@ -47,6 +47,8 @@ class DatabaseAutodiscovery(BaseModel):
     class Config:
         allow_mutation = False
 
+    bloat_metrics_refresh_runs: Optional[int]
+    database_time_budget: Optional[float]
     enabled: Optional[bool]
     exclude: Optional[Sequence[str]]
     include: Optional[Sequence[str]]
@@ -98,7 +100,9 @@ class QueryMetrics(BaseModel):
 
     collection_interval: Optional[float]
     enabled: Optional[bool]
+    fetch_query_text_separately: Optional[bool]
     pg_stat_statements_max_warning_threshold: Optional[float]
+    query_text_cache_max_size: Optional[int]
 
 
 class QuerySamples(BaseModel):
@@ -111,6 +115,7 @@ class QuerySamples(BaseModel):
     explain_parameterized_queries: Optional[bool]
     explained_queries_cache_maxsize: Optional[int]
     explained_queries_per_hour_per_query: Optional[int]
+    persist_caches: Optional[bool]
     samples_per_hour_per_query: Optional[int]
     seen_samples_cache_maxsize: Optional[int]
 
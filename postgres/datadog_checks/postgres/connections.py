@@ -51,6 +51,7 @@ class MultiDatabaseConnectionPool(object):
     TTL.
 
     If max_conns is specified, the connection pool will limit concurrent connections.
+    The pool is thread safe, threads waiting for a free slot do not block the others.
     """
 
     class Stats(object):
@@ -97,40 +98,72 @@ class MultiDatabaseConnectionPool(object):
         start = datetime.datetime.now()
         self.prune_connections()
         with self._mu:
+            # another thread reserved the slot of the database and is connecting to it
+            while dbname in self._conns and self._conns[dbname].connection is None:
+                if timeout is not None and (datetime.datetime.now() - start).total_seconds() > timeout:
+                    raise ConnectionPoolFullError(self.max_conns, timeout)
+                self._sleep_unlocked()
             conn = self._conns.pop(dbname, ConnectionInfo(None, None, None, None, None, None))
             db = conn.connection
-            if db is None or db.closed:
-                if self.max_conns is not None:
-                    # try to free space until we succeed
-                    while len(self._conns) >= self.max_conns:
-                        self.prune_connections()
-                        self.evict_lru()
-                        if timeout is not None and (datetime.datetime.now() - start).total_seconds() > timeout:
-                            raise ConnectionPoolFullError(self.max_conns, timeout)
-                        time.sleep(0.01)
-                        continue
-                self._stats.connection_opened += 1
-                db = self.connect_fn(dbname)
-                if startup_fn:
-                    startup_fn(db)
-            else:
+            if db is not None and not db.closed:
                 # if already in pool, retain persistence status
-                persistent = conn.persistent
-
-            if db.status != psycopg2.extensions.STATUS_READY:
-                # Some transaction went wrong and the connection is in an unhealthy state. Let's fix that
-                db.rollback()
-
-            deadline = datetime.datetime.now() + datetime.timedelta(milliseconds=ttl_ms)
+                return self._register_connection_unsafe(dbname, db, ttl_ms, conn.persistent)
+            if self.max_conns is not None:
+                # try to free space until we succeed
+                while len(self._conns) >= self.max_conns:
+                    self.prune_connections()
+                    self.evict_lru()
+                    if timeout is not None and (datetime.datetime.now() - start).total_seconds() > timeout:
+                        raise ConnectionPoolFullError(self.max_conns, timeout)
+                    self._sleep_unlocked()
+            # reserve the slot so that connecting does not block the other threads
             self._conns[dbname] = ConnectionInfo(
-                connection=db,
-                deadline=deadline,
+                connection=None,
+                deadline=datetime.datetime.max,
                 active=True,
-                last_accessed=datetime.datetime.now(),
+                last_accessed=start,
                 thread=threading.current_thread(),
                 persistent=persistent,
             )
-            return db
+            self._stats.connection_opened += 1
+
+        try:
+            db = self.connect_fn(dbname)
+            if startup_fn:
+                startup_fn(db)
+        except Exception:
+            with self._mu:
+                self._conns.pop(dbname, None)
+            raise
+
+        with self._mu:
+            return self._register_connection_unsafe(dbname, db, ttl_ms, persistent)
+
+    def _register_connection_unsafe(
+        self, dbname: str, db: psycopg2.extensions.connection, ttl_ms: int, persistent: bool
+    ) -> psycopg2.extensions.connection:
+        if db.status != psycopg2.extensions.STATUS_READY:
+            # Some transaction went wrong and the connection is in an unhealthy state. Let's fix that
+            db.rollback()
+
+        deadline = datetime.datetime.now() + datetime.timedelta(milliseconds=ttl_ms)
+        self._conns[dbname] = ConnectionInfo(
+            connection=db,
+            deadline=deadline,
+            active=True,
+            last_accessed=datetime.datetime.now(),
+            thread=threading.current_thread(),
+            persistent=persistent,
+        )
+        return db
+
+    def _sleep_unlocked(self):
+        # release the lock while waiting so that other threads can return their connections
+        self._mu.release()
+        try:
+            time.sleep(0.01)
+        finally:
+            self._mu.acquire()
 
     @contextlib.contextmanager
     def get_connection(self, dbname: str, ttl_ms: int, timeout: int = None, persistent: bool = False):
@@ -143,9 +176,8 @@ class MultiDatabaseConnectionPool(object):
         Note that leaving a connection context here does NOT close the connection in psycopg2;
         connections must be manually closed by `close_all_connections()`.
         """
+        db = self._get_connection_raw(dbname, ttl_ms, timeout, persistent=persistent)
         try:
-            with self._mu:
-                db = self._get_connection_raw(dbname, ttl_ms, timeout, persistent)
             yield db
         finally:
             with self._mu:
@@ -155,6 +187,19 @@ class MultiDatabaseConnectionPool(object):
                     # if self._get_connection_raw hit an exception, self._conns[dbname] didn't get populated
                     pass
 
+    def __len__(self):
+        with self._mu:
+            return len(self._conns)
+
+    def pop_stats(self) -> 'MultiDatabaseConnectionPool.Stats':
+        """
+        Return the statistics gathered since the last call and start gathering new ones.
+        """
+        with self._mu:
+            stats = self._stats
+            self._stats = self.Stats()
+            return stats
+
     def prune_connections(self):
         """
         This function should be called periodically to prune all connections which have not been
@@ -3,6 +3,8 @@
 # Licensed under Simplified BSD License (see LICENSE)
 import copy
 import os
+import zlib
+from concurrent.futures.thread import ThreadPoolExecutor
 from time import time
 
 import psycopg2
@@ -12,7 +14,7 @@ from datadog_checks.base import AgentCheck
 from datadog_checks.base.utils.db import QueryExecutor
 from datadog_checks.base.utils.db.utils import resolve_db_host as agent_host_resolver
 from datadog_checks.postgres import aws
-from datadog_checks.postgres.connections import MultiDatabaseConnectionPool
+from datadog_checks.postgres.connections import ConnectionPoolFullError, MultiDatabaseConnectionPool
 from datadog_checks.postgres.discovery import PostgresAutodiscovery
 from datadog_checks.postgres.metadata import PostgresMetadata
 from datadog_checks.postgres.metrics_cache import PostgresMetricsCache
@@ -58,6 +60,9 @@ except ImportError:
 
 MAX_CUSTOM_RESULTS = 100
 
+# The number of threads collecting the relation metrics of autodiscovered databases when `max_connections` is unset
+DEFAULT_RELATIONS_MAX_WORKERS = 10
+
 PG_SETTINGS_QUERY = "SELECT name, setting FROM pg_settings WHERE name IN (%s, %s, %s)"
 
 
@@ -99,6 +104,9 @@ class PostgreSql(AgentCheck):
         self.check_initializations.append(self.set_resolved_hostname_metadata)
         self.tags_without_db = [t for t in copy.copy(self.tags) if not t.startswith("db:")]
         self.autodiscovery = self._build_autodiscovery()
+        # Collects the relation metrics of the autodiscovered databases concurrently
+        self._relations_executor = None
+        self._relations_run_count = 0
 
         self._dynamic_queries = None
 
@@ -238,6 +246,8 @@ class PostgreSql(AgentCheck):
         self.statement_samples.cancel()
         self.statement_metrics.cancel()
         self.metadata_samples.cancel()
+        if self._relations_executor is not None:
+            self._relations_executor.shutdown(wait=False)
 
     def _clean_state(self):
         self.log.debug("Cleaning state")
@@ -349,7 +359,7 @@ class PostgreSql(AgentCheck):
     def resolve_db_host(self):
         return agent_host_resolver(self._config.host)
 
-    def _run_query_scope(self, cursor, scope, is_custom_metrics, cols, descriptors):
+    def _run_query_scope(self, cursor, scope, is_custom_metrics, cols, descriptors, state_errors=None):
         if scope is None:
             return None
         if scope == REPLICATION_METRICS or not self.version >= V9:
@@ -374,21 +384,19 @@ class PostgreSql(AgentCheck):
         except psycopg2.errors.FeatureNotSupported as e:
             # This happens for example when trying to get replication metrics from readers in Aurora. Let's ignore it.
             log_func(e)
-            self.db.rollback()
-            self.log.debug("Disabling replication metrics")
-            self._is_aurora = False
-            self.metrics_cache.replication_metrics = {}
+            cursor.connection.rollback()
+            self._reset_state_after_error(e, state_errors)
         except psycopg2.errors.UndefinedFunction as e:
             log_func(e)
             log_func(
                 "It seems the PG version has been incorrectly identified as %s. "
                 "A reattempt to identify the right version will happen on next agent run." % self._version
             )
-            self._clean_state()
-            self.db.rollback()
+            self._reset_state_after_error(e, state_errors)
+            cursor.connection.rollback()
         except (psycopg2.ProgrammingError, psycopg2.errors.QueryCanceled) as e:
             log_func("Not all metrics may be available: %s" % str(e))
-            self.db.rollback()
+            cursor.connection.rollback()
 
         if not results:
             return None
@@ -411,7 +419,21 @@ class PostgreSql(AgentCheck):
 
         return results
 
-    def _query_scope(self, cursor, scope, instance_tags, is_custom_metrics, dbname=None):
+    def _reset_state_after_error(self, error, state_errors=None):
+        """
+        Reset the check state invalidated by a query error. The errors of queries executed by the relations
+        executor are appended to `state_errors` instead, to be handled by the main thread.
+        """
+        if state_errors is not None:
+            state_errors.append(error)
+        elif isinstance(error, psycopg2.errors.FeatureNotSupported):
+            self.log.debug("Disabling replication metrics")
+            self._is_aurora = False
+            self.metrics_cache.replication_metrics = {}
+        elif isinstance(error, psycopg2.errors.UndefinedFunction):
+            self._clean_state()
+
+    def _query_scope(self, cursor, scope, instance_tags, is_custom_metrics, dbname=None, state_errors=None):
         if scope is None:
             return None
         # build query
@@ -421,7 +443,7 @@ class PostgreSql(AgentCheck):
         # A descriptor is the association of a Postgres column name (e.g. 'schemaname')
         # to a tag name (e.g. 'schema').
         descriptors = scope['descriptors']
-        results = self._run_query_scope(cursor, scope, is_custom_metrics, cols, descriptors)
+        results = self._run_query_scope(cursor, scope, is_custom_metrics, cols, descriptors, state_errors)
         if not results:
             return None
 
@@ -477,17 +499,29 @@ class PostgreSql(AgentCheck):
 
         return num_results
 
-    def _collect_relations_autodiscovery(self, instance_tags, relations_scopes):
+    def _collect_relations_autodiscovery(self, instance_tags, relations_scopes, bloat_scopes):
         if not self.autodiscovery:
             return
 
         start_time = time()
         databases = self.autodiscovery.get_items()
+        if self._relations_executor is None:
+            # Each database uses its own connection so the pool limits the number of concurrent databases
+            self._relations_executor = ThreadPoolExecutor(
+                max_workers=self.db_pool.max_conns or DEFAULT_RELATIONS_MAX_WORKERS,
+                thread_name_prefix='postgres-relations',
+            )
+        futures = []
         for db in databases:
-            with self.db_pool.get_connection(db, self._config.idle_connection_timeout) as conn:
-                with conn.cursor() as cursor:
-                    for scope in relations_scopes:
-                        self._query_scope(cursor, scope, instance_tags, False, db)
+            scopes = list(relations_scopes)
+            if self._should_collect_bloat_metrics(db):
+                scopes.extend(bloat_scopes)
+            futures.append(self._relations_executor.submit(self._collect_database_relations, db, instance_tags, scopes))
+        for future in futures:
+            for error in future.result():
+                self._reset_state_after_error(error)
+        self._relations_run_count += 1
+
         elapsed_ms = (time() - start_time) * 1000
         self.histogram(
             "dd.postgres._collect_relations_autodiscovery.time",
@@ -495,6 +529,7 @@ class PostgreSql(AgentCheck):
             tags=self.tags + self._get_debug_tags(),
             hostname=self.resolved_hostname,
         )
+        self._report_db_pool_stats()
         if elapsed_ms > self._config.min_collection_interval * 1000:
             self.record_warning(
                 DatabaseConfigurationError.autodiscovered_metrics_exceeds_collection_interval,
@@ -508,6 +543,69 @@ class PostgreSql(AgentCheck):
                 ),
             )
 
+    def _should_collect_bloat_metrics(self, dbname):
+        # The databases are spread across the runs so that their bloat queries are not all executed at once
+        runs = self._config.bloat_metrics_refresh_runs
+        return (self._relations_run_count + zlib.crc32(dbname.encode('utf-8'))) % runs == 0
+
+    def _collect_database_relations(self, dbname, instance_tags, scopes):
+        """
+        Called by the relations executor, this collects the relation metrics of an autodiscovered database
+        within the time budget of the database. The queries are cancelled by the server once the budget is
+        exhausted. Return the query errors that invalidate the check state.
+        """
+        start_time = time()
+        time_budget = self._config.database_time_budget
+        state_errors = []
+        try:
+            with self.db_pool.get_connection(dbname, self._config.idle_connection_timeout, timeout=time_budget) as conn:
+                with conn.cursor() as cursor:
+                    try:
+                        for i, scope in enumerate(scopes):
+                            if time_budget is not None:
+                                remaining = time_budget - (time() - start_time)
+                                if remaining <= 0:
+                                    self._skip_database_relations(dbname, scopes[i:])
+                                    break
+                                statement_timeout = self._budget_statement_timeout(remaining)
+                                cursor.execute("SET statement_timeout = %s", (statement_timeout,))
+                            self._query_scope(cursor, scope, instance_tags, False, dbname, state_errors)
+                    finally:
+                        if time_budget is not None and not conn.closed:
+                            # The connection is shared with the other collectors, restore its configured timeout
+                            cursor.execute("RESET statement_timeout")
+        except ConnectionPoolFullError:
+            self._skip_database_relations(dbname, scopes)
+        return state_errors
+
+    def _budget_statement_timeout(self, remaining):
+        # statement_timeout is in milliseconds, and a value of 0 disables it
+        timeout_ms = max(int(remaining * 1000), 1)
+        if self._config.query_timeout:
+            timeout_ms = min(timeout_ms, self._config.query_timeout)
+        return timeout_ms
+
+    def _skip_database_relations(self, dbname, scopes):
+        self.log.warning(
+            "Collecting relation metrics for database %s exceeded the time budget of %s seconds, skipping %d queries",
+            dbname,
+            self._config.database_time_budget,
+            len(scopes),
+        )
+        self.count(
+            "dd.postgres._collect_relations_autodiscovery.skipped_queries",
+            len(scopes),
+            tags=self.tags_without_db + ['db:{}'.format(dbname)] + self._get_debug_tags(),
+            hostname=self.resolved_hostname,
+        )
+
+    def _report_db_pool_stats(self):
+        tags = self.tags + self._get_debug_tags()
+        stats = self.db_pool.pop_stats()
+        for name, value in iteritems(stats.__dict__):
+            self.count("dd.postgres.db_pool.{}".format(name), value, tags=tags, hostname=self.resolved_hostname)
+        self.gauge("dd.postgres.db_pool.connections", len(self.db_pool), tags=tags, hostname=self.resolved_hostname)
+
     def _collect_stats(self, instance_tags):
         """Query pg_stat_* for various metrics
         If relations is not an empty list, gather per-relation metrics
@@ -530,16 +628,14 @@ class PostgreSql(AgentCheck):
         # Do we need relation-specific metrics?
         if self._config.relations:
             relations_scopes = list(RELATION_METRICS)
-
-            if self._config.collect_bloat_metrics:
-                relations_scopes.extend([INDEX_BLOAT, TABLE_BLOAT])
+            bloat_scopes = [INDEX_BLOAT, TABLE_BLOAT] if self._config.collect_bloat_metrics else []
 
             # If autodiscovery is enabled, get relation metrics from all databases found
             if self.autodiscovery:
-                self._collect_relations_autodiscovery(instance_tags, relations_scopes)
+                self._collect_relations_autodiscovery(instance_tags, relations_scopes, bloat_scopes)
             # otherwise, continue just with dbname
             else:
-                metric_scope.extend(relations_scopes)
+                metric_scope.extend(relations_scopes + bloat_scopes)
 
         replication_metrics = self.metrics_cache.get_replication_metrics(self.version, self.is_aurora)
         if replication_metrics:
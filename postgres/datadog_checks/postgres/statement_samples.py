@@ -22,6 +22,9 @@ from datadog_checks.base.utils.common import to_native_string
 from datadog_checks.base.utils.db.sql import compute_exec_plan_signature, compute_sql_signature
 from datadog_checks.base.utils.db.utils import (
     DBMAsyncJob,
+    PersistableRateLimitingTTLCache,
+    PersistableTTLCache,
+    PersistentCaches,
     RateLimitingTTLCache,
     default_json_event_encoding,
     obfuscate_sql_with_metadata,
@@ -213,19 +216,24 @@ class PostgresStatementSamples(DBMAsyncJob):
         self._explain_parameterized_queries = ExplainParameterizedQueries(check, config)
         self._obfuscate_options = to_native_string(json.dumps(self._config.obfuscator_options))
 
-        self._collection_strategy_cache = TTLCache(
+        persist_caches = is_affirmative(config.statement_samples_config.get('persist_caches', False))
+        # the persisted caches follow the wall clock, the others keep the monotonic clock of TTLCache
+        ttl_cache_class = PersistableTTLCache if persist_caches else TTLCache
+        ratelimiting_cache_class = PersistableRateLimitingTTLCache if persist_caches else RateLimitingTTLCache
+
+        self._collection_strategy_cache = ttl_cache_class(
             maxsize=config.statement_samples_config.get('collection_strategy_cache_maxsize', 1000),
             ttl=config.statement_samples_config.get('collection_strategy_cache_ttl', 300),
         )
 
-        self._explain_errors_cache = TTLCache(
+        self._explain_errors_cache = ttl_cache_class(
             maxsize=config.statement_samples_config.get('explain_errors_cache_maxsize', 5000),
             # only try to re-explain invalid statements once per day
             ttl=config.statement_samples_config.get('explain_errors_cache_ttl', 24 * 60 * 60),
         )
 
         # explained_statements_ratelimiter: limit how often we try to re-explain the same query
-        self._explained_statements_ratelimiter = RateLimitingTTLCache(
+        self._explained_statements_ratelimiter = ratelimiting_cache_class(
             maxsize=int(config.statement_samples_config.get('explained_queries_cache_maxsize', 5000)),
             ttl=60 * 60 / int(config.statement_samples_config.get('explained_queries_per_hour_per_query', 60)),
         )
@@ -238,6 +246,26 @@ class PostgresStatementSamples(DBMAsyncJob):
             ttl=60 * 60 / int(config.statement_samples_config.get('samples_per_hour_per_query', 15)),
         )
 
+        # persistent_caches: keep the explain caches across agent restarts so that queries which cannot be explained
+        # are not retried and the explain rate limits still apply right after a restart
+        self._persistent_caches = None
+        if persist_caches:
+            self._persistent_caches = PersistentCaches(check, 'statement_samples_caches')
+            # only successful setup states are persisted as the cached exceptions cannot be serialized
+            self._persistent_caches.add(
+                'collection_strategy',
+                self._collection_strategy_cache,
+                encode=lambda key, value: (key, None) if value[0] is None else None,
+                decode=lambda key, value: (key, (None, None)),
+            )
+            self._persistent_caches.add(
+                'explain_errors',
+                self._explain_errors_cache,
+                encode=lambda key, value: (key, [value[1].value, value[2]]),
+                decode=lambda key, value: (key, (None, DBExplainError(value[0]), value[1])),
+            )
+            self._persistent_caches.add('explained_statements', self._explained_statements_ratelimiter)
+
         self._activity_coll_enabled = is_affirmative(self._config.statement_activity_config.get('enabled', True))
         self._explain_plan_coll_enabled = is_affirmative(self._config.statement_samples_config.get('enabled', True))
 
@@ -432,8 +460,12 @@ class PostgresStatementSamples(DBMAsyncJob):
         # do not emit any dd.internal metrics for DBM specific check code
         self.tags = [t for t in self._tags if not t.startswith('dd.internal')]
         self._tags_no_db = [t for t in self.tags if not t.startswith('db:')]
+        if self._persistent_caches:
+            self._persistent_caches.load()
         self._collect_statement_samples()
         self.db_pool.prune_connections()
+        if self._persistent_caches:
+            self._persistent_caches.save()
 
     @tracked_method(agent_check_getter=agent_check_getter)
     def _collect_statement_samples(self):
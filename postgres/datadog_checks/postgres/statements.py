@@ -8,13 +8,18 @@ import time
 
 import psycopg2
 import psycopg2.extras
-from cachetools import TTLCache
+from cachetools import LRUCache, TTLCache
 
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.utils.common import to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
-from datadog_checks.base.utils.db.utils import DBMAsyncJob, default_json_event_encoding, obfuscate_sql_with_metadata
+from datadog_checks.base.utils.db.utils import (
+    OBFUSCATION_CACHE_MAX_SIZE,
+    OBFUSCATION_CACHE_TTL,
+    DBMAsyncJob,
+    ObfuscationCache,
+    default_json_event_encoding,
+)
 from datadog_checks.base.utils.serialization import json
 from datadog_checks.base.utils.tracking import tracked_method
 
@@ -39,6 +44,26 @@ SELECT {cols}
   {extra_clauses}
 """
 
+# pg_stat_statements(showtext := false) does not read the query text file. The text of the statements that the
+# user is not allowed to see is hidden along with their queryid, so it is used to exclude them
+STATEMENTS_WITHOUT_TEXT_QUERY = """
+SELECT {cols}
+  FROM pg_stat_statements(showtext := false) as pg_stat_statements
+  LEFT JOIN pg_roles
+         ON pg_stat_statements.userid = pg_roles.oid
+  LEFT JOIN pg_database
+         ON pg_stat_statements.dbid = pg_database.oid
+  WHERE queryid IS NOT NULL
+  {filters}
+"""
+
+STATEMENTS_TEXT_QUERY = """
+SELECT dbid, userid, queryid, query
+  FROM pg_stat_statements
+  WHERE queryid = ANY(%s)
+  AND query != '<insufficient privilege>'
+"""
+
 # Use pg_stat_statements(false) when available as an optimization to avoid pulling SQL text from disk
 PG_STAT_STATEMENTS_COUNT_QUERY = "SELECT COUNT(*) FROM pg_stat_statements(false)"
 PG_STAT_STATEMENTS_COUNT_QUERY_LT_9_4 = "SELECT COUNT(*) FROM pg_stat_statements"
@@ -139,6 +164,18 @@ class PostgresStatementMetrics(DBMAsyncJob):
         self._stat_column_cache = []
         self._track_io_timing_cache = None
         self._obfuscate_options = to_native_string(json.dumps(self._config.obfuscator_options))
+        # query_text_cache: the text of every statement keyed by (dbid, userid, queryid), so that pg_stat_statements
+        # can be polled without its query text
+        self._query_text_cache = None
+        if is_affirmative(config.statement_metrics_config.get('fetch_query_text_separately', False)):
+            self._query_text_cache = LRUCache(
+                maxsize=config.statement_metrics_config.get('query_text_cache_max_size', 10000)
+            )
+        # obfuscation_cache: the same statements are returned by every collection, so they are only obfuscated once
+        self._obfuscation_cache = ObfuscationCache(
+            max_size=config.statement_metrics_config.get('obfuscation_cache_max_size', OBFUSCATION_CACHE_MAX_SIZE),
+            ttl=config.statement_metrics_config.get('obfuscation_cache_ttl', OBFUSCATION_CACHE_TTL),
+        )
         # full_statement_text_cache: limit the ingestion rate of full statement text events per query_signature
         self._full_statement_text_cache = TTLCache(
             maxsize=config.full_statement_text_cache_max_size,
@@ -284,6 +321,9 @@ class PostgresStatementMetrics(DBMAsyncJob):
                 )
                 params = params + tuple(self._config.ignore_databases)
             with self._check._get_main_db().cursor(cursor_factory=psycopg2.extras.DictCursor) as cursor:
+                if self._can_fetch_query_text_separately(available_columns):
+                    return self._load_pg_stat_statements_with_cached_text(cursor, query_columns, filters, params)
+
                 return self._execute_query(
                     cursor,
                     STATEMENTS_QUERY.format(
@@ -352,6 +392,69 @@ class PostgresStatementMetrics(DBMAsyncJob):
 
             return []
 
+    def _can_fetch_query_text_separately(self, available_columns):
+        if self._query_text_cache is None:
+            return False
+
+        # The text can only be omitted when querying the function directly, and is matched by queryid
+        if (
+            self._check.version < V9_4
+            or self._config.pg_stat_statements_view != 'pg_stat_statements'
+            or 'queryid' not in available_columns
+        ):
+            self._log.debug("Unable to fetch the query text separately from pg_stat_statements, polling it instead")
+            return False
+
+        return True
+
+    def _load_pg_stat_statements_with_cached_text(self, cursor, query_columns, filters, params):
+        """
+        Load the statements from pg_stat_statements without their text, which is only fetched for the statements
+        that are not in the query text cache.
+        """
+        columns = [column for column in query_columns if column != 'query'] + ['dbid', 'userid']
+        rows = self._execute_query(
+            cursor,
+            STATEMENTS_WITHOUT_TEXT_QUERY.format(cols=', '.join(columns), filters=filters),
+            params=params,
+        )
+
+        missing_query_ids = {
+            row['queryid'] for row in rows if (row['dbid'], row['userid'], row['queryid']) not in self._query_text_cache
+        }
+        if missing_query_ids:
+            text_rows = self._execute_query(cursor, STATEMENTS_TEXT_QUERY, params=(list(missing_query_ids),))
+            for dbid, userid, queryid, query in text_rows:
+                self._query_text_cache[(dbid, userid, queryid)] = query
+
+        self._check.count(
+            "dd.postgres.statement_metrics.query_text.fetched",
+            len(missing_query_ids),
+            tags=self.tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
+        self._check.gauge(
+            "dd.postgres.statement_metrics.query_text_cache.len",
+            len(self._query_text_cache),
+            tags=self.tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
+
+        statements = []
+        for row in rows:
+            query = self._query_text_cache.get((row['dbid'], row['userid'], row['queryid']))
+            # Statements may be evicted from pg_stat_statements before their text is fetched
+            if query is None or query.startswith('EXPLAIN '):
+                continue
+
+            statement = dict(row)
+            del statement['dbid']
+            del statement['userid']
+            statement['query'] = query
+            statements.append(statement)
+
+        return statements
+
     def _emit_pg_stat_statements_dealloc(self):
         if self._check.version < V14:
             return
@@ -425,7 +528,7 @@ class PostgresStatementMetrics(DBMAsyncJob):
         for row in rows:
             normalized_row = dict(copy.copy(row))
             try:
-                statement = obfuscate_sql_with_metadata(row['query'], self._obfuscate_options)
+                statement = self._obfuscation_cache.obfuscate(row['query'], self._obfuscate_options)
             except Exception as e:
                 if self._config.log_unobfuscated_queries:
                     self._log.warning("Failed to obfuscate query=[%s] | err=[%s]", row['query'], e)
@@ -435,12 +538,18 @@ class PostgresStatementMetrics(DBMAsyncJob):
 
             obfuscated_query = statement['query']
             normalized_row['query'] = obfuscated_query
-            normalized_row['query_signature'] = compute_sql_signature(obfuscated_query)
+            normalized_row['query_signature'] = statement['query_signature']
             metadata = statement['metadata']
             normalized_row['dd_tables'] = metadata.get('tables', None)
             normalized_row['dd_commands'] = metadata.get('commands', None)
             normalized_rows.append(normalized_row)
 
+        self._obfuscation_cache.submit_debug_metrics(
+            self._check,
+            'postgres',
+            tags=self.tags + self._check._get_debug_tags(),
+            hostname=self._check.resolved_hostname,
+        )
         return normalized_rows
 
     def _rows_to_fqt_events(self, rows):
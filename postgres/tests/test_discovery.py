@@ -176,6 +176,34 @@ def test_autodiscovery_collect_all_relations(aggregator, integration_check, pg_i
     aggregator.assert_metric(
         'dd.postgres._collect_relations_autodiscovery.time',
     )
+    aggregator.assert_metric('dd.postgres.db_pool.connections')
+    aggregator.assert_metric('dd.postgres.db_pool.connection_opened')
+
+
+@pytest.mark.integration
+@pytest.mark.usefixtures('dd_environment')
+def test_autodiscovery_database_time_budget(aggregator, integration_check, pg_instance):
+    """
+    Check that the relation queries of a database are skipped once its time budget is exceeded.
+    """
+    pg_instance["database_autodiscovery"] = copy.deepcopy(DISCOVERY_CONFIG)
+    pg_instance["database_autodiscovery"]["include"] = ["dogs$", "dogs_noschema$", "dogs_nofunc$"]
+    pg_instance["database_autodiscovery"]["database_time_budget"] = 0.000001
+    pg_instance['relations'] = [
+        {'relation_regex': '.*'},
+    ]
+    del pg_instance['dbname']
+
+    check = integration_check(pg_instance)
+    check.check(pg_instance)
+
+    for db in check.autodiscovery.get_items():
+        aggregator.assert_metric(
+            'dd.postgres._collect_relations_autodiscovery.skipped_queries',
+            tags=check.tags_without_db + ['db:{}'.format(db)] + check._get_debug_tags(),
+        )
+    for metric in RELATION_METRICS:
+        aggregator.assert_metric(metric, count=0)
 
 
 @pytest.mark.integration
@@ -113,6 +113,7 @@ def test_statement_metrics_version(integration_check, dbm_instance, version, exp
 @pytest.mark.parametrize("dbstrict,ignore_databases", [(True, []), (False, ['dogs']), (False, [])])
 @pytest.mark.parametrize("pg_stat_statements_view", ["pg_stat_statements", "datadog.pg_stat_statements()"])
 @pytest.mark.parametrize("track_io_timing_enabled", [True, False])
+@pytest.mark.parametrize("fetch_query_text_separately", [True, False])
 def test_statement_metrics(
     aggregator,
     integration_check,
@@ -122,6 +123,7 @@ def test_statement_metrics(
     pg_stat_statements_view,
     datadog_agent,
     track_io_timing_enabled,
+    fetch_query_text_separately,
 ):
     dbm_instance['dbstrict'] = dbstrict
     dbm_instance['ignore_databases'] = ignore_databases
@@ -130,7 +132,12 @@ def test_statement_metrics(
     dbm_instance['query_samples'] = {'enabled': False}
     dbm_instance['query_activity'] = {'enabled': False}
     # very low collection interval for test purposes
-    dbm_instance['query_metrics'] = {'enabled': True, 'run_sync': True, 'collection_interval': 0.1}
+    dbm_instance['query_metrics'] = {
+        'enabled': True,
+        'run_sync': True,
+        'collection_interval': 0.1,
+        'fetch_query_text_separately': fetch_query_text_separately,
+    }
     connections = {}
 
     def _run_queries():
@@ -2,6 +2,7 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 import copy
+import threading
 
 import mock
 import psycopg2
@@ -12,6 +13,7 @@ from semver import VersionInfo
 from six import iteritems
 
 from datadog_checks.postgres import PostgreSql, util
+from datadog_checks.postgres.connections import MultiDatabaseConnectionPool
 
 from .common import PORT
 
@@ -348,3 +350,92 @@ def test_resolved_hostname(disable_generic_tags, expected_hostname, pg_instance)
         assert resolve_db_host_mock.called == disable_generic_tags, 'Expected resolve_db_host.called to be ' + str(
             disable_generic_tags
         )
+
+
+def test_bloat_metrics_refresh_runs(pg_instance):
+    instance = copy.deepcopy(pg_instance)
+    instance['database_autodiscovery'] = {'enabled': True, 'bloat_metrics_refresh_runs': 3}
+    instance['relations'] = [{'relation_regex': '.*'}]
+    del instance['dbname']
+    check = PostgreSql('test_instance', {}, [instance])
+
+    databases = ['dogs_{}'.format(i) for i in range(30)]
+    runs = []
+    for run in range(6):
+        check._relations_run_count = run
+        runs.append({db for db in databases if check._should_collect_bloat_metrics(db)})
+
+    # Every database is collected once every three runs, and the databases are spread across the runs
+    for db in databases:
+        assert [db in collected for collected in runs] in (
+            [True, False, False] * 2,
+            [False, True, False] * 2,
+            [False, False, True] * 2,
+        )
+    assert all(runs[:3])
+
+
+def test_statement_samples_persist_caches(pg_instance):
+    from datadog_checks.postgres.statement_samples import DBExplainError
+
+    instance = copy.deepcopy(pg_instance)
+    instance['dbm'] = True
+    instance['query_samples'] = {'persist_caches': True}
+    check = PostgreSql('test_instance', {}, [instance])
+    samples = check.statement_samples
+    samples._persistent_caches.load()
+    samples._collection_strategy_cache['ok_db'] = (None, None)
+    samples._collection_strategy_cache['failed_db'] = (DBExplainError.database_error, Exception('failed'))
+    samples._explain_errors_cache['sig'] = (None, DBExplainError.undefined_table, "<class 'UndefinedTable'>")
+    samples._explained_statements_ratelimiter.acquire(('dogs', 'sig'))
+    samples._persistent_caches.save(force=True)
+
+    restored = PostgreSql('test_instance', {}, [instance]).statement_samples
+    restored._persistent_caches.load()
+    assert dict(restored._collection_strategy_cache) == {'ok_db': (None, None)}
+    assert dict(restored._explain_errors_cache) == {
+        'sig': (None, DBExplainError.undefined_table, "<class 'UndefinedTable'>")
+    }
+    assert not restored._explained_statements_ratelimiter.acquire(('dogs', 'sig'))
+
+
+def test_relation_errors_reset_state_on_main_thread(pg_instance):
+    check = PostgreSql('test_instance', {}, [pg_instance])
+    check._is_aurora = True
+    error = psycopg2.errors.FeatureNotSupported()
+
+    state_errors = []
+    check._reset_state_after_error(error, state_errors)
+    assert state_errors == [error]
+    assert check._is_aurora is True
+
+    check._reset_state_after_error(error)
+    assert check._is_aurora is False
+
+
+def test_conn_pool_connects_outside_lock():
+    connecting = threading.Event()
+    connected = threading.Event()
+
+    def connect(dbname):
+        if dbname == 'slow':
+            connecting.set()
+            assert connected.wait(5)
+        return MagicMock(closed=False, status=psycopg2.extensions.STATUS_READY)
+
+    pool = MultiDatabaseConnectionPool(connect, max_conns=2)
+
+    def connect_slow():
+        with pool.get_connection('slow', 60000):
+            pass
+
+    thread = threading.Thread(target=connect_slow)
+    thread.start()
+    assert connecting.wait(5)
+    # The slow connection reserved its slot, connecting to another database is not blocked by it
+    with pool.get_connection('fast', 60000):
+        assert len(pool) == 2
+    connected.set()
+    thread.join(5)
+    assert not thread.is_alive()
+    assert pool._stats.connection_opened == 2
@@ -7,12 +7,16 @@ from pyasn1.type.univ import Null
 from pysnmp import hlapi  # noqa: F401
 from pysnmp.entity.rfc3413 import cmdgen
 from pysnmp.hlapi.asyncore.cmdgen import vbProcessor
-from pysnmp.proto import errind
+from pysnmp.proto import errind, rfc1905
 from pysnmp.proto.rfc1905 import endOfMibView
 
 from datadog_checks.base.errors import CheckException
 
 from .config import InstanceConfig  # noqa: F401
+from .models import BulkWalk  # noqa: F401
+
+# Error status of a response which doesn't fit in a single message
+TOO_BIG = rfc1905.errorStatus.clone('tooBig')
 
 
 def _handle_error(ctx, config):
@@ -23,6 +27,16 @@ def _handle_error(ctx, config):
         raise CheckException(message)
 
 
+def handle_too_big(error_status, walk, config):
+    # type: (Any, BulkWalk, InstanceConfig) -> bool
+    """Return whether a GETBULK request should be sent again with fewer repetitions after a `tooBig` error."""
+    if error_status != TOO_BIG:
+        return False
+    if walk.back_off():
+        return True
+    raise CheckException('{} for device {}'.format(error_status.prettyPrint(), config.device))
+
+
 def snmp_get(config, oids, lookup_mib):
     # type: (InstanceConfig, list, bool) -> list
     """Call SNMP GET on a list of oids."""
@@ -112,9 +126,9 @@ def snmp_getnext(config, oids, lookup_mib, ignore_nonincreasing_oid):
         initial_vars = new_initial_vars
 
 
-def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_nonincreasing_oid):
-    # type: (InstanceConfig, hlapi.ObjectType, int, int, bool, bool) -> Generator
-    """Call SNMP GETBULK on an oid."""
+def snmp_bulk(config, oid, non_repeaters, walk, lookup_mib, ignore_nonincreasing_oid):
+    # type: (InstanceConfig, hlapi.ObjectType, int, BulkWalk, bool, bool) -> Generator
+    """Call SNMP GETBULK on an oid, requesting `walk.max_repetitions` rows at a time."""
 
     if config.device is None:
         raise RuntimeError('No device set')  # pragma: no cover
@@ -126,6 +140,7 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
         if ignore_nonincreasing_oid and errorIndication and isinstance(errorIndication, errind.OidNotIncreasing):
             errorIndication = None
         cbCtx['error'] = errorIndication
+        cbCtx['error_status'] = errorStatus
         cbCtx['var_bind_table'] = var_bind_table
 
     ctx = {}  # type: Dict[str, Any]
@@ -136,13 +151,14 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
     gen = cmdgen.BulkCommandGenerator()
 
     while True:
+        walk.requests += 1
         gen.sendVarBinds(
             config._snmp_engine,
             config.device.target,
             config._context_data.contextEngineId,
             config._context_data.contextName,
             non_repeaters,
-            max_repetitions,
+            walk.max_repetitions,
             vbProcessor.makeVarBinds(config._snmp_engine, var_binds),
             callback,
             ctx,
@@ -151,12 +167,15 @@ def snmp_bulk(config, oid, non_repeaters, max_repetitions, lookup_mib, ignore_no
         config._snmp_engine.transportDispatcher.runDispatcher()
 
         _handle_error(ctx, config)
+        if handle_too_big(ctx['error_status'], walk, config):
+            continue
 
         for var_binds in ctx['var_bind_table']:
             name, value = var_binds[0]
             if endOfMibView.isSameTypeWith(value):
                 return
             if initial_var.isPrefixOf(name):
+                walk.rows += 1
                 yield var_binds[0]
             else:
                 return
@@ -11,12 +11,23 @@ from typing import Any, DefaultDict, Dict, Iterator, List, Optional, Set, Tuple
 from datadog_checks.base import ConfigurationError, is_affirmative
 
 from .mibs import MIBLoader
-from .models import OID, Device
-from .parsing import ParsedMetric, ParsedSymbolMetric, SymbolTag, parse_metrics, parse_symbol_metric_tags  # noqa: F401
+from .models import OID, BulkWalk, Device  # noqa: F401
+from .parsing import (  # noqa: F401
+    ParsedMetric,
+    ParsedSymbolMetric,
+    ParsedTableMetric,
+    SymbolTag,
+    parse_metrics,
+    parse_symbol_metric_tags,
+    register_metrics,
+    register_symbol_metric_tags,
+)
+from .profiles import CompiledProfile, ProfileIndex, compile_profile  # noqa: F401
 from .pysnmp_types import (
     CommunityData,
     ContextData,
     OctetString,
+    SnmpEngine,  # noqa: F401
     UsmUserData,
     hlapi,
     usmDESPrivProtocol,
@@ -38,7 +49,11 @@ class InstanceConfig:
     DEFAULT_TIMEOUT = 5
     DEFAULT_ALLOWED_FAILURES = 3
     DEFAULT_BULK_THRESHOLD = 0
+    DEFAULT_BULK_MAX_REPETITIONS = 100
     DEFAULT_WORKERS = 5
+    DEFAULT_DISCOVERY_WORKERS = 5
+    DEFAULT_DISCOVERY_MAX_BACKOFF = 8
+    DEFAULT_REQUEST_WINDOW = 1
     DEFAULT_REFRESH_OIDS_CACHE_INTERVAL = 0  # `0` means disabled
 
     AUTH_PROTOCOL_MAPPING = {
@@ -70,6 +85,7 @@ class InstanceConfig:
         profiles_by_oid=None,  # type: Dict[str, str]
         loader=None,  # type: MIBLoader
         logger=None,  # type: Logger
+        profile_index=None,  # type: ProfileIndex
     ):
         # type: (...) -> None
         global_metrics = [] if global_metrics is None else global_metrics
@@ -106,14 +122,22 @@ class InstanceConfig:
         self.failing_instances = defaultdict(int)  # type: DefaultDict[str, int]
         self.allowed_failures = int(instance.get('discovery_allowed_failures', self.DEFAULT_ALLOWED_FAILURES))
         self.workers = int(instance.get('workers', self.DEFAULT_WORKERS))
+        self.discovery_workers = int(instance.get('discovery_workers', self.DEFAULT_DISCOVERY_WORKERS))
+        self.discovery_max_backoff = int(instance.get('discovery_max_backoff', self.DEFAULT_DISCOVERY_MAX_BACKOFF))
 
         self.bulk_threshold = int(instance.get('bulk_threshold', self.DEFAULT_BULK_THRESHOLD))
+        self.bulk_max_repetitions = int(instance.get('bulk_max_repetitions', self.DEFAULT_BULK_MAX_REPETITIONS))
+        if self.bulk_max_repetitions < 1:
+            raise ConfigurationError('bulk_max_repetitions must be strictly positive')
+        self.request_window = int(instance.get('request_window', self.DEFAULT_REQUEST_WINDOW))
 
         self._auth_data = self.get_auth_data(instance)
         self._context_data = ContextData(*self.get_context_data(instance))
 
-        timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
-        retries = int(instance.get('retries', self.DEFAULT_RETRIES))
+        self._timeout = timeout = int(instance.get('timeout', self.DEFAULT_TIMEOUT))
+        self._retries = retries = int(instance.get('retries', self.DEFAULT_RETRIES))
+        self.discovery_timeout = int(instance.get('discovery_timeout', timeout))
+        self.discovery_retries = int(instance.get('discovery_retries', retries))
 
         ip_address = instance.get('ip_address')
         network_address = instance.get('network_address')
@@ -163,28 +187,39 @@ class InstanceConfig:
             scalar_oids.extend(tag_oids)
 
         refresh_interval_sec = instance.get('refresh_oids_cache_interval', refresh_oids_cache_interval)
-        self.oid_config = OIDConfig(refresh_interval_sec)
+        self.oid_config = OIDConfig(refresh_interval_sec, self.bulk_max_repetitions)
         self.oid_config.add_parsed_oids(scalar_oids=scalar_oids, next_oids=next_oids, bulk_oids=bulk_oids)
 
         if profile:
             if profile not in profiles:
                 raise ConfigurationError("Unknown profile '{}'".format(profile))
-            self.refresh_with_profile(profiles[profile])
+            compiled = profile_index.compile(profile) if profile_index is not None else None
+            self.refresh_with_profile(profiles[profile], compiled)
             self.add_profile_tag(profile)
 
         self._uptime_metric_added = False
 
+        # Index tags of the rows of each table metric, kept between check runs
+        self.index_tags_templates = {}  # type: Dict[ParsedTableMetric, Dict[Tuple[str, ...], Any]]
+
     def resolve_oid(self, oid):
         # type: (OID) -> OIDMatch
         return self._resolver.resolve_oid(oid)
 
-    def refresh_with_profile(self, profile):
-        # type: (Dict[str, Any]) -> None
-        metrics = profile['definition'].get('metrics', [])
-        scalar_oids, next_oids, bulk_oids, parsed_metrics = self.parse_metrics(metrics)
+    def resolve_oids(self, oids):
+        # type: (List[Tuple[int, ...]]) -> List[Optional[OIDMatch]]
+        return self._resolver.resolve_oids(oids)
 
-        metric_tags = profile['definition'].get('metric_tags', [])
-        tag_oids, parsed_metric_tags = self.parse_metric_tags(metric_tags)
+    def refresh_with_profile(self, profile, compiled=None):
+        # type: (Dict[str, Any], Optional[CompiledProfile]) -> None
+        """
+        Add the metrics and metric tags of a profile, `compiled` is the result of parsing them, if already available.
+        """
+        metrics = profile['definition'].get('metrics', [])
+        if compiled is None:
+            compiled = compile_profile(profile['definition'], self.logger())
+        scalar_oids, next_oids, bulk_oids, parsed_metrics = self.register_metrics(compiled.metrics)
+        tag_oids, parsed_metric_tags = self.register_metric_tags(compiled.metric_tags)
 
         device = profile['definition'].get('device', {})
         self.add_device_tags(device)
@@ -199,6 +234,33 @@ class InstanceConfig:
         self.parsed_metrics.extend(parsed_metrics)
         self.parsed_metric_tags.extend(parsed_metric_tags)
 
+    def share_snmp_engine(self, snmp_engine):
+        # type: (SnmpEngine) -> None
+        """
+        Send the requests to the device through an SNMP engine shared with other devices, and close the engine
+        of the device along with its socket.
+        """
+        if self.device is None:
+            raise RuntimeError('No device set')  # pragma: no cover
+
+        if self._snmp_engine is snmp_engine:
+            return
+
+        own_engine = self._snmp_engine
+        target = register_device_target(
+            self.device.ip,
+            self.device.port,
+            timeout=self._timeout,
+            retries=self._retries,
+            engine=snmp_engine,
+            auth_data=self._auth_data,
+            context_data=self._context_data,
+        )
+        self.device = Device(ip=self.device.ip, port=self.device.port, target=target)
+        self._snmp_engine = snmp_engine
+        if own_engine.transportDispatcher is not None:
+            own_engine.transportDispatcher.closeDispatcher()
+
     def add_profile_tag(self, profile_name):
         # type: (str) -> None
         self.tags.append('snmp_profile:{}'.format(profile_name))
@@ -302,12 +364,25 @@ class InstanceConfig:
         result = parse_metrics(metrics, resolver=self._resolver, logger=self.logger(), bulk_threshold=bulk_threshold)
         return result['oids'], result['next_oids'], result['bulk_oids'], result['parsed_metrics']
 
+    def register_metrics(self, compiled_metrics):
+        # type: (list) -> Tuple[List[OID], List[OID], List[OID], List[ParsedMetric]]
+        """Return data to be used for SNMP queries from compiled metrics."""
+        bulk_threshold = self.bulk_threshold if self._auth_data.mpModel else 0
+        result = register_metrics(compiled_metrics, resolver=self._resolver, bulk_threshold=bulk_threshold)
+        return result['oids'], result['next_oids'], result['bulk_oids'], result['parsed_metrics']
+
     def parse_metric_tags(self, metric_tags):
         # type: (list) -> Tuple[List[OID], List[SymbolTag]]
         """Parse configuration for global metric_tags."""
         result = parse_symbol_metric_tags(metric_tags, resolver=self._resolver)
         return result['oids'], result['parsed_symbol_tags']
 
+    def register_metric_tags(self, compiled_metric_tags):
+        # type: (list) -> Tuple[List[OID], List[SymbolTag]]
+        """Return data to be used for SNMP queries from compiled metric tags."""
+        result = register_symbol_metric_tags(compiled_metric_tags, resolver=self._resolver)
+        return result['oids'], result['parsed_symbol_tags']
+
     def add_uptime_metric(self):
         # type: () -> None
         if self._uptime_metric_added:
@@ -327,11 +402,20 @@ class OIDConfig(object):
     Manages scalar/next/bulk oids to be used for snmp PDU calls.
     """
 
-    def __init__(self, refresh_interval_sec):
-        # type: (bool) -> None
+    # Number of rows requested at a time when walking a table for the first time
+    INITIAL_MAX_REPETITIONS = 25
+
+    def __init__(self, refresh_interval_sec, bulk_max_repetitions):
+        # type: (bool, int) -> None
         self._refresh_interval_sec = refresh_interval_sec
         self._last_ts = 0  # type: float
 
+        # Row count of the last complete walk of each bulk oid, and the number of rows the device could fit in a
+        # response after `tooBig` errors. Bulk oids are the same objects for the lifetime of the config.
+        self._bulk_max_repetitions = bulk_max_repetitions
+        self._bulk_rows = {}  # type: Dict[OID, int]
+        self._bulk_max_repetitions_limits = {}  # type: Dict[OID, int]
+
         self._scalar_oids = []  # type: List[OID]
         self._next_oids = []  # type: List[OID]
         self._bulk_oids = []  # type: List[OID]
@@ -370,6 +454,29 @@ class OIDConfig(object):
             self._bulk_oids.extend(bulk_oids)
         self.reset()
 
+    def get_max_repetitions(self, oid):
+        # type: (OID) -> int
+        """
+        Return the number of rows to request at a time to walk a bulk oid, so that the rows seen on the previous
+        walk are fetched in a single request, within the limit of the device.
+        """
+        limit = self._bulk_max_repetitions_limits.get(oid, self._bulk_max_repetitions)
+        rows = self._bulk_rows.get(oid)
+        if rows is None:
+            return min(self.INITIAL_MAX_REPETITIONS, limit)
+        # Request one more row, to get the end of the table in the same response
+        return min(rows + 1, limit)
+
+    def update_bulk_walk(self, oid, walk, complete):
+        # type: (OID, BulkWalk, bool) -> None
+        """
+        Record the outcome of a walk of a bulk oid, the row count is only kept for complete walks.
+        """
+        if walk.too_big_errors:
+            self._bulk_max_repetitions_limits[oid] = walk.max_repetitions
+        if complete:
+            self._bulk_rows[oid] = walk.rows
+
     def has_oids(self):
         # type: () -> bool
         """
@@ -381,6 +488,13 @@ class OIDConfig(object):
         # type: () -> bool
         return self._refresh_interval_sec > 0
 
+    def needs_scalar_oids(self):
+        # type: () -> bool
+        """
+        Whether `update_scalar_oids` expects the OIDs of the next results.
+        """
+        return self._is_cache_enabled() and not self._use_scalar_oids_cache
+
     def update_scalar_oids(self, new_scalar_oids):
         # type: (List[OID]) -> None
         """
@@ -5,16 +5,133 @@
 import json
 import time
 import weakref  # noqa: F401
-from typing import TYPE_CHECKING
+from concurrent import futures
+from typing import TYPE_CHECKING, Dict, Optional, Set, Tuple  # noqa: F401
 
 from datadog_checks.base import ConfigurationError
 
-from .compat import write_persistent_cache
+from .compat import read_persistent_cache, write_persistent_cache
 from .config import InstanceConfig  # noqa: F401
 
 if TYPE_CHECKING:
     from .snmp import SnmpCheck  # noqa: F401
 
+# Minimum number of seconds between two writes of the progress of a discovery sweep
+DISCOVERY_STATE_SAVE_INTERVAL = 5
+
+
+def get_discovery_state_key(check_id):
+    # type: (str) -> str
+    return '{}_discovery_state'.format(check_id)
+
+
+class DiscoveryState(object):
+    """
+    Progress of the discovery sweeps of a network, persisted so that a restarted check resumes the current sweep.
+
+    Addresses which don't answer are skipped for an exponentially growing number of sweeps, up to `max_backoff`.
+    """
+
+    def __init__(self, network, max_backoff):
+        # type: (str, int) -> None
+        self.network = network
+        self.max_backoff = max_backoff
+        self.sweep = 0
+        self.last_sweep_end = None  # type: Optional[float]
+        self.probed = set()  # type: Set[str]
+        self.failures = {}  # type: Dict[str, Tuple[int, int]]
+        self._last_save = 0.0
+
+    def should_probe(self, host):
+        # type: (str) -> bool
+        _, retry_sweep = self.failures.get(host, (0, 0))
+        return self.sweep >= retry_sweep
+
+    def add_result(self, host, reachable):
+        # type: (str, bool) -> None
+        self.probed.add(host)
+        if reachable:
+            self.failures.pop(host, None)
+            return
+        failures = self.failures.get(host, (0, 0))[0] + 1
+        self.failures[host] = (failures, self.sweep + min(2 ** (failures - 1), self.max_backoff))
+
+    def end_sweep(self):
+        # type: () -> None
+        self.sweep += 1
+        self.last_sweep_end = time.time()
+        self.probed = set()
+
+    def save(self, check_id, force=False):
+        # type: (str, bool) -> None
+        now = time.time()
+        if not force and now - self._last_save < DISCOVERY_STATE_SAVE_INTERVAL:
+            return
+        self._last_save = now
+        state = {
+            'network': self.network,
+            'sweep': self.sweep,
+            'last_sweep_end': self.last_sweep_end,
+            'probed': sorted(self.probed),
+            'failures': self.failures,
+        }
+        write_persistent_cache(get_discovery_state_key(check_id), json.dumps(state))
+
+    def load(self, check_id):
+        # type: (str) -> None
+        cache = read_persistent_cache(get_discovery_state_key(check_id))
+        if not cache:
+            return
+        try:
+            state = json.loads(cache)
+            # Start over if the network changed
+            if state['network'] != self.network:
+                return
+            self.sweep = int(state['sweep'])
+            self.last_sweep_end = state['last_sweep_end']
+            self.probed = set(state['probed'])
+            self.failures = {host: (int(failures), int(retry)) for host, (failures, retry) in state['failures'].items()}
+        except (ValueError, TypeError, KeyError):
+            self.sweep = 0
+            self.last_sweep_end = None
+            self.probed = set()
+            self.failures = {}
+
+
+def probe_host(config, host, check_ref):
+    # type: (InstanceConfig, str, weakref.ref[SnmpCheck]) -> Optional[Tuple[str, bool, Optional[InstanceConfig]]]
+    """Fetch the sysObjectID of a host and return whether it answered, and its config if it matches a profile."""
+    check = check_ref()
+    if check is None or not check._running:
+        return None
+
+    probe_instance = config.instance
+    if 'discovery_timeout' in probe_instance or 'discovery_retries' in probe_instance:
+        probe_instance = dict(probe_instance, timeout=config.discovery_timeout, retries=config.discovery_retries)
+
+    host_config = check._build_autodiscovery_config(probe_instance, host)
+
+    try:
+        sys_object_oid = check.fetch_sysobject_oid(host_config)
+    except Exception as e:
+        check.log.debug("Error scanning host %s: %s", host, e)
+        return host, False, None
+
+    if probe_instance is not config.instance:
+        host_config = check._build_autodiscovery_config(config.instance, host)
+
+    try:
+        profile = check._profile_for_sysobject_oid(sys_object_oid)
+    except ConfigurationError:
+        if not host_config.oid_config.has_oids():
+            check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
+            return host, True, None
+    else:
+        host_config.refresh_with_profile(check.profiles[profile], check._profile_index.compile(profile))
+        host_config.add_profile_tag(profile)
+
+    return host, True, host_config
+
 
 def discover_instances(config, interval, check_ref):
     # type: (InstanceConfig, float, weakref.ref[SnmpCheck]) -> None
@@ -25,46 +142,90 @@ def discover_instances(config, interval, check_ref):
     the reference to the instance, the check is garbage collected properly and
     that function can stop.
     """
+    check = check_ref()
+    if check is None:
+        return
+    state = DiscoveryState(str(config.ip_network), config.discovery_max_backoff)
+    state.load(check.check_id)
+    del check
 
-    while True:
-        start_time = time.time()
-        for host in config.network_hosts():
-            check = check_ref()
-            if check is None or not check._running:
+    # Resume the previous sweep, or wait for the next one if it completed recently
+    if not state.probed and state.last_sweep_end is not None:
+        time_elapsed = time.time() - state.last_sweep_end
+        if interval - time_elapsed > 0:
+            time.sleep(interval - time_elapsed)
+
+    executor = futures.ThreadPoolExecutor(max_workers=config.discovery_workers)
+    try:
+        while True:
+            start_time = time.time()
+            if not _sweep(config, check_ref, state, executor, start_time):
                 return
 
-            host_config = check._build_autodiscovery_config(config.instance, host)
-
-            try:
-                sys_object_oid = check.fetch_sysobject_oid(host_config)
-            except Exception as e:
-                check.log.debug("Error scanning host %s: %s", host, e)
-                del check
-                continue
-
-            try:
-                profile = check._profile_for_sysobject_oid(sys_object_oid)
-            except ConfigurationError:
-                if not host_config.oid_config.has_oids():
-                    check.log.warning("Host %s didn't match a profile for sysObjectID %s", host, sys_object_oid)
-                    del check
-                    continue
-            else:
-                host_config.refresh_with_profile(check.profiles[profile])
-                host_config.add_profile_tag(profile)
+            time_elapsed = time.time() - start_time
+            if interval - time_elapsed > 0:
+                time.sleep(interval - time_elapsed)
+    finally:
+        executor.shutdown(wait=False)
 
-            config.discovered_instances[host] = host_config
 
-            write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
-            del check
+def _sweep(config, check_ref, state, executor, start_time):
+    # type: (InstanceConfig, weakref.ref[SnmpCheck], DiscoveryState, futures.ThreadPoolExecutor, float) -> bool
+    """Probe the hosts of the network with at most `discovery_workers` probes in flight, return whether to go on."""
+    pending = set()  # type: Set[futures.Future]
+    probed = skipped = 0
+    complete = True
 
-        check = check_ref()
-        if check is None:
-            return
-        # Write again at the end of the loop, in case some host have been removed since last
-        write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
-        del check
+    for host in config.network_hosts():
+        if host in state.probed:
+            continue
+        if not state.should_probe(host):
+            skipped += 1
+            continue
 
-        time_elapsed = time.time() - start_time
-        if interval - time_elapsed > 0:
-            time.sleep(interval - time_elapsed)
+        if len(pending) >= config.discovery_workers:
+            done, pending = futures.wait(pending, return_when=futures.FIRST_COMPLETED)
+            probed += len(done)
+            if not _add_results(config, check_ref, state, done):
+                complete = False
+                break
+
+        pending.add(executor.submit(probe_host, config, host, check_ref))
+
+    done, _ = futures.wait(pending)
+    probed += len(done)
+    _add_results(config, check_ref, state, done)
+
+    check = check_ref()
+    if check is None:
+        return False
+    if complete:
+        state.end_sweep()
+        check.submit_discovery_telemetry_metrics(time.time() - start_time, probed, skipped)
+    state.save(check.check_id, force=True)
+    # Write again at the end of the sweep, in case some host have been removed since last
+    write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+    return complete and check._running
+
+
+def _add_results(config, check_ref, state, done):
+    # type: (InstanceConfig, weakref.ref[SnmpCheck], DiscoveryState, Set[futures.Future]) -> bool
+    check = check_ref()
+    if check is None:
+        return False
+
+    discovered = False
+    for future in done:
+        result = future.result()
+        if result is None:
+            continue
+        host, reachable, host_config = result
+        state.add_result(host, reachable)
+        if host_config is not None:
+            config.discovered_instances[host] = host_config
+            discovered = True
+
+    if discovered:
+        write_persistent_cache(check.check_id, json.dumps(list(config.discovered_instances)))
+    state.save(check.check_id)
+    return check._running
@@ -53,12 +53,34 @@ class OID(object):
 
         self._parts = parts
         self._object_identity = object_identity  # type: ObjectIdentity
+        self._mib_symbol = None  # type: Optional[Tuple[str, str]]
+
+    @classmethod
+    def from_mib_symbol(cls, mib, symbol):
+        # type: (str, str) -> OID
+        """
+        Build an OID from a MIB symbol, to be resolved later using a MIB view controller.
+        """
+        oid = cls(ObjectIdentity(mib, symbol))
+        oid._mib_symbol = (mib, symbol)
+        return oid
 
     def resolve(self, mib_view_controller):
         # type: (MibViewController) -> None
         self._object_identity.resolveWithMib(mib_view_controller)
         self._parts = parse_as_oid_tuple(self._object_identity)
 
+    def copy(self):
+        # type: () -> OID
+        """
+        Return an OID which is resolved independently of this one.
+        """
+        if self._parts is not None:
+            return OID(self._parts)
+        if self._mib_symbol is None:
+            raise UnresolvedOID('Only OIDs built from a MIB symbol can be copied before being resolved')
+        return OID.from_mib_symbol(*self._mib_symbol)
+
     def as_tuple(self):
         # type: () -> Tuple[int, ...]
         if self._parts is None:
@@ -105,6 +127,16 @@ class Device:
         self._port = port
         self._target = target
 
+    @property
+    def ip(self):
+        # type: () -> str
+        return self._ip
+
+    @property
+    def port(self):
+        # type: () -> int
+        return self._port
+
     @property
     def target(self):
         # type: () -> str
@@ -118,3 +150,29 @@ class Device:
     def __repr__(self):
         # type: () -> str
         return '<Device ip={!r}, port={}>'.format(self._ip, self._port)
+
+
+class BulkWalk(object):
+    """
+    Progress of an SNMP GETBULK walk.
+
+    :param max_repetitions: The number of rows requested at a time, halved when the device answers `tooBig`.
+    """
+
+    def __init__(self, max_repetitions):
+        # type: (int) -> None
+        self.max_repetitions = max_repetitions
+        self.requests = 0
+        self.rows = 0
+        self.too_big_errors = 0
+
+    def back_off(self):
+        # type: () -> bool
+        """
+        Request fewer rows at a time after a `tooBig` error, and return whether the request can be sent again.
+        """
+        self.too_big_errors += 1
+        if self.max_repetitions <= 1:
+            return False
+        self.max_repetitions //= 2
+        return True
@@ -10,7 +10,6 @@ from typing import Dict, List, NamedTuple, TypedDict
 from datadog_checks.base import ConfigurationError
 
 from ..models import OID
-from ..pysnmp_types import ObjectIdentity
 from ..resolver import OIDResolver  # noqa: F401
 from .parsed_metrics import ParsedMatchMetricTag, ParsedMetricTag, ParsedSimpleMetricTag
 
@@ -24,19 +23,38 @@ def parse_symbol_metric_tags(metric_tags, resolver):
     """
     Parse the symbol based `metric_tags` section of a config file, and return OIDs to fetch and metric tags to submit.
     """
-    oids = []  # type: List[OID]
-    parsed_symbol_tags = []  # type: List[SymbolTag]
+    return register_symbol_metric_tags(compile_symbol_metric_tags(metric_tags), resolver)
+
+
+def compile_symbol_metric_tags(metric_tags):
+    # type: (List[MetricTag]) -> List[MetricTagParseResult]
+    """
+    Parse the symbol based `metric_tags` section of a config file, independently of any instance.
+    """
+    results = []
 
     for metric_tag in metric_tags:
         if 'symbol' not in metric_tag:
             raise ConfigurationError('A metric tag must specify a symbol: {}'.format(metric_tag))
 
-        result = _parse_symbol_metric_tag(metric_tag)
+        results.append(_parse_symbol_metric_tag(metric_tag))
+
+    return results
+
+
+def register_symbol_metric_tags(results, resolver):
+    # type: (List[MetricTagParseResult], OIDResolver) -> ParsedSymbolTagsResult
+    """
+    Register the OIDs of compiled metric tags in an instance resolver, and return OIDs to fetch and tags to submit.
+    """
+    oids = []  # type: List[OID]
+    parsed_symbol_tags = []  # type: List[SymbolTag]
 
+    for result in results:
         for name, oid in result.oids_to_resolve.items():
             resolver.register(oid, name)
 
-        oids.append(result.oid)
+        oids.append(result.oid.copy())
         parsed_symbol_tags.append(result.symbol_tag)
 
     return {'oids': oids, 'parsed_symbol_tags': parsed_symbol_tags}
@@ -70,7 +88,7 @@ def _parse_symbol_metric_tag(metric_tag):
     oids_to_resolve = {}
 
     if 'MIB' in metric_tag:
-        oid = OID(ObjectIdentity(metric_tag['MIB'], metric_tag['symbol']))
+        oid = OID.from_mib_symbol(metric_tag['MIB'], metric_tag['symbol'])
     elif 'OID' in metric_tag:
         oid = OID(metric_tag['OID'])
         oids_to_resolve[metric_tag['symbol']] = oid
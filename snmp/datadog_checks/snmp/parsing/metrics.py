@@ -13,7 +13,6 @@ import six
 from datadog_checks.base import ConfigurationError
 
 from ..models import OID
-from ..pysnmp_types import ObjectIdentity
 from ..resolver import OIDResolver  # noqa: F401
 from .metric_tags import MetricTag, parse_metric_tag
 from .metrics_types import (
@@ -39,16 +38,33 @@ def parse_metrics(metrics, resolver, logger, bulk_threshold=0):
     """
     Parse the `metrics` section of a config file, and return OIDs to fetch and metrics to submit.
     """
+    return register_metrics(compile_metrics(metrics, logger), resolver, bulk_threshold=bulk_threshold)
+
+
+def compile_metrics(metrics, logger):
+    # type: (List[Metric], Optional[Logger]) -> List[MetricParseResult]
+    """
+    Parse the `metrics` section of a config file, independently of any instance.
+
+    The result is not modified by `register_metrics`, so it can be shared by all the instances using a profile.
+    """
+    return [_parse_metric(metric, logger) for metric in metrics]
+
+
+def register_metrics(results, resolver, bulk_threshold=0):
+    # type: (List[MetricParseResult], OIDResolver, int) -> ParseMetricsResult
+    """
+    Register the OIDs of compiled metrics in an instance resolver, and return OIDs to fetch and metrics to submit.
+    """
     oids = []
     next_oids = []
     bulk_oids = []
     parsed_metrics = []  # type: List[ParsedMetric]
 
-    for metric in metrics:
-        result = _parse_metric(metric, logger)
-
+    for result in results:
+        # PySNMP resolves OIDs in-place, each instance gets its own copy.
         for oid in result.oids_to_fetch:
-            oids.append(oid)
+            oids.append(oid.copy())
 
         for name, oid in result.oids_to_resolve.items():
             resolver.register(oid, name)
@@ -59,13 +75,13 @@ def parse_metrics(metrics, resolver, logger, bulk_threshold=0):
         for batch in result.table_batches.values():
             should_query_in_bulk = bulk_threshold and len(batch.oids) > bulk_threshold
             if should_query_in_bulk:
-                bulk_oids.append(batch.table_oid)
+                bulk_oids.append(batch.table_oid.copy())
             else:
                 # NOTE: we should issue GETNEXT commands for these OIDs, because GET commands on table column OIDs
                 # never succeed.
                 # This is because data for a given entry in the table is available at the column OIDs **suffixed
                 # with the table entry index**, i.e. `<COLUMN_OID>.<ENTRY_INDEX>`. (There's nothing at `<COLUMN_OID>`.)
-                next_oids.extend(batch.oids)
+                next_oids.extend(oid.copy() for oid in batch.oids)
 
         parsed_metrics.extend(result.parsed_metrics)
 
@@ -253,7 +269,7 @@ def _parse_symbol(mib, symbol):
     ```
     """
     if isinstance(symbol, str):
-        oid = OID(ObjectIdentity(mib, symbol))
+        oid = OID.from_mib_symbol(mib, symbol)
         return ParsedSymbol(name=symbol, oid=oid, extract_value_pattern=None, oids_to_resolve={})
 
     oid = OID(symbol['OID'])
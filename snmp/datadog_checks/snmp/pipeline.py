@@ -0,0 +1,272 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+from collections import defaultdict, deque
+from typing import Any, Callable, DefaultDict, Deque, List, Optional  # noqa: F401
+
+from pyasn1.type.univ import Null
+from pysnmp import hlapi  # noqa: F401
+from pysnmp.entity.rfc3413 import cmdgen
+from pysnmp.hlapi.asyncore.cmdgen import vbProcessor
+from pysnmp.proto import errind
+from pysnmp.proto.rfc1905 import endOfMibView
+
+from datadog_checks.base.errors import CheckException
+
+from .commands import handle_too_big
+from .config import InstanceConfig  # noqa: F401
+from .models import BulkWalk  # noqa: F401
+from .pysnmp_types import SnmpEngine  # noqa: F401
+
+# Called with the var binds returned for a request and the exception that stopped it, if any
+RequestCallback = Callable[[List[Any], Optional[Exception]], None]
+
+
+class RequestPipeline(object):
+    """
+    Send the SNMP requests of one or more devices through a single SNMP engine, so a single transport dispatcher
+    and socket, with up to `window` requests in flight per device. Requests above the window are queued and sent
+    as soon as a request to the same device completes.
+
+    PySNMP matches each response to its pending request by the request-id of the PDU, and hands the request back
+    to the pipeline along with the response. Walks send their next request as soon as a response comes in and keep
+    their slot.
+    """
+
+    def __init__(self, snmp_engine, window):
+        # type: (SnmpEngine, int) -> None
+        self._snmp_engine = snmp_engine
+        self._window = max(window, 1)
+        self._active = 0
+        self._queued = defaultdict(deque)  # type: DefaultDict[str, Deque[_Request]]
+        self._in_flight = defaultdict(int)  # type: DefaultDict[str, int]
+        self._get_generator = cmdgen.GetCommandGenerator()
+        self._next_generator = cmdgen.NextCommandGenerator()
+        self._bulk_generator = cmdgen.BulkCommandGenerator()
+
+    def get(self, config, oids, lookup_mib, callback):
+        # type: (InstanceConfig, list, bool, RequestCallback) -> None
+        """Call SNMP GET on a list of oids."""
+        self._submit(_GetRequest(config, callback, oids, lookup_mib))
+
+    def getnext(self, config, oids, lookup_mib, ignore_nonincreasing_oid, callback):
+        # type: (InstanceConfig, list, bool, bool, RequestCallback) -> None
+        """Walk a list of oids with SNMP GETNEXT, as long as the results are under the same prefix."""
+        self._submit(_NextRequest(config, callback, oids, lookup_mib, ignore_nonincreasing_oid))
+
+    def bulk(self, config, oid, non_repeaters, walk, lookup_mib, ignore_nonincreasing_oid, callback):
+        # type: (InstanceConfig, hlapi.ObjectType, int, BulkWalk, bool, bool, RequestCallback) -> None
+        """Walk an oid with SNMP GETBULK, requesting `walk.max_repetitions` rows at a time."""
+        self._submit(_BulkRequest(config, callback, oid, non_repeaters, walk, lookup_mib, ignore_nonincreasing_oid))
+
+    def run(self):
+        # type: () -> None
+        """Run the dispatcher until all the requests, including the ones submitted by callbacks, are completed."""
+        if self._active:
+            self._snmp_engine.transportDispatcher.runDispatcher()
+
+    def _submit(self, request):
+        # type: (_Request) -> None
+        if request.config.device is None:
+            raise RuntimeError('No device set')  # pragma: no cover
+
+        key = request.config.device.target
+        if self._in_flight[key] >= self._window:
+            self._queued[key].append(request)
+            return
+        self._in_flight[key] += 1
+        self._active += 1
+        self._send(request)
+
+    def _send(self, request):
+        # type: (_Request) -> None
+        try:
+            request.send(self)
+        except Exception as e:
+            self._complete(request, e)
+
+    def _on_response(self, snmp_engine, error_indication, error_status, var_binds, request):
+        # type: (SnmpEngine, Any, Any, Any, _Request) -> None
+        try:
+            done = request.on_response(snmp_engine, error_indication, error_status, var_binds)
+        except Exception as e:
+            self._complete(request, e)
+            return
+
+        if done:
+            self._complete(request, None)
+        else:
+            self._send(request)
+
+    def _complete(self, request, error):
+        # type: (_Request, Optional[Exception]) -> None
+        key = request.config.device.target
+        self._in_flight[key] -= 1
+        self._active -= 1
+        if self._queued[key]:
+            self._in_flight[key] += 1
+            self._active += 1
+            self._send(self._queued[key].popleft())
+
+        request.complete(error)
+
+    def _get_callback(
+        self, snmpEngine, sendRequestHandle, errorIndication, errorStatus, errorIndex, varBinds, cbCtx
+    ):  # type: ignore
+        self._on_response(snmpEngine, errorIndication, errorStatus, varBinds, cbCtx)
+
+
+class _Request(object):
+    def __init__(self, config, callback, lookup_mib):
+        # type: (InstanceConfig, RequestCallback, bool) -> None
+        self.config = config
+        self.binds = []  # type: List[Any]
+        self._callback = callback
+        self._lookup_mib = lookup_mib
+
+    def send(self, pipeline):
+        # type: (RequestPipeline) -> None
+        """Send the next request, the pipeline gets it back as the context of the response."""
+        raise NotImplementedError
+
+    def on_response(self, snmp_engine, error_indication, error_status, var_binds):
+        # type: (SnmpEngine, Any, Any, Any) -> bool
+        """Handle a response and return whether the request is done."""
+        raise NotImplementedError
+
+    def check_error(self, error_indication):
+        # type: (Any) -> None
+        if error_indication:
+            raise CheckException('{} for device {}'.format(error_indication, self.config.device))
+
+    def complete(self, error):
+        # type: (Optional[Exception]) -> None
+        self._callback(self.binds, error)
+
+
+class _GetRequest(_Request):
+    def __init__(self, config, callback, oids, lookup_mib):
+        # type: (InstanceConfig, RequestCallback, list, bool) -> None
+        super(_GetRequest, self).__init__(config, callback, lookup_mib)
+        self._oids = oids
+
+    def send(self, pipeline):
+        # type: (RequestPipeline) -> None
+        config = self.config
+        pipeline._get_generator.sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            vbProcessor.makeVarBinds(config._snmp_engine, self._oids),
+            pipeline._get_callback,
+            self,
+        )
+
+    def on_response(self, snmp_engine, error_indication, error_status, var_binds):
+        # type: (SnmpEngine, Any, Any, Any) -> bool
+        var_binds = vbProcessor.unmakeVarBinds(snmp_engine, var_binds, self._lookup_mib)
+        self.check_error(error_indication)
+        self.binds = var_binds
+        return True
+
+
+class _NextRequest(_Request):
+    def __init__(self, config, callback, oids, lookup_mib, ignore_nonincreasing_oid):
+        # type: (InstanceConfig, RequestCallback, list, bool, bool) -> None
+        super(_NextRequest, self).__init__(config, callback, lookup_mib)
+        self._ignore_nonincreasing_oid = ignore_nonincreasing_oid
+        self._initial_vars = None  # type: Optional[List[Any]]
+        self._var_binds = oids
+
+    def send(self, pipeline):
+        # type: (RequestPipeline) -> None
+        config = self.config
+        if self._initial_vars is None:
+            self._initial_vars = [x[0] for x in vbProcessor.makeVarBinds(config._snmp_engine, self._var_binds)]
+        pipeline._next_generator.sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            self._var_binds,
+            pipeline._get_callback,
+            self,
+        )
+
+    def on_response(self, snmp_engine, error_indication, error_status, var_bind_table):
+        # type: (SnmpEngine, Any, Any, Any) -> bool
+        var_bind_table = [vbProcessor.unmakeVarBinds(snmp_engine, row, self._lookup_mib) for row in var_bind_table]
+        if self._ignore_nonincreasing_oid and isinstance(error_indication, errind.OidNotIncreasing):
+            error_indication = None
+        self.check_error(error_indication)
+
+        var_binds = []
+        initial_vars = []
+        for col, var_bind in enumerate(var_bind_table[0] if var_bind_table else []):
+            name, val = var_bind
+            if not isinstance(val, Null) and self._initial_vars[col].isPrefixOf(name):
+                var_binds.append(var_bind)
+                initial_vars.append(self._initial_vars[col])
+        self.binds.extend(var_binds)
+        self._var_binds = var_binds
+        self._initial_vars = initial_vars
+        return not var_binds
+
+    def complete(self, error):
+        # type: (Optional[Exception]) -> None
+        # A failed walk doesn't return any partial result
+        if error is not None:
+            self.binds = []
+        super(_NextRequest, self).complete(error)
+
+
+class _BulkRequest(_Request):
+    def __init__(
+        self, config, callback, oid, non_repeaters, walk, lookup_mib, ignore_nonincreasing_oid
+    ):  # type: (InstanceConfig, RequestCallback, hlapi.ObjectType, int, BulkWalk, bool, bool) -> None
+        super(_BulkRequest, self).__init__(config, callback, lookup_mib)
+        self._non_repeaters = non_repeaters
+        self._walk = walk
+        self._ignore_nonincreasing_oid = ignore_nonincreasing_oid
+        self._var_binds = [oid]
+        self._initial_var = None  # type: Any
+
+    def send(self, pipeline):
+        # type: (RequestPipeline) -> None
+        config = self.config
+        if self._initial_var is None:
+            self._initial_var = vbProcessor.makeVarBinds(config._snmp_engine, self._var_binds)[0][0]
+        self._walk.requests += 1
+        pipeline._bulk_generator.sendVarBinds(
+            config._snmp_engine,
+            config.device.target,
+            config._context_data.contextEngineId,
+            config._context_data.contextName,
+            self._non_repeaters,
+            self._walk.max_repetitions,
+            vbProcessor.makeVarBinds(config._snmp_engine, self._var_binds),
+            pipeline._get_callback,
+            self,
+        )
+
+    def on_response(self, snmp_engine, error_indication, error_status, var_bind_table):
+        # type: (SnmpEngine, Any, Any, Any) -> bool
+        var_bind_table = [vbProcessor.unmakeVarBinds(snmp_engine, row, self._lookup_mib) for row in var_bind_table]
+        if self._ignore_nonincreasing_oid and isinstance(error_indication, errind.OidNotIncreasing):
+            error_indication = None
+        self.check_error(error_indication)
+        if handle_too_big(error_status, self._walk, self.config):
+            # Send the same request again with fewer repetitions
+            return False
+
+        if not var_bind_table:
+            return True
+        for var_binds in var_bind_table:
+            name, value = var_binds[0]
+            if endOfMibView.isSameTypeWith(value) or not self._initial_var.isPrefixOf(name):
+                return True
+            self.binds.append(var_binds[0])
+            self._walk.rows += 1
+        self._var_binds = var_binds
+        return False
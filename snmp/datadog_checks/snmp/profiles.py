@@ -0,0 +1,146 @@
+# (C) Datadog, Inc. 2023-present
+# All rights reserved
+# Licensed under Simplified BSD License (see LICENSE)
+"""
+Index of the SNMP profiles, compiled once and shared by the instances of a process.
+"""
+import fnmatch
+import logging
+import threading
+from typing import Any, Dict, List, NamedTuple, Optional  # noqa: F401
+
+from datadog_checks.base import ConfigurationError
+
+from .parsing.metric_tags import MetricTagParseResult, compile_symbol_metric_tags  # noqa: F401
+from .parsing.metrics import MetricParseResult, compile_metrics  # noqa: F401
+from .utils import get_default_profiles, oid_pattern_specificity
+
+logger = logging.getLogger(__name__)
+
+CompiledProfile = NamedTuple(
+    'CompiledProfile', [('metrics', List[MetricParseResult]), ('metric_tags', List[MetricTagParseResult])]
+)
+
+
+def compile_profile(definition, logger=None):
+    # type: (Dict[str, Any], Optional[logging.Logger]) -> CompiledProfile
+    """
+    Parse the metrics and metric tags of a profile definition.
+    """
+    return CompiledProfile(
+        metrics=compile_metrics(definition.get('metrics', []), logger),
+        metric_tags=compile_symbol_metric_tags(definition.get('metric_tags', [])),
+    )
+
+
+class SysObjectIDTrie(object):
+    """
+    Store sysObjectID patterns by their leading literal parts, so that only the patterns sharing a prefix with a
+    sysObjectID are matched against it.
+    """
+
+    def __init__(self):
+        # type: () -> None
+        self._patterns = []  # type: List[str]
+        self._children = {}  # type: Dict[str, SysObjectIDTrie]
+
+    def add(self, pattern):
+        # type: (str) -> None
+        node = self
+        for part in pattern.split('.'):
+            if any(char in part for char in '*?['):
+                break
+            node = node._children.setdefault(part, SysObjectIDTrie())
+        node._patterns.append(pattern)
+
+    def match(self, sys_object_oid):
+        # type: (str) -> List[str]
+        """Return the patterns matching a sysObjectID."""
+        node = self
+        candidates = list(node._patterns)
+        for part in sys_object_oid.split('.'):
+            node = node._children.get(part)
+            if node is None:
+                break
+            candidates.extend(node._patterns)
+        return [pattern for pattern in candidates if fnmatch.fnmatch(sys_object_oid, pattern)]
+
+
+class ProfileIndex(object):
+    """
+    The profiles available to a check, along with their sysObjectID patterns and their compiled metrics.
+
+    The index is read-only once built, except for the compiled profiles cache, so it can be shared by instances.
+    """
+
+    def __init__(self, profiles):
+        # type: (Dict[str, Any]) -> None
+        self.profiles = profiles
+        self.profiles_by_oid = self._get_profiles_mapping(profiles)
+        self._sysobjectid_trie = SysObjectIDTrie()
+        for pattern in self.profiles_by_oid:
+            self._sysobjectid_trie.add(pattern)
+        self._compiled = {}  # type: Dict[str, CompiledProfile]
+
+    @staticmethod
+    def _get_profiles_mapping(profiles):
+        # type: (Dict[str, Any]) -> Dict[str, str]
+        """
+        Get the mapping from sysObjectID to profile.
+        """
+        profiles_by_oid = {}  # type: Dict[str, str]
+        for name, profile in profiles.items():
+            sys_object_oids = profile['definition'].get('sysobjectid')
+            if sys_object_oids is None:
+                continue
+            if isinstance(sys_object_oids, str):
+                sys_object_oids = [sys_object_oids]
+            for sys_object_oid in sys_object_oids:
+                profile_match = profiles_by_oid.get(sys_object_oid)
+                if profile_match:
+                    raise ConfigurationError(
+                        "Profile {} has the same sysObjectID ({}) as {}".format(name, sys_object_oid, profile_match)
+                    )
+                else:
+                    profiles_by_oid[sys_object_oid] = name
+        return profiles_by_oid
+
+    def profile_for_sysobject_oid(self, sys_object_oid):
+        # type: (str) -> str
+        """
+        Return the most specific profile that matches the given sysObjectID.
+        """
+        matched_oids = self._sysobjectid_trie.match(sys_object_oid)
+
+        if not matched_oids:
+            raise ConfigurationError('No profile matching sysObjectID {}'.format(sys_object_oid))
+
+        oid = max(matched_oids, key=lambda oid: oid_pattern_specificity(oid))
+
+        return self.profiles_by_oid[oid]
+
+    def compile(self, name):
+        # type: (str) -> CompiledProfile
+        """
+        Return the compiled metrics and metric tags of a profile, parsing them on first use.
+        """
+        compiled = self._compiled.get(name)
+        if compiled is None:
+            # Concurrent callers may both compile the profile, the results are equivalent.
+            compiled = self._compiled.setdefault(name, compile_profile(self.profiles[name]['definition'], logger))
+        return compiled
+
+
+_default_profile_index = None  # type: Optional[ProfileIndex]
+_default_profile_index_lock = threading.Lock()
+
+
+def get_default_profile_index():
+    # type: () -> ProfileIndex
+    """Return the index of the profiles installed on the system, shared by all the instances of the process."""
+    global _default_profile_index
+
+    with _default_profile_index_lock:
+        if _default_profile_index is None:
+            _default_profile_index = ProfileIndex(get_default_profiles())
+        return _default_profile_index
@@ -3,7 +3,7 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 from collections import defaultdict
-from typing import DefaultDict, Dict, List, Optional, Tuple  # noqa: F401
+from typing import DefaultDict, Dict, List, Optional, Sequence, Tuple  # noqa: F401
 
 from .models import OID  # noqa: F401
 from .pysnmp_types import MibViewController  # noqa: F401
@@ -39,6 +39,15 @@ class OIDTrie(object):
 
     def match(self, parts):
         # type: (Tuple[int, ...]) -> Tuple[Tuple[int, ...], Optional[str]]
+        matched, name, _ = self.match_column(parts)
+        return matched, name
+
+    def match_column(self, parts):
+        # type: (Tuple[int, ...]) -> Tuple[Tuple[int, ...], Optional[str], bool]
+        """
+        Same as `match`, and also return whether the matched prefix is a leaf of the trie, in which case all the OIDs
+        under this prefix match the same name.
+        """
         node = self._root
         matched = []
         name = None
@@ -52,7 +61,7 @@ class OIDTrie(object):
             if node.name is not None:
                 name = node.name
 
-        return tuple(matched), name
+        return tuple(matched), name, not node.children
 
 
 class OIDResolver(object):
@@ -166,3 +175,41 @@ class OIDResolver(object):
 
         tag_index = self._resolve_tag_index(tail, name=name)
         return OIDMatch(name=name, indexes=tag_index)
+
+    def resolve_oids(self, oids):
+        # type: (Sequence[Tuple[int, ...]]) -> List[Optional[OIDMatch]]
+        """Resolve OIDs given as tuples, like `resolve_oid` does for registered OIDs.
+
+        The binds of a walk come column by column, so the trie is only walked again when an OID leaves the column
+        matched for the previous one, and the indexes of a row are resolved once for all the columns.
+
+        Returns
+        -------
+        A list with the match of each OID, or None for the OIDs which must be resolved from MIBs with `resolve_oid`.
+        """
+        matches = []  # type: List[Optional[OIDMatch]]
+        indexes_cache = {}  # type: Dict[Tuple[Optional[str], Tuple[int, ...]], Tuple[str, ...]]
+        column = None  # type: Optional[Tuple[int, ...]]
+        column_length = 0
+        name = None  # type: Optional[str]
+
+        for parts in oids:
+            if column is None or parts[:column_length] != column:
+                prefix, name, is_leaf = self._resolver.match_column(parts)
+                if name is None:
+                    column = None
+                    matches.append(None)
+                    continue
+                # Only a leaf prefix gives the same match to all the OIDs under it.
+                column = prefix if is_leaf else None
+                column_length = len(prefix)
+
+            tail = parts[column_length:]
+            # Indexes without mappings don't depend on the column.
+            key = (name if name in self._index_resolvers else None, tail)
+            indexes = indexes_cache.get(key)
+            if indexes is None:
+                indexes = indexes_cache[key] = self._resolve_tag_index(tail, name=name)
+            matches.append(OIDMatch(name=name, indexes=indexes))
+
+        return matches
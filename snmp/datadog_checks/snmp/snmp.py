@@ -2,7 +2,6 @@
 # All rights reserved
 # Licensed under Simplified BSD License (see LICENSE)
 import copy
-import fnmatch
 import functools
 import ipaddress
 import json
@@ -12,7 +11,7 @@ import time
 import weakref
 from collections import defaultdict
 from concurrent import futures
-from typing import Any, DefaultDict, Dict, List, Optional, Pattern, Tuple  # noqa: F401
+from typing import Any, Callable, DefaultDict, Dict, List, Optional, Pattern, Tuple  # noqa: F401
 
 from six import iteritems
 
@@ -27,15 +26,17 @@ from .discovery import discover_instances
 from .exceptions import PySnmpError
 from .metrics import as_metric_with_forced_type, as_metric_with_inferred_type, try_varbind_value_to_float
 from .mibs import MIBLoader
-from .models import OID
+from .models import OID, BulkWalk
 from .parsing import ColumnTag, IndexTag, ParsedMetric, ParsedTableMetric, SymbolTag  # noqa: F401
+from .pipeline import RequestPipeline
+from .profiles import ProfileIndex, get_default_profile_index
 from .pysnmp_types import ObjectIdentity, ObjectType, noSuchInstance, noSuchObject
 from .utils import (
     OIDPrinter,
     batches,
     get_default_profiles,
     get_profile_definition,
-    oid_pattern_specificity,
+    parse_as_oid_tuple,
     recursively_expand_base_profiles,
     transform_index,
 )
@@ -51,6 +52,62 @@ def reply_invalid(oid):
     return noSuchInstance.isSameTypeWith(oid) or noSuchObject.isSameTypeWith(oid)
 
 
+class IndexTagsTemplate(object):
+    """
+    The tags of a row of a table metric.
+
+    Index tags only depend on the row index, and the indexes of the column tags are computed once. The tags of a
+    column are reused as long as its value doesn't change.
+    """
+
+    __slots__ = ('index_tags', 'columns', 'column_values', 'column_tags')
+
+    def __init__(self, index, index_tags, column_tags, log):
+        # type: (Tuple[str, ...], List[IndexTag], List[ColumnTag], Any) -> None
+        self.index_tags = []  # type: List[str]
+        for index_tag in index_tags:
+            raw_index_value = index_tag.index
+            try:
+                value = index[raw_index_value - 1]
+            except IndexError:
+                log.warning('Not enough indexes, skipping index %s', raw_index_value)
+                continue
+            self.index_tags.extend(index_tag.parsed_metric_tag.matched_tags(value))
+
+        self.columns = []  # type: List[Tuple[ColumnTag, Tuple[str, ...]]]
+        for column_tag in column_tags:
+            new_index = transform_index(index, column_tag.index_slices) if column_tag.index_slices else index
+            if new_index is not None:
+                self.columns.append((column_tag, new_index))
+
+        self.column_values = [None] * len(self.columns)  # type: List[Any]
+        self.column_tags = [[] for _ in self.columns]  # type: List[List[str]]
+
+    def get_tags(self, results, log):
+        # type: (Dict[str, dict], Any) -> List[str]
+        tags = list(self.index_tags)
+
+        for position, (column_tag, new_index) in enumerate(self.columns):
+            try:
+                column_value = results[column_tag.column][new_index]
+            except KeyError:
+                log.debug(
+                    'Column `%s not present in the table, skipping this tag. index=%s', column_tag.column, new_index
+                )
+                continue
+            previous_value = self.column_values[position]
+            if type(previous_value) is not type(column_value) or previous_value != column_value:
+                if reply_invalid(column_value):
+                    log.warning("Can't deduct tag from column %s", column_tag.column)
+                    continue
+                value = column_value.prettyPrint()
+                self.column_tags[position] = list(column_tag.parsed_metric_tag.matched_tags(value))
+                self.column_values[position] = column_value
+            tags.extend(self.column_tags[position])
+
+        return tags
+
+
 class SnmpCheck(AgentCheck):
 
     SC_STATUS = 'snmp.can_check'
@@ -58,7 +115,6 @@ class SnmpCheck(AgentCheck):
     _thread = None
     _executor = None
     _NON_REPEATERS = 0
-    _MAX_REPETITIONS = 25
     _thread_factory = threading.Thread  # Store as an attribute for easier mocking.
 
     def __init__(self, *args, **kwargs):
@@ -78,8 +134,9 @@ class SnmpCheck(AgentCheck):
             self.init_config.get('refresh_oids_cache_interval', InstanceConfig.DEFAULT_REFRESH_OIDS_CACHE_INTERVAL)
         )
 
-        self.profiles = self._load_profiles()
-        self.profiles_by_oid = self._get_profiles_mapping()
+        self._profile_index = self._load_profile_index()
+        self.profiles = self._profile_index.profiles
+        self.profiles_by_oid = self._profile_index.profiles_by_oid
 
         self._config = self._build_config(self.instance)
 
@@ -102,6 +159,15 @@ class SnmpCheck(AgentCheck):
         # Include check ID to avoid conflicts between concurrent instances of the check.
         return '{}-{}'.format(self.check_id, self._last_fetch_number)
 
+    def _load_profile_index(self):
+        # type: () -> ProfileIndex
+        """
+        Return the index of the configured SNMP profiles, the default profiles index is shared by all instances.
+        """
+        if self.init_config.get('profiles') is None:
+            return get_default_profile_index()
+        return ProfileIndex(self._load_profiles())
+
     def _load_profiles(self):
         # type: () -> Dict[str, Dict[str, Any]]
         """
@@ -130,28 +196,6 @@ class SnmpCheck(AgentCheck):
 
         return profiles
 
-    def _get_profiles_mapping(self):
-        # type: () -> Dict[str, str]
-        """
-        Get the mapping from sysObjectID to profile.
-        """
-        profiles_by_oid = {}  # type: Dict[str, str]
-        for name, profile in self.profiles.items():
-            sys_object_oids = profile['definition'].get('sysobjectid')
-            if sys_object_oids is None:
-                continue
-            if isinstance(sys_object_oids, str):
-                sys_object_oids = [sys_object_oids]
-            for sys_object_oid in sys_object_oids:
-                profile_match = profiles_by_oid.get(sys_object_oid)
-                if profile_match:
-                    raise ConfigurationError(
-                        "Profile {} has the same sysObjectID ({}) as {}".format(name, sys_object_oid, profile_match)
-                    )
-                else:
-                    profiles_by_oid[sys_object_oid] = name
-        return profiles_by_oid
-
     def _build_config(self, instance):
         # type: (dict) -> InstanceConfig
         loader = MIBLoader.shared_instance() if self.optimize_mib_memory_usage else MIBLoader()
@@ -165,6 +209,7 @@ class SnmpCheck(AgentCheck):
             profiles_by_oid=self.profiles_by_oid,
             loader=loader,
             logger=self.log,
+            profile_index=self._profile_index,
         )
 
     def _build_autodiscovery_config(self, source_instance, ip_address):
@@ -206,7 +251,12 @@ class SnmpCheck(AgentCheck):
         dict[oid/metric_name][row index] = value
         In case of scalar objects, the row index is just 0
         """
-        results = defaultdict(dict)  # type: DefaultDict[str, Dict[Tuple[str, ...], Any]]
+        if config.request_window > 1:
+            pipeline = RequestPipeline(config._snmp_engine, config.request_window)
+            get_results = self.schedule_fetch_results(pipeline, config)
+            pipeline.run()
+            return get_results()
+
         enforce_constraints = config.enforce_constraints
         fetch_id = self._get_next_fetch_id()
 
@@ -217,7 +267,10 @@ class SnmpCheck(AgentCheck):
             enforce_constraints=enforce_constraints,
             fetch_id=fetch_id,
         )
+        walks = []
         for oid in config.oid_config.bulk_oids:
+            walk = BulkWalk(config.oid_config.get_max_repetitions(oid))
+            walks.append(walk)
             try:
                 oid_object_type = oid.as_object_type()
                 self.log.debug(
@@ -229,27 +282,157 @@ class SnmpCheck(AgentCheck):
                     config,
                     oid_object_type,
                     self._NON_REPEATERS,
-                    self._MAX_REPETITIONS,
+                    walk,
                     enforce_constraints,
                     self.ignore_nonincreasing_oid,
                 )
                 all_binds.extend(binds)
             except (PySnmpError, CheckException) as e:
+                config.oid_config.update_bulk_walk(oid, walk, complete=False)
                 message = '[{}] Failed to collect some metrics: {}'.format(fetch_id, e)
                 if not error:
                     error = message
                 self.warning(message)
+            else:
+                config.oid_config.update_bulk_walk(oid, walk, complete=True)
+
+        self.submit_bulk_telemetry_metrics(config, walks)
+        results, scalar_oids = self._build_results(config, all_binds, fetch_id)
+        return results, scalar_oids, error
+
+    def schedule_fetch_results(self, pipeline, config):
+        # type: (RequestPipeline, InstanceConfig) -> Callable[[], Tuple[Dict[str, Any], List[OID], Optional[str]]]
+        """
+        Schedule the requests of `fetch_results` on a pipeline, and return a function returning the same results
+        once the pipeline ran. The scalar OIDs missing from a GET response are walked with GETNEXT as soon as the
+        response comes in.
+        """
+        enforce_constraints = config.enforce_constraints
+        fetch_id = self._get_next_fetch_id()
+        # The binds of every request, in the order `fetch_results` sends them
+        get_binds = []  # type: List[List[Any]]
+        next_binds = []  # type: List[List[Any]]
+        bulk_binds = []  # type: List[List[Any]]
+        walks = []  # type: List[BulkWalk]
+        errors = []  # type: List[str]
+        unexpected_errors = []  # type: List[Exception]
+
+        def on_error(error):
+            # type: (Exception) -> None
+            if not isinstance(error, (PySnmpError, CheckException)):
+                unexpected_errors.append(error)
+                return
+            message = '[{}] Failed to collect some metrics: {}'.format(fetch_id, error)
+            errors.append(message)
+            self.warning(message)
+
+        def on_get(request_binds, var_binds, error):
+            # type: (List[Any], List[Any], Optional[Exception]) -> None
+            if error is not None:
+                on_error(error)
+                return
+            self.log.debug('[%s] Returned vars: %s', fetch_id, OIDPrinter(var_binds, with_values=True))
+
+            missing_results = []
+            for var in var_binds:
+                result_oid, value = var
+                if reply_invalid(value):
+                    missing_results.append(ObjectType(ObjectIdentity(result_oid.asTuple())))
+                else:
+                    request_binds.append(var)
+
+            if missing_results:
+                # If we didn't catch the metric using snmpget, try snmpnext
+                getnext(missing_results)
+
+        def on_getnext(request_binds, var_binds, error):
+            # type: (List[Any], List[Any], Optional[Exception]) -> None
+            if error is not None:
+                on_error(error)
+                return
+            self.log.debug('[%s] Returned vars: %s', fetch_id, OIDPrinter(var_binds, with_values=True))
+            request_binds.extend(var_binds)
+
+        def on_bulk(request_binds, oid, walk, var_binds, error):
+            # type: (List[Any], OID, BulkWalk, List[Any], Optional[Exception]) -> None
+            request_binds.extend(var_binds)
+            config.oid_config.update_bulk_walk(oid, walk, complete=error is None)
+            if error is not None:
+                on_error(error)
+
+        def getnext(oids):
+            # type: (List[Any]) -> None
+            for oids_batch in batches(oids, size=self.oid_batch_size):
+                self.log.debug(
+                    '[%s] Running SNMP command getNext on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
+                )
+                next_binds.append([])
+                pipeline.getnext(
+                    config,
+                    oids_batch,
+                    lookup_mib=enforce_constraints,
+                    ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+                    callback=functools.partial(on_getnext, next_binds[-1]),
+                )
+
+        scalar_oids = [oid.as_object_type() for oid in config.oid_config.scalar_oids]
+        for oids_batch in batches(scalar_oids, size=self.oid_batch_size):
+            self.log.debug(
+                '[%s] Running SNMP command get on OIDS: %s', fetch_id, OIDPrinter(oids_batch, with_values=False)
+            )
+            get_binds.append([])
+            pipeline.get(
+                config, oids_batch, lookup_mib=enforce_constraints, callback=functools.partial(on_get, get_binds[-1])
+            )
+
+        getnext([oid.as_object_type() for oid in config.oid_config.next_oids])
 
-        scalar_oids = []
-        for result_oid, value in all_binds:
-            oid = OID(result_oid)
-            scalar_oids.append(oid)
-            match = config.resolve_oid(oid)
+        for oid in config.oid_config.bulk_oids:
+            oid_object_type = oid.as_object_type()
+            self.log.debug(
+                '[%s] Running SNMP command getBulk on OID %s',
+                fetch_id,
+                OIDPrinter((oid_object_type,), with_values=False),
+            )
+            bulk_binds.append([])
+            walks.append(BulkWalk(config.oid_config.get_max_repetitions(oid)))
+            pipeline.bulk(
+                config,
+                oid_object_type,
+                self._NON_REPEATERS,
+                walks[-1],
+                lookup_mib=enforce_constraints,
+                ignore_nonincreasing_oid=self.ignore_nonincreasing_oid,
+                callback=functools.partial(on_bulk, bulk_binds[-1], oid, walks[-1]),
+            )
+
+        def get_results():
+            # type: () -> Tuple[Dict[str, Dict[Tuple[str, ...], Any]], List[OID], Optional[str]]
+            if unexpected_errors:
+                raise unexpected_errors[0]
+            self.submit_bulk_telemetry_metrics(config, walks)
+            all_binds = [bind for request_binds in get_binds + next_binds + bulk_binds for bind in request_binds]
+            results, scalar_oids = self._build_results(config, all_binds, fetch_id)
+            return results, scalar_oids, errors[0] if errors else None
+
+        return get_results
+
+    def _build_results(self, config, all_binds, fetch_id):
+        # type: (InstanceConfig, List[Any], str) -> Tuple[Dict[str, Dict[Tuple[str, ...], Any]], List[OID]]
+        results = defaultdict(dict)  # type: DefaultDict[str, Dict[Tuple[str, ...], Any]]
+        matches = config.resolve_oids([parse_as_oid_tuple(result_oid) for result_oid, _ in all_binds])
+        for (result_oid, value), match in zip(all_binds, matches):
+            if match is None:
+                match = config.resolve_oid(OID(result_oid))
             results[match.name][match.indexes] = value
+        # OID objects are only needed to fill the scalar OIDs cache
+        scalar_oids = []  # type: List[OID]
+        if config.oid_config.needs_scalar_oids():
+            scalar_oids = [OID(result_oid) for result_oid, _ in all_binds]
         self.log.debug('[%s] Raw results: %s', fetch_id, OIDPrinter(results, with_values=False))
         # Freeze the result
         results.default_factory = None  # type: ignore
-        return results, scalar_oids, error
+        return results, scalar_oids
 
     def fetch_oids(self, config, scalar_oids, next_oids, enforce_constraints, fetch_id):
         # type: (InstanceConfig, List[OID], List[OID], bool, str) -> Tuple[List[Any], Optional[str]]
@@ -332,16 +515,7 @@ class SnmpCheck(AgentCheck):
         """
         Return the most specific profile that matches the given sysObjectID.
         """
-        matched_profiles_by_oid = {
-            oid: self.profiles_by_oid[oid] for oid in self.profiles_by_oid if fnmatch.fnmatch(sys_object_oid, oid)
-        }
-
-        if not matched_profiles_by_oid:
-            raise ConfigurationError('No profile matching sysObjectID {}'.format(sys_object_oid))
-
-        oid = max(matched_profiles_by_oid.keys(), key=lambda oid: oid_pattern_specificity(oid))
-
-        return matched_profiles_by_oid[oid]
+        return self._profile_index.profile_for_sysobject_oid(sys_object_oid)
 
     def _start_discovery(self):
         # type: () -> None
@@ -385,12 +559,23 @@ class SnmpCheck(AgentCheck):
             if executor is None:
                 raise RuntimeError("Expected executor be set")
 
-            sent = []
-            for host, discovered in list(config.discovered_instances.items()):
-                future = executor.submit(self._check_device, discovered)  # type: Any
-                sent.append(future)
-                future.add_done_callback(functools.partial(self._on_check_device_done, host))
-            futures.wait(sent)
+            if config.request_window > 1:
+                # Poll all the devices from this thread, through the engine of the network
+                discovered_instances = list(config.discovered_instances.items())
+                for discovered in [discovered for _, discovered in discovered_instances]:
+                    discovered.share_snmp_engine(config._snmp_engine)
+                statuses = self._check_devices_pipelined(
+                    [discovered for _, discovered in discovered_instances], config._snmp_engine
+                )
+                for (host, _), (error, _) in zip(discovered_instances, statuses):
+                    self._on_device_checked(host, error)
+            else:
+                sent = []
+                for host, discovered in list(config.discovered_instances.items()):
+                    future = executor.submit(self._check_device, discovered)  # type: Any
+                    sent.append(future)
+                    future.add_done_callback(functools.partial(self._on_check_device_done, host))
+                futures.wait(sent)
 
             tags = ['network:{}'.format(config.ip_network), 'autodiscovery_subnet:{}'.format(config.ip_network)]
             tags.extend(config.tags)
@@ -412,10 +597,37 @@ class SnmpCheck(AgentCheck):
         self.gauge('datadog.snmp.check_duration', check_duration, tags=telemetry_tags)
         self.gauge('datadog.snmp.submitted_metrics', self._submitted_metrics, tags=telemetry_tags)
 
+    def submit_bulk_telemetry_metrics(self, config, walks):
+        # type: (InstanceConfig, List[BulkWalk]) -> None
+        if not walks:
+            return
+        telemetry_tags = config.tags + [LOADER_TAG]
+        requests = sum(walk.requests for walk in walks)
+        self.gauge('datadog.snmp.bulk.requests_per_walk', float(requests) / len(walks), tags=telemetry_tags)
+        self.count('datadog.snmp.bulk.too_big_errors', sum(walk.too_big_errors for walk in walks), tags=telemetry_tags)
+
+    def submit_discovery_telemetry_metrics(self, duration, probed_hosts, skipped_hosts):
+        # type: (float, int, int) -> None
+        config = self._config
+        telemetry_tags = ['network:{}'.format(config.ip_network), 'autodiscovery_subnet:{}'.format(config.ip_network)]
+        telemetry_tags.extend(config.tags)
+        telemetry_tags.append(LOADER_TAG)
+        # Performance Metrics of a discovery sweep, the hosts that are backing off after failing are skipped
+        self.gauge('datadog.snmp.discovery.sweep_duration', duration, tags=telemetry_tags)
+        self.gauge(
+            'datadog.snmp.discovery.hosts_per_second', probed_hosts / duration if duration else 0, tags=telemetry_tags
+        )
+        self.gauge('datadog.snmp.discovery.probed_hosts', probed_hosts, tags=telemetry_tags)
+        self.gauge('datadog.snmp.discovery.skipped_hosts', skipped_hosts, tags=telemetry_tags)
+
     def _on_check_device_done(self, host, future):
         # type: (str, futures.Future) -> None
-        config = self._config
         error, _ = future.result()
+        self._on_device_checked(host, error)
+
+    def _on_device_checked(self, host, error):
+        # type: (str, Optional[str]) -> None
+        config = self._config
         if error:
             config.failing_instances[host] += 1
             if config.failing_instances[host] >= config.allowed_failures:
@@ -433,7 +645,9 @@ class SnmpCheck(AgentCheck):
         if config.device is None:
             raise RuntimeError('No device set')  # pragma: no cover
 
-        instance = config.instance
+        if config.request_window > 1:
+            return self._check_devices_pipelined([config], config._snmp_engine)[0]
+
         error = results = None
         tags = config.tags
         if config.oid_config.should_reset():
@@ -441,42 +655,114 @@ class SnmpCheck(AgentCheck):
         try:
             if not config.oid_config.has_oids():
                 sys_object_oid = self.fetch_sysobject_oid(config)
-                profile = self._profile_for_sysobject_oid(sys_object_oid)
-                config.refresh_with_profile(self.profiles[profile])
-                config.add_profile_tag(profile)
+                self._refresh_with_sysobject_oid(config, sys_object_oid)
 
             if config.oid_config.has_oids():
                 self.log.debug('Querying %s', config.device)
                 config.add_uptime_metric()
                 results, scalar_oids, error = self.fetch_results(config)
-                config.oid_config.update_scalar_oids(scalar_oids)
-                tags = self.extract_metric_tags(config.parsed_metric_tags, results)
-                tags.extend(config.tags)
-                self.report_metrics(config.parsed_metrics, results, tags)
-        except CheckException as e:
-            error = str(e)
-            self.warning(error)
+                tags = self._report_results(config, results, scalar_oids)
         except Exception as e:
-            if not error:
-                error = 'Failed to collect metrics for {} - {}'.format(self._get_instance_name(instance), e)
-            self.log.debug(error, exc_info=True)
-            self.warning(error)
+            error = self._get_device_error(config, error, e)
         finally:
-            # At this point, `tags` might include some extra tags added in try clause
-
-            # Sending `snmp.devices_monitored` with value 1 will allow users to count devices
-            # by using `sum by {X}` queries in UI. X being a tag like `autodiscovery_subnet`, `snmp_profile`, etc
-            self.gauge('snmp.devices_monitored', 1, tags=tags + [LOADER_TAG])
-
-            # Report service checks
-            status = self.OK
-            if error:
-                status = self.CRITICAL
-                if results:
-                    status = self.WARNING
-            self.service_check(self.SC_STATUS, status, tags=tags, message=error)
+            self._submit_device_status(config, tags, error, results)
         return error, tags
 
+    def _check_devices_pipelined(self, configs, snmp_engine):
+        # type: (List[InstanceConfig], Any) -> List[Tuple[Optional[str], List[str]]]
+        """
+        Check devices that share an SNMP engine, with the requests to all of them in flight at the same time from
+        this thread. The profiles of the devices without OIDs are detected first.
+        """
+        pipeline = RequestPipeline(snmp_engine, self._config.request_window)
+        errors = {}  # type: Dict[int, Exception]
+
+        def on_sysobject_oid(index, var_binds, error):
+            # type: (int, List[Any], Optional[Exception]) -> None
+            config = configs[index]
+            try:
+                if error is not None:
+                    raise error
+                self.log.debug('Returned vars: %s', OIDPrinter(var_binds, with_values=True))
+                self._refresh_with_sysobject_oid(config, var_binds[0][1].prettyPrint())
+            except Exception as e:
+                errors[index] = e
+
+        for index, config in enumerate(configs):
+            if config.oid_config.should_reset():
+                config.oid_config.reset()
+            if not config.oid_config.has_oids():
+                oid = ObjectType(ObjectIdentity((1, 3, 6, 1, 2, 1, 1, 2, 0)))
+                self.log.debug('Running SNMP command on OID: %s', OIDPrinter((oid,), with_values=False))
+                pipeline.get(config, [oid], lookup_mib=False, callback=functools.partial(on_sysobject_oid, index))
+        pipeline.run()
+
+        fetches = {}
+        for index, config in enumerate(configs):
+            if index not in errors and config.oid_config.has_oids():
+                self.log.debug('Querying %s', config.device)
+                config.add_uptime_metric()
+                fetches[index] = self.schedule_fetch_results(pipeline, config)
+        pipeline.run()
+
+        statuses = []
+        for index, config in enumerate(configs):
+            error = results = None
+            tags = config.tags
+            try:
+                if index in errors:
+                    raise errors[index]
+                if index in fetches:
+                    results, scalar_oids, error = fetches[index]()
+                    tags = self._report_results(config, results, scalar_oids)
+            except Exception as e:
+                error = self._get_device_error(config, error, e)
+            finally:
+                self._submit_device_status(config, tags, error, results)
+            statuses.append((error, tags))
+        return statuses
+
+    def _refresh_with_sysobject_oid(self, config, sys_object_oid):
+        # type: (InstanceConfig, str) -> None
+        profile = self._profile_for_sysobject_oid(sys_object_oid)
+        config.refresh_with_profile(self.profiles[profile], self._profile_index.compile(profile))
+        config.add_profile_tag(profile)
+
+    def _report_results(self, config, results, scalar_oids):
+        # type: (InstanceConfig, Dict[str, Dict[Tuple[str, ...], Any]], List[OID]) -> List[str]
+        config.oid_config.update_scalar_oids(scalar_oids)
+        tags = self.extract_metric_tags(config.parsed_metric_tags, results)
+        tags.extend(config.tags)
+        self.report_metrics(config.parsed_metrics, results, tags, config.index_tags_templates)
+        return tags
+
+    def _get_device_error(self, config, error, e):
+        # type: (InstanceConfig, Optional[str], Exception) -> str
+        if isinstance(e, CheckException):
+            error = str(e)
+        else:
+            if not error:
+                error = 'Failed to collect metrics for {} - {}'.format(self._get_instance_name(config.instance), e)
+            self.log.debug(error, exc_info=True)
+        self.warning(error)
+        return error
+
+    def _submit_device_status(self, config, tags, error, results):
+        # type: (InstanceConfig, List[str], Optional[str], Any) -> None
+        # At this point, `tags` might include some extra tags added while checking the device
+
+        # Sending `snmp.devices_monitored` with value 1 will allow users to count devices
+        # by using `sum by {X}` queries in UI. X being a tag like `autodiscovery_subnet`, `snmp_profile`, etc
+        self.gauge('snmp.devices_monitored', 1, tags=tags + [LOADER_TAG])
+
+        # Report service checks
+        status = self.OK
+        if error:
+            status = self.CRITICAL
+            if results:
+                status = self.WARNING
+        self.service_check(self.SC_STATUS, status, tags=tags, message=error)
+
     def extract_metric_tags(self, metric_tags, results):
         # type: (List[SymbolTag], Dict[str, dict]) -> List[str]
         extracted_tags = []  # type: List[str]
@@ -501,6 +787,7 @@ class SnmpCheck(AgentCheck):
         metrics,  # type: List[ParsedMetric]
         results,  # type: Dict[str, Dict[Tuple[str, ...], Any]]
         tags,  # type: List[str]
+        index_tags_templates=None,  # type: Optional[Dict[ParsedTableMetric, Dict[Tuple[str, ...], IndexTagsTemplate]]]
     ):
         # type: (...) -> None
         """
@@ -508,6 +795,9 @@ class SnmpCheck(AgentCheck):
         instance conf for each row.
 
         Submit the results to the aggregator.
+
+        The index tags of the rows are computed from templates stored in `index_tags_templates` if given, so that
+        they can be reused on the next run.
         """
         for metric in metrics:
             name = metric.name
@@ -515,8 +805,15 @@ class SnmpCheck(AgentCheck):
                 self.log.debug('Ignoring metric %s', name)
                 continue
             if isinstance(metric, ParsedTableMetric):
+                templates = None
+                if index_tags_templates is not None:
+                    templates = self.get_index_tags_templates(metric, results[name], index_tags_templates)
                 for index, val in iteritems(results[name]):
-                    metric_tags = tags + self.get_index_tags(index, results, metric.index_tags, metric.column_tags)
+                    if templates is not None:
+                        index_tags = templates[index].get_tags(results, self.log)
+                    else:
+                        index_tags = self.get_index_tags(index, results, metric.index_tags, metric.column_tags)
+                    metric_tags = tags + index_tags
                     self.submit_metric(
                         name, val, metric.forced_type, metric_tags, metric.options, metric.extract_value_pattern
                     )
@@ -637,6 +934,31 @@ class SnmpCheck(AgentCheck):
         )
         self._submitted_metrics += 1
 
+    def get_index_tags_templates(
+        self,
+        metric,  # type: ParsedTableMetric
+        rows,  # type: Dict[Tuple[str, ...], Any]
+        index_tags_templates,  # type: Dict[ParsedTableMetric, Dict[Tuple[str, ...], IndexTagsTemplate]]
+    ):
+        # type: (...) -> Dict[Tuple[str, ...], IndexTagsTemplate]
+        """
+        Return the index tags templates of the rows of a table metric, reusing the ones of the previous run.
+        """
+        templates = index_tags_templates.get(metric)
+        if templates is not None and templates.keys() == rows.keys():
+            return templates
+
+        # Only keep the templates of the current rows
+        previous = templates or {}
+        templates = {}
+        for index in rows:
+            template = previous.get(index)
+            if template is None:
+                template = IndexTagsTemplate(index, metric.index_tags, metric.column_tags, self.log)
+            templates[index] = template
+        index_tags_templates[metric] = templates
+        return templates
+
     def get_index_tags(
         self,
         index,  # type: Tuple[str, ...]
@@ -251,9 +251,12 @@ def oid_pattern_specificity(pattern):
 
     Suitable for use as a key function when sorting OID patterns.
     """
-    wildcard_key = -1  # Must be less than all digits, so that e.G. '1.*' is less specific than '1.n' for n = 0...9.
+    wildcard_key = -2  # Must be less than all digits, so that e.G. '1.*' is less specific than '1.n' for n = 0...9.
+    partial_wildcard_key = -1  # Parts like '5*' are more specific than '*', and less than any number.
 
-    parts = tuple(wildcard_key if digit == '*' else int(digit) for digit in pattern.lstrip('.').split('.'))
+    parts = tuple(
+        _oid_pattern_part_key(part, wildcard_key, partial_wildcard_key) for part in pattern.lstrip('.').split('.')
+    )
 
     return (
         len(parts),  # Shorter OIDs are less specific than longer OIDs, regardless of their contents.
@@ -261,6 +264,15 @@ def oid_pattern_specificity(pattern):
     )
 
 
+def _oid_pattern_part_key(part, wildcard_key, partial_wildcard_key):
+    # type: (str, int, int) -> int
+    if part == '*':
+        return wildcard_key
+    if any(char in part for char in '*?['):
+        return partial_wildcard_key
+    return int(part)
+
+
 class OIDPrinter(object):
     """Utility class to display OIDs efficiently.
 
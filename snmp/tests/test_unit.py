@@ -3,6 +3,7 @@
 # Licensed under Simplified BSD License (see LICENSE)
 
 import copy
+import json
 import logging
 import os
 import time
@@ -13,17 +14,25 @@ from typing import Any, List  # noqa: F401
 import mock
 import pytest
 import yaml
+from pysnmp.proto.rfc1902 import Integer32, OctetString
 
 from datadog_checks.base import ConfigurationError
+from datadog_checks.base.errors import CheckException
 from datadog_checks.dev import temp_dir
 from datadog_checks.snmp import SnmpCheck
-from datadog_checks.snmp.config import InstanceConfig
-from datadog_checks.snmp.discovery import discover_instances
+from datadog_checks.snmp.commands import TOO_BIG, snmp_bulk
+from datadog_checks.snmp.config import InstanceConfig, OIDConfig
+from datadog_checks.snmp.discovery import DiscoveryState, discover_instances
+from datadog_checks.snmp.models import OID, BulkWalk
 from datadog_checks.snmp.parsing import ParsedSymbolMetric, ParsedTableMetric
-from datadog_checks.snmp.resolver import OIDTrie
+from datadog_checks.snmp.pipeline import RequestPipeline
+from datadog_checks.snmp.profiles import ProfileIndex
+from datadog_checks.snmp.pysnmp_types import ObjectIdentity, ObjectName, ObjectType, SnmpEngine, endOfMibView
+from datadog_checks.snmp.resolver import OIDResolver, OIDTrie
 from datadog_checks.snmp.utils import (
     _load_default_profiles,
     batches,
+    get_default_profiles,
     oid_pattern_specificity,
     recursively_expand_base_profiles,
 )
@@ -276,6 +285,50 @@ def test_sysobjectid_list():
     }
 
 
+def test_profile_index():
+    profiles = {
+        'generic': {'definition': {'sysobjectid': '1.3.6.1.4.1.9.*'}},
+        'router': {'definition': {'sysobjectid': ['1.3.6.1.4.1.9.1.*', '1.3.6.1.4.1.9.2.1']}},
+        'switch': {'definition': {'sysobjectid': '1.3.6.1.4.1.9.1.5*'}},
+        'no_sysobjectid': {'definition': {'metrics': [{'OID': '1.2.3', 'name': 'foo'}]}},
+    }
+    index = ProfileIndex(profiles)
+
+    assert index.profile_for_sysobject_oid('1.3.6.1.4.1.9.3') == 'generic'
+    assert index.profile_for_sysobject_oid('1.3.6.1.4.1.9.1.4') == 'router'
+    assert index.profile_for_sysobject_oid('1.3.6.1.4.1.9.1.57.2') == 'switch'
+    assert index.profile_for_sysobject_oid('1.3.6.1.4.1.9.2.1') == 'router'
+    with pytest.raises(ConfigurationError):
+        index.profile_for_sysobject_oid('1.3.6.1.4.1.10.1')
+
+    compiled = index.compile('no_sysobjectid')
+    assert index.compile('no_sysobjectid') is compiled
+    assert [str(oid) for result in compiled.metrics for oid in result.oids_to_fetch] == ['1.2.3']
+
+
+def test_default_profile_index_shared():
+    instance = common.generate_instance_config([])
+    check1 = SnmpCheck('snmp', {}, [instance])
+    check2 = SnmpCheck('snmp', {}, [copy.deepcopy(instance)])
+    assert check1._profile_index is check2._profile_index
+    assert check1.profiles is get_default_profiles()
+
+    profile = next(name for name, profile in check1.profiles.items() if profile['definition'].get('metrics'))
+    check1._config.refresh_with_profile(check1.profiles[profile], check1._profile_index.compile(profile))
+    check2._config.refresh_with_profile(check2.profiles[profile], check2._profile_index.compile(profile))
+    # Each instance fetches its own OIDs
+    assert not set(map(id, check1._config.oid_config.scalar_oids)) & set(map(id, check2._config.oid_config.scalar_oids))
+
+
+def test_oid_copy_mib_symbol():
+    oid = OID.from_mib_symbol('IF-MIB', 'ifInOctets')
+    oid_copy = oid.copy()
+    assert oid_copy._mib_symbol == ('IF-MIB', 'ifInOctets')
+    assert oid_copy._object_identity is not oid._object_identity
+
+    assert OID('1.2.3').copy().as_tuple() == (1, 2, 3)
+
+
 def test_no_address():
     instance = common.generate_instance_config([])
     instance.pop('ip_address')
@@ -393,13 +446,82 @@ def test_cache_building(write_mock, read_mock):
 
     try:
         for _ in range(30):
-            if write_mock.call_count:
+            if any(call[0][0] == '' for call in write_mock.call_args_list):
                 break
             time.sleep(0.5)
     finally:
         check._running = False
 
-    write_mock.assert_called_once_with('', '["192.168.0.1"]')
+    # The progress of the discovery is persisted separately from the discovered hosts
+    assert [call for call in write_mock.call_args_list if call[0][0] == ''] == [mock.call('', '["192.168.0.1"]')]
+
+
+def test_discovery_state_backoff():
+    state = DiscoveryState('192.168.0.0/29', max_backoff=4)
+
+    skipped_sweeps = []
+    for _ in range(6):
+        sweeps = 0
+        while not state.should_probe('192.168.0.1'):
+            state.end_sweep()
+            sweeps += 1
+        skipped_sweeps.append(sweeps)
+        state.add_result('192.168.0.1', reachable=False)
+        state.end_sweep()
+
+    # The skipped sweeps double after every failure, up to the maximum backoff
+    assert skipped_sweeps == [0, 0, 1, 3, 3, 3]
+
+    state.add_result('192.168.0.1', reachable=True)
+    assert state.should_probe('192.168.0.1')
+
+
+@mock.patch("datadog_checks.snmp.discovery.read_persistent_cache")
+@mock.patch("datadog_checks.snmp.discovery.write_persistent_cache")
+def test_discovery_resume(write_mock, read_mock, aggregator):
+    """A restarted discovery resumes the persisted sweep and skips the hosts backing off."""
+    instance = common.generate_instance_config(common.SUPPORTED_METRIC_TYPES)
+    instance.pop('ip_address')
+    instance['network_address'] = '192.168.0.0/29'
+    instance['discovery_workers'] = 1
+
+    read_mock.return_value = json.dumps(
+        {
+            'network': '192.168.0.0/29',
+            'sweep': 3,
+            'last_sweep_end': None,
+            'probed': ['192.168.0.1', '192.168.0.2'],
+            'failures': {'192.168.0.3': [2, 5]},
+        }
+    )
+    check = SnmpCheck('snmp', {}, [instance])
+
+    hosts = []
+
+    def mock_fetch(cfg):
+        hosts.append(cfg.instance['ip_address'])
+        if cfg.instance['ip_address'] == '192.168.0.6':
+            check._running = False
+        raise RuntimeError("Not snmp")
+
+    check.fetch_sysobject_oid = mock_fetch
+
+    discover_instances(check._config, 0, weakref.ref(check))
+
+    assert hosts == ['192.168.0.4', '192.168.0.5', '192.168.0.6']
+    state = json.loads(write_mock.call_args_list[-2][0][1])
+    assert state['sweep'] == 4
+    assert state['probed'] == []
+    assert state['failures'] == {
+        '192.168.0.3': [2, 5],
+        '192.168.0.4': [1, 4],
+        '192.168.0.5': [1, 4],
+        '192.168.0.6': [1, 4],
+    }
+    aggregator.assert_metric('datadog.snmp.discovery.probed_hosts', value=3)
+    aggregator.assert_metric('datadog.snmp.discovery.skipped_hosts', value=1)
+    aggregator.assert_metric('datadog.snmp.discovery.sweep_duration')
+    aggregator.assert_metric('datadog.snmp.discovery.hosts_per_second')
 
 
 def test_trie():
@@ -411,6 +533,78 @@ def test_trie():
     assert trie.match((1, 2, 3)) == ((1, 2, 3), 'foo')
     assert trie.match((1, 2, 3, 4)) == ((1, 2, 3), 'foo')
     assert trie.match((2, 3, 4)) == ((), None)
+    assert trie.match_column((1, 2, 3, 4)) == ((1, 2, 3), 'foo', True)
+    assert trie.match_column((1, 2, 4)) == ((1, 2), 'bar', False)
+
+
+def test_resolve_oids():
+    resolver = OIDResolver(mock.Mock(), enforce_constraints=True)
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.2'), 'ifDescr')
+    resolver.register(OID('1.3.6.1.2.1.2.2.1.10'), 'ifInOctets')
+    resolver.register(OID('1.3.6.1.2.1.4.31.1.1.4'), 'ipSystemStatsHCInReceives')
+    resolver.register_index('ipSystemStatsHCInReceives', index=1, mapping={1: 'ipv4', 2: 'ipv6'})
+
+    oids = [
+        (1, 3, 6, 1, 2, 1, 2, 2, 1, 2, 1),
+        (1, 3, 6, 1, 2, 1, 2, 2, 1, 2, 2),
+        (1, 3, 6, 1, 2, 1, 2, 2, 1, 10, 1),
+        (1, 3, 6, 1, 2, 1, 2, 2, 1, 10, 2),
+        (1, 3, 6, 1, 2, 1, 4, 31, 1, 1, 4, 1),
+        (1, 3, 6, 1, 2, 1, 4, 31, 1, 1, 4, 2),
+        (1, 3, 6, 1, 2, 1, 1, 5, 0),
+    ]
+    matches = resolver.resolve_oids(oids)
+
+    assert matches[:-1] == [resolver.resolve_oid(OID(oid)) for oid in oids[:-1]]
+    assert matches[1] == ('ifDescr', ('2',))
+    assert matches[5] == ('ipSystemStatsHCInReceives', ('ipv6',))
+    # Indexes are shared by the columns of a row
+    assert matches[0].indexes is matches[2].indexes
+    # Unregistered OIDs are resolved from MIBs
+    assert matches[-1] is None
+
+
+def test_index_tags_templates(aggregator):
+    instance = common.generate_instance_config([])
+    check = SnmpCheck('snmp', {}, [instance])
+    metrics = [
+        {
+            'MIB': 'IF-MIB',
+            'table': 'ifTable',
+            'symbols': [{'OID': '1.3.6.1.2.1.2.2.1.10', 'name': 'ifInOctets'}],
+            'metric_tags': [
+                {'tag': 'interface', 'column': {'OID': '1.3.6.1.2.1.2.2.1.2', 'name': 'ifDescr'}},
+                {'tag': 'if_index', 'index': 1},
+            ],
+        }
+    ]
+    _, _, _, parsed_metrics = check._config.parse_metrics(metrics)
+    results = {
+        'ifInOctets': {('1',): Integer32(10), ('2',): Integer32(20)},
+        'ifDescr': {('1',): OctetString('eth0'), ('2',): OctetString('eth1')},
+    }
+    templates = {}  # type: dict
+
+    check.report_metrics(parsed_metrics, results, ['foo:bar'], templates)
+    aggregator.assert_metric('snmp.ifInOctets', value=10, tags=['foo:bar', 'if_index:1', 'interface:eth0'])
+    aggregator.assert_metric('snmp.ifInOctets', value=20, tags=['foo:bar', 'if_index:2', 'interface:eth1'])
+
+    # Templates are reused as long as the rows don't change, and column tags follow the values
+    row_templates = templates[parsed_metrics[0]]
+    aggregator.reset()
+    results['ifDescr'][('2',)] = OctetString('eth2')
+    check.report_metrics(parsed_metrics, results, ['foo:bar'], templates)
+    assert templates[parsed_metrics[0]] is row_templates
+    aggregator.assert_metric('snmp.ifInOctets', value=20, tags=['foo:bar', 'if_index:2', 'interface:eth2'])
+
+    # Only the templates of the current rows are kept
+    aggregator.reset()
+    results = {'ifInOctets': {('2',): Integer32(20), ('3',): Integer32(30)}, 'ifDescr': {('3',): OctetString('eth3')}}
+    check.report_metrics(parsed_metrics, results, ['foo:bar'], templates)
+    assert set(templates[parsed_metrics[0]]) == {('2',), ('3',)}
+    assert templates[parsed_metrics[0]][('2',)] is row_templates[('2',)]
+    aggregator.assert_metric('snmp.ifInOctets', value=20, tags=['foo:bar', 'if_index:2'])
+    aggregator.assert_metric('snmp.ifInOctets', value=30, tags=['foo:bar', 'if_index:3', 'interface:eth3'])
 
 
 @pytest.mark.parametrize(
@@ -420,6 +614,7 @@ def test_trie():
         (['1.3.4.*', '1.3.4.1'], ['1.3.4.*', '1.3.4.1']),
         (['1.3.4.1', '1.3.4.*'], ['1.3.4.*', '1.3.4.1']),
         (['1.3.4.1.2', '1.3.4'], ['1.3.4', '1.3.4.1.2']),
+        (['1.3.4.1', '1.3.4.1*', '1.3.4.*'], ['1.3.4.*', '1.3.4.1*', '1.3.4.1']),
         (
             ['1.3.6.1.4.1.3375.2.1.3.4.43', '1.3.6.1.4.1.8072.3.2.10'],
             ['1.3.6.1.4.1.8072.3.2.10', '1.3.6.1.4.1.3375.2.1.3.4.43'],
@@ -592,6 +787,7 @@ def test_discovery_tags():
 
     instance['network_address'] = '192.168.0.0/29'
     instance['tags'] = ['test:check']
+    instance['discovery_workers'] = 1
 
     check = SnmpCheck('snmp', {}, [instance])
 
@@ -635,6 +831,78 @@ def test_cache_loading_tags(thread_mock, read_mock):
     assert set(config.tags) == {'autodiscovery_subnet:192.168.0.0/29', 'test:check', 'snmp_device:192.168.0.2'}
 
 
+def test_oid_config_max_repetitions():
+    table, other_table = OID('1.3.6.1.2.1.2.2'), OID('1.3.6.1.2.1.31.1.1')
+    oid_config = OIDConfig(0, 100)
+    oid_config.add_parsed_oids(bulk_oids=[table, other_table])
+    assert oid_config.get_max_repetitions(table) == OIDConfig.INITIAL_MAX_REPETITIONS
+
+    walk = BulkWalk(25)
+    walk.rows = 42
+    oid_config.update_bulk_walk(table, walk, complete=True)
+    assert oid_config.get_max_repetitions(table) == 43
+    assert oid_config.get_max_repetitions(other_table) == OIDConfig.INITIAL_MAX_REPETITIONS
+
+    walk = BulkWalk(500)
+    walk.rows = 1000
+    oid_config.update_bulk_walk(table, walk, complete=True)
+    assert oid_config.get_max_repetitions(table) == 100
+
+    # The device couldn't fit more than 12 rows, the row count of an incomplete walk is ignored
+    walk = BulkWalk(100)
+    walk.back_off()
+    walk.back_off()
+    walk.back_off()
+    walk.rows = 12
+    oid_config.update_bulk_walk(table, walk, complete=False)
+    assert oid_config.get_max_repetitions(table) == 12
+
+    walk = BulkWalk(12)
+    walk.rows = 5
+    oid_config.update_bulk_walk(table, walk, complete=True)
+    assert oid_config.get_max_repetitions(table) == 6
+
+
+def test_snmp_bulk_too_big():
+    snmp_engine = SnmpEngine()
+    snmp_engine.transportDispatcher = mock.Mock()
+    config = mock.Mock(_snmp_engine=snmp_engine)
+
+    def row(index, value):
+        return [(ObjectName('1.3.6.1.2.1.2.2.1.1.{}'.format(index)), value)]
+
+    responses = [
+        (TOO_BIG, []),
+        (TOO_BIG, []),
+        (0, [row(1, Integer32(1)), row(2, Integer32(2))]),
+        (0, [row(3, Integer32(3)), row(3, endOfMibView)]),
+    ]
+    sent = []
+
+    def send_var_binds(engine, target, context_engine_id, context_name, non_repeaters, max_repetitions, *args):
+        var_binds, callback, ctx = args
+        sent.append(max_repetitions)
+        error_status, var_bind_table = responses.pop(0)
+        callback(engine, 1, None, error_status, 0, var_bind_table, ctx)
+
+    walk = BulkWalk(10)
+    oid = ObjectType(ObjectIdentity('1.3.6.1.2.1.2.2'))
+    with mock.patch('datadog_checks.snmp.commands.cmdgen.BulkCommandGenerator') as generator:
+        generator.return_value.sendVarBinds.side_effect = send_var_binds
+        binds = list(snmp_bulk(config, oid, 0, walk, False, False))
+
+    assert [value for _, value in binds] == [1, 2, 3]
+    assert sent == [10, 5, 2, 2]
+    assert (walk.requests, walk.rows, walk.too_big_errors) == (4, 3, 2)
+
+    walk = BulkWalk(1)
+    responses = [(TOO_BIG, [])]
+    with mock.patch('datadog_checks.snmp.commands.cmdgen.BulkCommandGenerator') as generator:
+        generator.return_value.sendVarBinds.side_effect = send_var_binds
+        with pytest.raises(CheckException, match='tooBig'):
+            list(snmp_bulk(config, oid, 0, walk, False, False))
+
+
 def test_failed_to_collect_metrics():
     config = InstanceConfig(
         {"ip_address": "127.0.0.123", "community_string": "public", "metrics": [{"OID": "1.2.3", "name": "foo"}]}
@@ -654,6 +922,47 @@ def test_failed_to_collect_metrics():
     assert 'Failed to collect metrics for 127.0.0.123' in check.warnings[0]
 
 
+def test_request_pipeline_window():
+    sent = []
+    completed = []
+
+    class FakeRequest(object):
+        def __init__(self, target, name):
+            self.config = mock.Mock()
+            self.config.device.target = target
+            self.name = name
+
+        def send(self, pipeline):
+            sent.append(self.name)
+
+        def on_response(self, snmp_engine, error_indication, error_status, var_binds):
+            return True
+
+        def complete(self, error):
+            completed.append((self.name, error))
+
+    pipeline = RequestPipeline(mock.Mock(), 2)
+    requests = {}
+    for target, name in [('a', 'a1'), ('a', 'a2'), ('a', 'a3'), ('b', 'b1')]:
+        requests[name] = FakeRequest(target, name)
+        pipeline._submit(requests[name])
+
+    # The third request to `a` waits for a slot, other devices are not affected
+    assert sent == ['a1', 'a2', 'b1']
+
+    pipeline._on_response(None, None, 0, None, requests['a2'])
+    assert sent == ['a1', 'a2', 'b1', 'a3']
+    assert completed == [('a2', None)]
+
+    error = ValueError('error')
+    requests['a1'].on_response = mock.Mock(side_effect=error)
+    pipeline._on_response(None, None, 0, None, requests['a1'])
+    pipeline._on_response(None, None, 0, None, requests['a3'])
+    pipeline._on_response(None, None, 0, None, requests['b1'])
+    assert completed == [('a2', None), ('a1', error), ('a3', None), ('b1', None)]
+    assert pipeline._active == 0
+
+
 @pytest.mark.parametrize(
     "items, size, output",
     [
@@ -59,6 +59,7 @@ class InstanceConfig(BaseModel):
     components: Optional[Mapping[str, Any]]
     components_discovery: Optional[ComponentsDiscovery]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     default_exclude: Optional[Sequence[str]]
     default_include: Optional[Sequence[str]]
     default_tag: Optional[str]
@@ -94,6 +95,7 @@ class InstanceConfig(BaseModel):
     rmi_connection_timeout: Optional[float]
     rmi_registry_ssl: Optional[bool]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     tags: Optional[Sequence[str]]
     timeout: Optional[float]
@@ -56,6 +56,7 @@ class InstanceConfig(BaseModel):
     aws_service: Optional[str]
     cluster_name: str
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     disable_legacy_cluster_tag: Optional[bool]
     empty_default_hostname: Optional[bool]
@@ -81,6 +82,7 @@ class InstanceConfig(BaseModel):
     read_timeout: Optional[float]
     request_size: Optional[float]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     spark_cluster_mode: Optional[str]
     spark_pre_20_mode: Optional[bool]
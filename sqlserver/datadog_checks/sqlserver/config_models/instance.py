@@ -89,6 +89,9 @@ class QueryMetrics(BaseModel):
     enabled: Optional[bool]
     enforce_collection_interval_deadline: Optional[bool]
     max_queries: Optional[int]
+    persist_caches: Optional[bool]
+    plan_cache_max_size: Optional[int]
+    plan_lookup_batch_size: Optional[int]
     samples_per_hour_per_query: Optional[int]
 
 
@@ -4,17 +4,22 @@
 
 import binascii
 import math
+import sys
 import time
 
-from cachetools import TTLCache
+from cachetools import LRUCache, TTLCache
 from lxml import etree as ET
 
 from datadog_checks.base import is_affirmative
 from datadog_checks.base.utils.common import ensure_unicode, to_native_string
-from datadog_checks.base.utils.db.sql import compute_sql_signature
 from datadog_checks.base.utils.db.statement_metrics import StatementMetrics
 from datadog_checks.base.utils.db.utils import (
+    OBFUSCATION_CACHE_MAX_SIZE,
+    OBFUSCATION_CACHE_TTL,
     DBMAsyncJob,
+    ObfuscationCache,
+    PersistableRateLimitingTTLCache,
+    PersistentCaches,
     RateLimitingTTLCache,
     default_json_event_encoding,
     obfuscate_sql_with_metadata,
@@ -124,11 +129,19 @@ select
     cross apply sys.dm_exec_sql_text(plan_handle) qt
 """
 
+# the plans of a batch of plan handles are looked up at once, the handles are passed as a VALUES list
 PLAN_LOOKUP_QUERY = """\
-select cast(query_plan as nvarchar(max)) as query_plan, encrypted as is_encrypted
-from sys.dm_exec_query_plan(CONVERT(varbinary(max), ?, 1))
+select h.plan_handle, cast(query_plan as nvarchar(max)) as query_plan, encrypted as is_encrypted
+from (values {plan_handles}) as h(plan_handle)
+cross apply sys.dm_exec_query_plan(CONVERT(varbinary(max), h.plan_handle, 1))
 """
 
+DEFAULT_PLAN_LOOKUP_BATCH_SIZE = 100
+# SQL Server supports at most 2100 parameters per request
+MAX_PLAN_LOOKUP_BATCH_SIZE = 2000
+# the maximum number of bytes used by the obfuscated plans of the plan cache
+DEFAULT_PLAN_CACHE_MAX_SIZE = 16 * 1024 * 1024
+
 
 def _row_key(row):
     """
@@ -153,6 +166,12 @@ XML_PLAN_OBFUSCATION_ATTRS = frozenset(
 )
 
 
+def _get_cached_plan_size(plan):
+    # an estimate of the memory used by a cached plan, only the obfuscated plan is accounted for
+    obfuscated_plan, _, _ = plan
+    return sys.getsizeof(obfuscated_plan)
+
+
 def agent_check_getter(self):
     return self.check
 
@@ -220,6 +239,10 @@ class SqlserverStatementMetrics(DBMAsyncJob):
         self._statement_metrics_query = None
         self._last_stats_query_time = None
         self._max_query_metrics = check.statement_metrics_config.get("max_queries", 250)
+        self.plan_lookup_batch_size = min(
+            max(int(check.statement_metrics_config.get('plan_lookup_batch_size', DEFAULT_PLAN_LOOKUP_BATCH_SIZE)), 1),
+            MAX_PLAN_LOOKUP_BATCH_SIZE,
+        )
 
     def _init_caches(self):
         # full_statement_text_cache: limit the ingestion rate of full statement text events per query_signature
@@ -228,15 +251,37 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             ttl=60 * 60 / self.check.instance.get('full_statement_text_samples_per_hour_per_query', 1),
         )
 
+        # obfuscation_cache: the same statements are returned by every collection, so they are only obfuscated once
+        self._obfuscation_cache = ObfuscationCache(
+            max_size=self.check.statement_metrics_config.get('obfuscation_cache_max_size', OBFUSCATION_CACHE_MAX_SIZE),
+            ttl=self.check.statement_metrics_config.get('obfuscation_cache_ttl', OBFUSCATION_CACHE_TTL),
+        )
+
+        persist_caches = is_affirmative(self.check.statement_metrics_config.get('persist_caches', False))
         # seen_plans_ratelimiter: limit the ingestion rate per unique plan.
         # plans, we only really need them once per hour
-        self._seen_plans_ratelimiter = RateLimitingTTLCache(
+        # the persisted rate limiter follows the wall clock, otherwise it keeps the monotonic clock of TTLCache
+        ratelimiting_cache_class = PersistableRateLimitingTTLCache if persist_caches else RateLimitingTTLCache
+        self._seen_plans_ratelimiter = ratelimiting_cache_class(
             # assuming ~100 bytes per entry (query & plan signature, key hash, 4 pointers (ordered dict), expiry time)
             # total size: 10k * 100 = 1 Mb
             maxsize=int(self.check.instance.get('seen_samples_cache_maxsize', 10000)),
             ttl=60 * 60 / int(self.check.instance.get('samples_per_hour_per_query', 4)),
         )
 
+        # plan_cache: the plan of a plan handle does not change, so it is only fetched and obfuscated once
+        self._plan_cache = LRUCache(
+            maxsize=int(self.check.statement_metrics_config.get('plan_cache_max_size', DEFAULT_PLAN_CACHE_MAX_SIZE)),
+            getsizeof=_get_cached_plan_size,
+        )
+
+        # persistent_caches: keep the plan rate limits across agent restarts so that the same plans are not collected
+        # again right after a restart
+        self._persistent_caches = None
+        if persist_caches:
+            self._persistent_caches = PersistentCaches(self.check, 'statement_metrics_caches')
+            self._persistent_caches.add('seen_plans', self._seen_plans_ratelimiter)
+
     def _close_db_conn(self):
         pass
 
@@ -291,11 +336,11 @@ class SqlserverStatementMetrics(DBMAsyncJob):
         normalized_rows = []
         for row in rows:
             try:
-                statement = obfuscate_sql_with_metadata(row['statement_text'], self.check.obfuscator_options)
+                statement = self._obfuscation_cache.obfuscate(row['statement_text'], self.check.obfuscator_options)
                 procedure_statement = None
                 row['is_proc'], procedure_name = is_statement_proc(row['text'])
                 if row['is_proc']:
-                    procedure_statement = obfuscate_sql_with_metadata(row['text'], self.check.obfuscator_options)
+                    procedure_statement = self._obfuscation_cache.obfuscate(row['text'], self.check.obfuscator_options)
             except Exception as e:
                 if self.check.log_unobfuscated_queries:
                     raw_query_text = row['text'] if row.get('is_proc', False) else row['statement_text']
@@ -315,10 +360,10 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             row['text'] = obfuscated_statement
             if procedure_statement:
                 row['procedure_text'] = procedure_statement['query']
-                row['procedure_signature'] = compute_sql_signature(procedure_statement['query'])
+                row['procedure_signature'] = procedure_statement['query_signature']
             if procedure_name:
                 row['procedure_name'] = procedure_name
-            row['query_signature'] = compute_sql_signature(obfuscated_statement)
+            row['query_signature'] = statement['query_signature']
             row['query_hash'] = _hash_to_hex(row['query_hash'])
             row['query_plan_hash'] = _hash_to_hex(row['query_plan_hash'])
             row['plan_handle'] = _hash_to_hex(row['plan_handle'])
@@ -401,11 +446,15 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             len(self._seen_plans_ratelimiter),
             **self.check.debug_stats_kwargs()
         )
+        self.check.gauge(
+            "dd.sqlserver.statements.plan_cache.len", len(self._plan_cache), **self.check.debug_stats_kwargs()
+        )
         self.check.gauge(
             "dd.sqlserver.statements.fqt_cache.len",
             len(self._full_statement_text_cache),
             **self.check.debug_stats_kwargs()
         )
+        self._obfuscation_cache.submit_debug_metrics(self.check, 'sqlserver', **self.check.debug_stats_kwargs())
 
     def _rows_to_fqt_events(self, rows):
         for row in rows:
@@ -440,26 +489,38 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             }
 
     def run_job(self):
+        if self._persistent_caches:
+            self._persistent_caches.load()
         self.collect_statement_metrics_and_plans()
+        if self._persistent_caches:
+            self._persistent_caches.save()
 
     @tracked_method(agent_check_getter=agent_check_getter)
-    def _load_plan(self, plan_handle, cursor):
-        self.log.debug("collecting plan. plan_handle=%s", plan_handle)
-        self.log.debug("Running query [%s] %s", PLAN_LOOKUP_QUERY, (plan_handle,))
-        cursor.execute(PLAN_LOOKUP_QUERY, ("0x" + plan_handle,))
-        result = cursor.fetchall()
-        if not result or not result[0]:
-            self.log.debug("failed to loan plan, it must have just been expired out of the plan cache")
-            return None, None
-        return result[0]
+    def _load_plans(self, plan_handles, cursor):
+        """
+        Look up the plans of a batch of plan handles with a single query.
+        :return: a dict of plan handle -> (raw plan, is plan encrypted)
+        """
+        query = PLAN_LOOKUP_QUERY.format(plan_handles=", ".join(["(?)"] * len(plan_handles)))
+        params = tuple("0x" + plan_handle for plan_handle in plan_handles)
+        self.log.debug("collecting plans. plan_handles=%s", plan_handles)
+        self.log.debug("Running query [%s] %s", query, params)
+        cursor.execute(query, params)
+        plans = {}
+        for plan_handle, raw_plan, is_plan_encrypted in cursor.fetchall():
+            plans[plan_handle[2:].lower()] = (raw_plan, is_plan_encrypted)
+        if len(plans) < len(plan_handles):
+            self.log.debug(
+                "failed to load %d plans, they must have just been expired out of the plan cache",
+                len(plan_handles) - len(plans),
+            )
+        self.check.count("dd.sqlserver.statements.plans_fetched.count", len(plans), **self.check.debug_stats_kwargs())
+        return plans
 
     @tracked_method(agent_check_getter=agent_check_getter)
     def _collect_plans(self, rows, cursor, deadline):
-        for row in rows:
-            if self.enforce_collection_interval_deadline and time.time() > deadline:
-                self.log.debug("ending plan collection early because check deadline has been exceeded")
-                self.check.count("dd.sqlserver.statements.deadline_exceeded", 1, **self.check.debug_stats_kwargs())
-                return
+        batch = []
+        for i, row in enumerate(rows):
             plan_key = (row['query_signature'], row['query_hash'], row['query_plan_hash'])
             # for stored procedures, we only want to look up plans for the entire procedure
             # not every query that is executed within the proc. In order to accomplish this,
@@ -467,75 +528,108 @@ class SqlserverStatementMetrics(DBMAsyncJob):
             if row['is_proc'] or row['is_encrypted']:
                 plan_key = row['plan_handle']
             if self._seen_plans_ratelimiter.acquire(plan_key):
-                raw_plan, is_plan_encrypted = self._load_plan(row['plan_handle'], cursor)
-                obfuscated_plan, collection_errors = None, None
-
-                try:
-                    if raw_plan:
-                        obfuscated_plan = obfuscate_xml_plan(raw_plan, self.check.obfuscator_options)
-                except Exception as e:
-                    context = (
-                        "query_signature=[{0}] query_hash=[{1}] query_plan_hash=[{2}] plan_handle=[{3}] err=[{4}]"
-                    ).format(row['query_signature'], row['query_hash'], row['query_plan_hash'], row['plan_handle'], e)
-                    if self.check.log_unobfuscated_plans:
-                        self.log.warning("Failed to obfuscate plan=[%s] | %s", raw_plan, context)
-                    else:
-                        self.log.debug("Failed to obfuscate plan | %s", context)
-                    collection_errors = [{'code': "obfuscate_xml_plan_error", 'message': str(e)}]
-                    self.check.count(
-                        "dd.sqlserver.statements.error",
-                        1,
-                        **self.check.debug_stats_kwargs(tags=["error:obfuscate-xml-plan-{}".format(type(e))])
-                    )
-                tags = list(self.tags)
-
-                # for stored procedures, we want to send the plan
-                # events with the full procedure text, not the text
-                # for the individual statement encapsulated within the proc
-                text_key = 'text'
-                if row['is_proc']:
-                    text_key = 'procedure_text'
-                query_signature = row['query_signature']
-                # for procedure plans, it only makes sense to send the
-                # procedure_signature
-                if row['is_proc']:
-                    query_signature = None
-                if 'database_name' in row:
-                    tags += ["db:{}".format(row['database_name'])]
-                yield {
-                    "host": self.check.resolved_hostname,
-                    "ddagentversion": datadog_agent.get_version(),
-                    "ddsource": "sqlserver",
-                    "ddtags": ",".join(tags),
-                    "timestamp": time.time() * 1000,
-                    "dbm_type": "plan",
-                    "cloud_metadata": self.check.cloud_metadata,
-                    'sqlserver_version': self.check.static_info_cache.get(STATIC_INFO_VERSION, ""),
-                    'sqlserver_engine_edition': self.check.static_info_cache.get(STATIC_INFO_ENGINE_EDITION, ""),
-                    "db": {
-                        "instance": row.get("database_name", None),
-                        "plan": {
-                            "definition": obfuscated_plan,
-                            "signature": row['query_plan_hash'],
-                            "collection_errors": collection_errors,
-                        },
-                        "query_signature": query_signature,
-                        "procedure_signature": row.get('procedure_signature', None),
-                        "procedure_name": row.get('procedure_name', None),
-                        "statement": row[text_key],
-                        "metadata": {
-                            "tables": row['dd_tables'],
-                            "commands": row['dd_commands'],
-                            "comments": row['dd_comments'],
-                        },
-                    },
-                    'sqlserver': {
-                        "is_plan_encrypted": is_plan_encrypted,
-                        "is_statement_encrypted": row['is_encrypted'],
-                        'query_hash': row['query_hash'],
-                        'query_plan_hash': row['query_plan_hash'],
-                        'plan_handle': row['plan_handle'],
-                        'execution_count': row.get('execution_count', None),
-                        'total_elapsed_time': row.get('total_elapsed_time', None),
-                    },
-                }
+                batch.append(row)
+            if not batch or (len(batch) < self.plan_lookup_batch_size and i < len(rows) - 1):
+                continue
+            if self.enforce_collection_interval_deadline and time.time() > deadline:
+                self.log.debug("ending plan collection early because check deadline has been exceeded")
+                self.check.count("dd.sqlserver.statements.deadline_exceeded", 1, **self.check.debug_stats_kwargs())
+                return
+            for event in self._collect_plan_batch(batch, cursor):
+                yield event
+            batch = []
+
+    def _collect_plan_batch(self, rows, cursor):
+        plan_handles = []
+        for row in rows:
+            if (row['plan_handle'], row['query_plan_hash']) not in self._plan_cache:
+                plan_handles.append(row['plan_handle'])
+        raw_plans = self._load_plans(sorted(set(plan_handles)), cursor) if plan_handles else {}
+
+        for row in rows:
+            plan_cache_key = (row['plan_handle'], row['query_plan_hash'])
+            plan = self._plan_cache.get(plan_cache_key)
+            if plan is None:
+                raw_plan, is_plan_encrypted = raw_plans.get(row['plan_handle'], (None, None))
+                obfuscated_plan, collection_errors = self._obfuscate_plan(raw_plan, row)
+                plan = (obfuscated_plan, collection_errors, is_plan_encrypted)
+                # plans which just expired out of the plan cache or failed to be obfuscated are looked up again
+                if raw_plan and not collection_errors and _get_cached_plan_size(plan) <= self._plan_cache.maxsize:
+                    self._plan_cache[plan_cache_key] = plan
+            obfuscated_plan, collection_errors, is_plan_encrypted = plan
+            yield self._to_plan_event(row, obfuscated_plan, collection_errors, is_plan_encrypted)
+
+    def _obfuscate_plan(self, raw_plan, row):
+        obfuscated_plan, collection_errors = None, None
+        try:
+            if raw_plan:
+                obfuscated_plan = obfuscate_xml_plan(raw_plan, self.check.obfuscator_options)
+        except Exception as e:
+            context = (
+                "query_signature=[{0}] query_hash=[{1}] query_plan_hash=[{2}] plan_handle=[{3}] err=[{4}]"
+            ).format(row['query_signature'], row['query_hash'], row['query_plan_hash'], row['plan_handle'], e)
+            if self.check.log_unobfuscated_plans:
+                self.log.warning("Failed to obfuscate plan=[%s] | %s", raw_plan, context)
+            else:
+                self.log.debug("Failed to obfuscate plan | %s", context)
+            collection_errors = [{'code': "obfuscate_xml_plan_error", 'message': str(e)}]
+            self.check.count(
+                "dd.sqlserver.statements.error",
+                1,
+                **self.check.debug_stats_kwargs(tags=["error:obfuscate-xml-plan-{}".format(type(e))])
+            )
+        return obfuscated_plan, collection_errors
+
+    def _to_plan_event(self, row, obfuscated_plan, collection_errors, is_plan_encrypted):
+        tags = list(self.tags)
+
+        # for stored procedures, we want to send the plan
+        # events with the full procedure text, not the text
+        # for the individual statement encapsulated within the proc
+        text_key = 'text'
+        if row['is_proc']:
+            text_key = 'procedure_text'
+        query_signature = row['query_signature']
+        # for procedure plans, it only makes sense to send the
+        # procedure_signature
+        if row['is_proc']:
+            query_signature = None
+        if 'database_name' in row:
+            tags += ["db:{}".format(row['database_name'])]
+        return {
+            "host": self.check.resolved_hostname,
+            "ddagentversion": datadog_agent.get_version(),
+            "ddsource": "sqlserver",
+            "ddtags": ",".join(tags),
+            "timestamp": time.time() * 1000,
+            "dbm_type": "plan",
+            "cloud_metadata": self.check.cloud_metadata,
+            'sqlserver_version': self.check.static_info_cache.get(STATIC_INFO_VERSION, ""),
+            'sqlserver_engine_edition': self.check.static_info_cache.get(STATIC_INFO_ENGINE_EDITION, ""),
+            "db": {
+                "instance": row.get("database_name", None),
+                "plan": {
+                    "definition": obfuscated_plan,
+                    "signature": row['query_plan_hash'],
+                    "collection_errors": collection_errors,
+                },
+                "query_signature": query_signature,
+                "procedure_signature": row.get('procedure_signature', None),
+                "procedure_name": row.get('procedure_name', None),
+                "statement": row[text_key],
+                "metadata": {
+                    "tables": row['dd_tables'],
+                    "commands": row['dd_commands'],
+                    "comments": row['dd_comments'],
+                },
+            },
+            'sqlserver': {
+                "is_plan_encrypted": is_plan_encrypted,
+                "is_statement_encrypted": row['is_encrypted'],
+                'query_hash': row['query_hash'],
+                'query_plan_hash': row['query_plan_hash'],
+                'plan_handle': row['plan_handle'],
+                'execution_count': row.get('execution_count', None),
+                'total_elapsed_time': row.get('total_elapsed_time', None),
+            },
+        }
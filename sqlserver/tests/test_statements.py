@@ -751,14 +751,15 @@ def test_plan_collection_deadline(aggregator, dd_run_check, dbm_instance, slow_p
     def _mock_slow_load_plan(*_):
         if not slow_plans:
             check.log.debug("_mock_slow_load_plan instant return")
-            return
+            return {}
         interval = dbm_instance['query_metrics']['collection_interval']
         check.log.debug("_mock_slow_load_plan sleeping %s seconds", interval)
         time.sleep(interval)
+        return {}
 
     aggregator.reset()
 
-    with mock.patch.object(check.statement_metrics, '_load_plan', passthrough=True) as mock_obj:
+    with mock.patch.object(check.statement_metrics, '_load_plans', passthrough=True) as mock_obj:
         mock_obj.side_effect = _mock_slow_load_plan
         dd_run_check(check)
 
@@ -808,6 +809,52 @@ def test_obfuscate_xml_plan(test_file, obfuscated_file, datadog_agent):
         assert result == expected_result, "incorrect obfuscation"
 
 
+def test_collect_plans_batched(dbm_instance, datadog_agent):
+    dbm_instance['query_metrics']['plan_lookup_batch_size'] = 2
+    check = SQLServer(CHECK_NAME, {}, [dbm_instance])
+    statement_metrics = check.statement_metrics
+
+    plan = '<ShowPlanXML><Stmt StatementText="select * from dogs where id = 1"/></ShowPlanXML>'
+    rows = [
+        {
+            'query_signature': 'sig{}'.format(i),
+            'query_hash': 'hash{}'.format(i),
+            'query_plan_hash': 'planhash{}'.format(i),
+            # the first two statements are part of the same batch
+            'plan_handle': 'abcd{}'.format(max(i, 1)),
+            'is_proc': False,
+            'is_encrypted': False,
+            'database_name': 'datadog_test',
+            'text': 'select * from dogs where id = ?',
+            'dd_tables': ['dogs'],
+            'dd_commands': ['SELECT'],
+            'dd_comments': [],
+        }
+        for i in range(5)
+    ]
+
+    cursor = mock.MagicMock()
+    cursor.fetchall.side_effect = lambda: [(handle, plan, False) for handle in cursor.execute.call_args[0][1]]
+
+    events = list(statement_metrics._collect_plans(rows, cursor, time.time() + 60))
+    assert len(events) == 5
+    assert all(event['db']['plan']['definition'] for event in events)
+    # three batches of up to two rows, the first batch has a single plan handle
+    assert [call[0][1] for call in cursor.execute.call_args_list] == [
+        ('0xabcd1',),
+        ('0xabcd2', '0xabcd3'),
+        ('0xabcd4',),
+    ]
+    assert 'from (values (?), (?)) as h(plan_handle)' in cursor.execute.call_args_list[1][0][0]
+
+    # the cached plans are not fetched again
+    cursor.reset_mock()
+    statement_metrics._seen_plans_ratelimiter.clear()
+    events = list(statement_metrics._collect_plans(rows, cursor, time.time() + 60))
+    assert len(events) == 5
+    assert not cursor.execute.called
+
+
 PORT = 1432
 
 
@@ -86,6 +86,7 @@ class RestApiOptions(BaseModel):
     aws_region: Optional[str]
     aws_service: Optional[str]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     extra_headers: Optional[Mapping[str, Any]]
     headers: Optional[Mapping[str, Any]]
     kerberos_auth: Optional[str]
@@ -102,6 +103,7 @@ class RestApiOptions(BaseModel):
     proxy: Optional[Proxy]
     read_timeout: Optional[float]
     request_size: Optional[float]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     timeout: Optional[float]
     tls_ca_cert: Optional[str]
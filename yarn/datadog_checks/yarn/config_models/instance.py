@@ -66,6 +66,7 @@ class InstanceConfig(BaseModel):
     ]
     collect_node_metrics: Optional[bool]
     connect_timeout: Optional[float]
+    connection_pool_size: Optional[int]
     disable_generic_tags: Optional[bool]
     disable_legacy_cluster_tag: Optional[bool]
     empty_default_hostname: Optional[bool]
@@ -90,6 +91,7 @@ class InstanceConfig(BaseModel):
     request_size: Optional[float]
     resourcemanager_uri: Optional[str]
     service: Optional[str]
+    share_connections: Optional[bool]
     skip_proxy: Optional[bool]
     split_yarn_application_tags: Optional[bool]
     tags: Optional[Sequence[str]]